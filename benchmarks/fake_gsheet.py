@@ -0,0 +1,329 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Literal, TypedDict
+
+import gspread
+
+import utils
+
+RequestKind = Literal["read", "write"]
+
+
+class FakeAPIError(Exception):
+    """Raised for requests the Sheets API would reject, e.g. oversized payloads or ranges outside the grid."""
+
+
+class APICall(TypedDict):
+    """A dictionary describing a request received by the fake spreadsheet.
+
+    Attributes:
+        method (str): The name of the Sheets API method, e.g. `values.batchUpdate`.
+        kind (RequestKind): Whether the request counts against the read or the write quota.
+        bytes_sent (int): The size of the request body in bytes.
+        bytes_received (int): The size of the response body in bytes.
+        throttled_seconds (float): The simulated time the request waited for quota.
+
+    """
+
+    method: str
+    kind: RequestKind
+    bytes_sent: int
+    bytes_received: int
+    throttled_seconds: float
+
+
+class FakeSpreadsheet:  # pylint: disable=R0902
+    """In-memory stand-in for `gspread.Spreadsheet` with a single worksheet.
+
+    Every request is recorded with the size of its body and response, and takes `latency` seconds.
+    Requests are serialized like JSON bodies of the real API, so payload sizes are comparable to production.
+
+    Per-user quotas are enforced on a simulated clock: a request over the quota of the last minute waits until
+    the quota allows it, as the scheduler of the app would make it wait. The wait isn't slept, it's added to
+    `throttled_seconds`, so large benchmarks finish quickly and still report the time quotas would cost.
+
+    Like the scheduler of the app, at most `max_requests_per_spreadsheet` requests are in flight at a time.
+
+    Args:
+        rows (int): The number of rows of the worksheet, including the header row.
+        cols (int): The number of columns of the worksheet. Defaults to 26.
+        latency (float): The number of seconds every request takes. Defaults to 0.05.
+        quota (utils.QuotaConfig | None): The quotas to enforce. Only the per-user quotas apply.
+            Defaults to `utils.DEFAULT_QUOTA`.
+        max_payload_size (int): The maximum size of a request body in bytes. Defaults to 10 MB.
+
+    """
+
+    def __init__(  # pylint: disable=R0913,R0917
+        self,
+        rows: int,
+        cols: int = 26,
+        latency: float = 0.05,
+        quota: utils.QuotaConfig | None = None,
+        max_payload_size: int = 10_000_000,
+    ) -> None:
+        self.id = "fake-spreadsheet"
+        self.latency = latency
+        quota = quota or utils.DEFAULT_QUOTA
+        self.limits: dict[RequestKind, float] = {
+            "read": quota["user_reads_per_minute"],
+            "write": quota["user_writes_per_minute"],
+        }
+        self.max_payload_size = max_payload_size
+        self._slots = threading.BoundedSemaphore(quota["max_requests_per_spreadsheet"])
+        self.calls: list[APICall] = []
+        self.traffic: utils.TrafficStats = {"api_calls": 0, "bytes_sent": 0, "bytes_received": 0}
+        self.throttled_seconds = 0.0
+        self.sheet1 = FakeWorksheet(self, rows, cols)
+        self._windows: dict[RequestKind, deque[float]] = {"read": deque(), "write": deque()}
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def batch_update(self, body: dict[str, Any]) -> dict[str, Any]:
+        """Applies the requests of a `spreadsheets.batchUpdate` body.
+
+        Args:
+            body (dict[str, Any]): The body with the list of requests.
+
+        """
+        return self.request("batchUpdate", "write", body, lambda: self._apply_requests(body["requests"]))
+
+    def fetch_sheet_metadata(self, params: dict[str, Any] | None = None) -> dict[str, Any]:  # pylint: disable=W0613
+        """Returns the properties and conditional formatting rules of the worksheet."""
+        return self.request("get", "read", None, self.sheet1.get_metadata)
+
+    def request(self, method: str, kind: RequestKind, body: Any, func: Callable[[], Any]) -> Any:
+        """Records a request, runs it and waits for the simulated latency.
+
+        Args:
+            method (str): The name of the Sheets API method.
+            kind (RequestKind): Whether the request counts against the read or the write quota.
+            body (Any): The request body, or None for requests without a body.
+            func (Callable[[], Any]): Applies the request to the fake and returns the response.
+
+        """
+        bytes_sent = _get_size(body)
+        if bytes_sent > self.max_payload_size:
+            raise FakeAPIError(f"The {method} payload of {bytes_sent} bytes exceeds the size limit.")
+
+        with self._lock:
+            throttled_seconds = self._throttle(kind)
+            response = func()
+            bytes_received = _get_size(response)
+            self.calls.append(
+                {
+                    "method": method,
+                    "kind": kind,
+                    "bytes_sent": bytes_sent,
+                    "bytes_received": bytes_received,
+                    "throttled_seconds": throttled_seconds,
+                }
+            )
+            self.traffic["api_calls"] += 1
+            self.traffic["bytes_sent"] += bytes_sent
+            self.traffic["bytes_received"] += bytes_received
+
+        # The lock is released first, so requests sent in parallel overlap like they do with the real API.
+        with self._slots:
+            time.sleep(self.latency)
+        return response
+
+    def _throttle(self, kind: RequestKind) -> float:
+        """Returns how long the request waits for quota and moves the simulated clock past the wait."""
+        now = time.monotonic() - self._started_at + self.throttled_seconds
+        window = self._windows[kind]
+        while window and window[0] <= now - 60:
+            window.popleft()
+
+        delay = 0.0
+        if len(window) >= self.limits[kind]:
+            delay = window.popleft() + 60 - now
+            self.throttled_seconds += delay
+        window.append(now + delay)
+        return delay
+
+    def _apply_requests(self, requests: list[dict[str, Any]]) -> dict[str, Any]:
+        """Applies the `batchUpdate` requests supported by the fake."""
+        for request in requests:
+            ((name, params),) = request.items()
+            if name == "appendDimension":
+                self.sheet1.append_dimension(params["dimension"], params["length"])
+            elif name == "updateCells":
+                values = [[cell["userEnteredValue"]["stringValue"] for cell in row["values"]] for row in params["rows"]]
+                self.sheet1.write(params["start"]["rowIndex"], params["start"]["columnIndex"], values)
+            elif name == "updateDimensionProperties":
+                self.sheet1.hidden_columns.update(range(params["range"]["startIndex"], params["range"]["endIndex"]))
+            elif name == "repeatCell":
+                self.sheet1.format_rows(params["range"], params["cell"].get("userEnteredFormat", {}))
+            elif name == "addConditionalFormatRule":
+                self.sheet1.conditional_formats.insert(params["index"], params["rule"])
+            elif name == "deleteConditionalFormatRule":
+                del self.sheet1.conditional_formats[params["index"]]
+            else:
+                raise FakeAPIError(f"The {name} request isn't supported by the fake spreadsheet.")
+        return {"spreadsheetId": self.id, "replies": [{} for _ in requests]}
+
+
+class FakeWorksheet:  # pylint: disable=R0902
+    """In-memory stand-in for `gspread.Worksheet`, implementing the methods used by the tools.
+
+    Cells are stored as strings in columns. Like the real API, reads omit trailing empty cells and rows,
+    and writes outside of the grid are rejected.
+
+    Args:
+        spreadsheet (FakeSpreadsheet): The spreadsheet the worksheet belongs to.
+        rows (int): The number of rows of the worksheet, including the header row.
+        cols (int): The number of columns of the worksheet.
+
+    """
+
+    def __init__(self, spreadsheet: FakeSpreadsheet, rows: int, cols: int) -> None:
+        self.spreadsheet = spreadsheet
+        self.id = 0
+        self.title = "Sheet1"
+        # Requests are sent by the fake spreadsheet instead of an HTTP client.
+        self.client = None
+        self.columns = [[""] * rows for _ in range(cols)]
+        self.hidden_columns: set[int] = set()
+        self.row_formats: list[dict[str, Any] | None] = [None] * rows
+        self.conditional_formats: list[dict[str, Any]] = []
+        # Properties refreshed from the metadata, like the ones of `gspread.Worksheet`. The fake reads its grid size
+        # from the cells instead.
+        self._properties: dict[str, Any] = {}
+
+    @property
+    def row_count(self) -> int:
+        """The number of rows of the grid."""
+        return len(self.columns[0])
+
+    @property
+    def col_count(self) -> int:
+        """The number of columns of the grid."""
+        return len(self.columns)
+
+    @property
+    def spreadsheet_id(self) -> str:
+        """The ID of the spreadsheet."""
+        return self.spreadsheet.id
+
+    def fill(self, header: list[str], columns: list[list[str]]) -> None:
+        """Sets the header and the values of the first columns without sending requests.
+
+        Args:
+            header (list[str]): The names of the columns.
+            columns (list[list[str]]): The values of each column below the header.
+
+        """
+        for column_idx, (name, values) in enumerate(zip(header, columns)):
+            self.write(0, column_idx, [[name], *([value] for value in values)])
+
+    def row_values(self, row: int, **kwargs: Any) -> list[str]:  # pylint: disable=W0613
+        """Returns the values of the row, like `gspread.Worksheet.row_values`."""
+        values = self.spreadsheet.request("values.get", "read", None, lambda: self.read(f"{row}:{row}"))
+        return values[0] if values else []
+
+    def get_values(  # pylint: disable=W0613
+        self, range_name: str, major_dimension: str | None = None, **kwargs: Any
+    ) -> list[list[str]]:
+        """Returns the values of the range, like `gspread.Worksheet.get_values`."""
+        return self.spreadsheet.request("values.get", "read", None, lambda: self.read(range_name, major_dimension))
+
+    def batch_get(  # pylint: disable=W0613
+        self, ranges: list[str], major_dimension: str | None = None, **kwargs: Any
+    ) -> list[list[list[str]]]:
+        """Returns the values of each range in a single request, like `gspread.Worksheet.batch_get`."""
+        return self.spreadsheet.request(
+            "values.batchGet", "read", None, lambda: [self.read(range_name, major_dimension) for range_name in ranges]
+        )
+
+    def batch_update(self, data: list[dict[str, Any]], **kwargs: Any) -> dict[str, Any]:
+        """Writes the values of each range in a single request, like `gspread.Worksheet.batch_update`."""
+
+        def write() -> dict[str, Any]:
+            for value_range in data:
+                grid_range = gspread.utils.a1_range_to_grid_range(value_range["range"])
+                self.write(
+                    grid_range.get("startRowIndex", 0), grid_range.get("startColumnIndex", 0), value_range["values"]
+                )
+            return {"spreadsheetId": self.spreadsheet.id, "totalUpdatedRanges": len(data)}
+
+        return self.spreadsheet.request("values.batchUpdate", "write", {"data": data, **kwargs}, write)
+
+    def read(self, range_name: str, major_dimension: str | None = None) -> list[list[str]]:
+        """Returns the values of an A1 range without sending a request.
+
+        Args:
+            range_name (str): The A1 range, which may be open-ended, e.g. `C2:C` or `1:1`.
+            major_dimension (str | None): `COLUMNS` to return columns instead of rows. Defaults to None.
+
+        """
+        grid_range = gspread.utils.a1_range_to_grid_range(range_name)
+        rows = slice(grid_range.get("startRowIndex", 0), grid_range.get("endRowIndex", self.row_count))
+        columns = self.columns[slice(grid_range.get("startColumnIndex", 0), grid_range.get("endColumnIndex"))]
+        if major_dimension == gspread.utils.Dimension.cols:
+            values = [column[rows] for column in columns]
+        else:
+            values = [list(row) for row in zip(*(column[rows] for column in columns))]
+        return _trim([_trim(line) for line in values])
+
+    def write(self, row_idx: int, column_idx: int, values: list[list[Any]]) -> None:
+        """Writes rows of values starting at the given 0-based cell without sending a request.
+
+        Args:
+            row_idx (int): The 0-based index of the first row.
+            column_idx (int): The 0-based index of the first column.
+            values (list[list[Any]]): The rows of values to write.
+
+        """
+        if row_idx + len(values) > self.row_count or column_idx + max(map(len, values), default=0) > self.col_count:
+            raise FakeAPIError(f"The range starting at row {row_idx + 1}, column {column_idx + 1} exceeds the grid.")
+        for row_offset, row in enumerate(values):
+            for column_offset, value in enumerate(row):
+                self.columns[column_idx + column_offset][row_idx + row_offset] = str(value)
+
+    def append_dimension(self, dimension: str, length: int) -> None:
+        """Adds empty rows or columns at the end of the grid.
+
+        Args:
+            dimension (str): `ROWS` or `COLUMNS`.
+            length (int): The number of rows or columns to add.
+
+        """
+        if dimension == "COLUMNS":
+            self.columns.extend([""] * self.row_count for _ in range(length))
+        else:
+            for column in self.columns:
+                column.extend([""] * length)
+            self.row_formats.extend([None] * length)
+
+    def format_rows(self, grid_range: dict[str, Any], cell_format: dict[str, Any]) -> None:
+        """Saves the format of the rows of a grid range. Column bounds are ignored."""
+        for row_idx in range(grid_range.get("startRowIndex", 0), grid_range.get("endRowIndex", self.row_count)):
+            self.row_formats[row_idx] = cell_format
+
+    def get_metadata(self) -> dict[str, Any]:
+        """Returns the metadata of the spreadsheet in the format of `spreadsheets.get`."""
+        sheet = {
+            "properties": {
+                "sheetId": self.id,
+                "title": self.title,
+                "gridProperties": {"rowCount": self.row_count, "columnCount": self.col_count},
+            },
+            "conditionalFormats": list(self.conditional_formats),
+        }
+        return {"spreadsheetId": self.spreadsheet.id, "sheets": [sheet]}
+
+
+def _get_size(body: Any) -> int:
+    """Returns the size of the body serialized as compact JSON, like the body of an HTTP request."""
+    return 0 if body is None else len(json.dumps(body, separators=(",", ":")))
+
+
+def _trim[T](values: list[T]) -> list[T]:
+    """Returns the values without trailing empty ones."""
+    end = len(values)
+    while end and not values[end - 1]:
+        end -= 1
+    return values[:end]
@@ -0,0 +1,156 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+BENCHMARKS_PATH = Path(__file__).resolve().parent
+SRC_PATH = BENCHMARKS_PATH.parent / "src"
+
+MODES = {
+    "detect_language": ["batch", "streaming", "incremental"],
+    "highlight_rows": ["static", "incremental", "conditional"],
+    "cluster_keywords": ["char", "word"],
+    "find_duplicates": ["canonical", "highlight"],
+}
+
+
+def main() -> None:
+    """Runs the benchmark scenarios and writes their results as a JSON document."""
+    args = parse_args()
+    scenarios = get_scenarios(args)
+    results = []
+    for idx, scenario in enumerate(scenarios, start=1):
+        print(
+            f"[{idx}/{len(scenarios)}] {scenario['tool']} ({scenario['mode']}), {scenario['rows']:,} rows, "
+            f"{scenario['cardinality']} groups, {scenario['duplicates']:.0%} duplicates",
+            file=sys.stderr,
+        )
+        results.append(run_script("scenario.py", json.dumps(scenario)))
+    write_results(results, args.output)
+
+
+def parse_args() -> argparse.Namespace:
+    """Returns the command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmarks the tools on an in-memory fake of Google Sheets.")
+    parser.add_argument("--tools", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--modes", nargs="+", help="Modes of the tools to run. Defaults to all modes.")
+    parser.add_argument("--rows", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument(
+        "--cardinality", nargs="+", type=int, default=[10, 1_000], help="Numbers of groups for Highlight Rows."
+    )
+    parser.add_argument(
+        "--duplicates",
+        nargs="+",
+        type=float,
+        default=[0.0, 0.9],
+        help="Fractions of duplicates for the keyword tools.",
+    )
+    parser.add_argument(
+        "--changed", type=float, default=0.01, help="Fraction of rows changed before the incremental rerun."
+    )
+    parser.add_argument("--detector", default="ngram", choices=["langdetect", "ngram"])
+    parser.add_argument("--workers", type=int, default=1, help="Number of language detection processes.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every API request takes.")
+    parser.add_argument("--reads-per-minute", type=float, default=60)
+    parser.add_argument("--writes-per-minute", type=float, default=60)
+    parser.add_argument("--requests-per-spreadsheet", type=int, default=4)
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Path of the JSON results. Defaults to the standard output.")
+    return parser.parse_args()
+
+
+def get_scenarios(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Returns the scenarios for every combination of the arguments.
+
+    The keyword tools are run with every fraction of duplicates and the first number of groups, and Highlight Rows
+    with every number of groups and the first fraction of duplicates, as the tools don't depend on the other setting.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    """
+    scenarios = []
+    for tool in args.tools:
+        modes = [mode for mode in MODES[tool] if not args.modes or mode in args.modes]
+        cardinalities = args.cardinality if tool == "highlight_rows" else args.cardinality[:1]
+        duplicates = args.duplicates if tool != "highlight_rows" else args.duplicates[:1]
+        for mode, rows, cardinality, duplicate_ratio in itertools.product(modes, args.rows, cardinalities, duplicates):
+            scenarios.append(
+                {
+                    "tool": tool,
+                    "mode": mode,
+                    "rows": rows,
+                    "cardinality": cardinality,
+                    "duplicates": duplicate_ratio,
+                    "changed": args.changed,
+                    "detector": args.detector,
+                    "workers": args.workers,
+                    "latency": args.latency,
+                    "quota": {
+                        "user_reads_per_minute": args.reads_per_minute,
+                        "user_writes_per_minute": args.writes_per_minute,
+                        "project_reads_per_minute": args.reads_per_minute,
+                        "project_writes_per_minute": args.writes_per_minute,
+                        "max_retries": 0,
+                        "max_backoff": 0,
+                        "max_requests_per_spreadsheet": args.requests_per_spreadsheet,
+                    },
+                    "profiler": args.profiler,
+                    "seed": args.seed,
+                }
+            )
+    return scenarios
+
+
+def run_script(script: str, *args: str) -> Any:
+    """Runs a benchmark script in a new process with an empty home directory and returns its JSON results.
+
+    Args:
+        script (str): The file name of the script in the benchmarks directory.
+        *args (str): The command line arguments of the script.
+
+    """
+    with tempfile.TemporaryDirectory() as home:
+        env = {**os.environ, "HOME": home, "PYTHONPATH": str(SRC_PATH)}
+        process = subprocess.run(
+            [sys.executable, str(BENCHMARKS_PATH / script), *args],
+            env=env,
+            cwd=SRC_PATH.parent,
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+    # Libraries may print to the standard output as well, the results are always the last line.
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def write_results(results: list[Any], output: str | None) -> None:
+    """Writes the results with the details of the machine as a JSON document.
+
+    Args:
+        results (list[Any]): The results of the benchmarks.
+        output (str | None): The path of the document, or None to print it to the standard output.
+
+    """
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if output:
+        Path(output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
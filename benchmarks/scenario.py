@@ -0,0 +1,258 @@
+import inspect
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Literal, TypedDict
+
+import numpy as np
+from fake_gsheet import FakeSpreadsheet, FakeWorksheet
+from streamlit import config
+
+import components
+import utils
+from pages import (
+    gsheet_cluster_keywords,
+    gsheet_detect_language,
+    gsheet_find_duplicates,
+    gsheet_highlight_rows,
+)
+
+ToolName = Literal["detect_language", "highlight_rows", "cluster_keywords", "find_duplicates"]
+
+MODES: dict[ToolName, tuple[str, ...]] = {
+    "detect_language": ("batch", "streaming", "incremental"),
+    "highlight_rows": ("static", "incremental", "conditional"),
+    "cluster_keywords": ("char", "word"),
+    "find_duplicates": ("canonical", "highlight"),
+}
+SOURCE_COLUMN = "Keyword"
+GROUP_COLUMN = "Metric"
+DESTINATION_COLUMN = "Detected Language"
+
+# Words of each language, combined into random keywords that the detectors recognize.
+VOCABULARY = {
+    "en": "the best cheap running shoes for women near me how to buy online reviews store".split(),
+    "de": "die besten günstigen laufschuhe für damen in der nähe kaufen online bewertungen".split(),
+    "fr": "les meilleures chaussures de course pas cher pour femmes près de moi acheter avis".split(),
+    "es": "las mejores zapatillas baratas para correr mujer cerca de mí comprar en línea opiniones".split(),
+    "uk": "найкращі дешеві кросівки для бігу жіночі поруч купити онлайн відгуки магазин".split(),
+}
+KEYWORD_LENGTH = 5
+
+
+class Scenario(TypedDict):
+    """A dictionary with the settings of one benchmark run.
+
+    Attributes:
+        tool (ToolName): The tool to run.
+        mode (str): The mode of the tool, one of `MODES`.
+        rows (int): The number of data rows of the worksheet.
+        cardinality (int): The number of distinct values of the group column.
+        duplicates (float): The fraction of keywords that repeat other keywords.
+        changed (float): The fraction of rows changed before the second run in incremental mode.
+        detector (str): The language detector to use.
+        workers (int): The number of language detection processes.
+        latency (float): The number of seconds every API request takes.
+        quota (utils.QuotaConfig): The Sheets API quotas to enforce.
+        profiler (utils.ProfilerName | None): The profiler to run during every stage.
+        seed (int): The seed of the generated data.
+
+    """
+
+    tool: ToolName
+    mode: str
+    rows: int
+    cardinality: int
+    duplicates: float
+    changed: float
+    detector: str
+    workers: int
+    latency: float
+    quota: utils.QuotaConfig
+    profiler: utils.ProfilerName | None
+    seed: int
+
+
+class RunResult(TypedDict):
+    """A dictionary with the resources used by one run of a tool.
+
+    Attributes:
+        name (str): `full`, or `initial` and `changed` for the two runs in incremental mode.
+        wall_seconds (float): The duration of the run.
+        api_calls (int): The number of API requests.
+        bytes_sent (int): The size of the request bodies in bytes.
+        bytes_received (int): The size of the response bodies in bytes.
+        throttled_seconds (float): The simulated time requests waited for quota.
+        calls_by_method (dict[str, int]): The number of requests of each API method.
+        stages (list[utils.StageMetrics]): The metrics of each stage.
+
+    """
+
+    name: str
+    wall_seconds: float
+    api_calls: int
+    bytes_sent: int
+    bytes_received: int
+    throttled_seconds: float
+    calls_by_method: dict[str, int]
+    stages: list[utils.StageMetrics]
+
+
+def run_scenario(scenario: Scenario) -> list[RunResult]:
+    """Runs the tool on a generated fake worksheet and returns the resources used by each run.
+
+    In incremental mode the tool runs twice: once on the whole sheet, and again after a fraction
+    of the rows was changed, which is the run incremental mode is meant to speed up.
+
+    Args:
+        scenario (Scenario): The settings of the benchmark run.
+
+    """
+    rng = np.random.default_rng(scenario["seed"])
+    spreadsheet = FakeSpreadsheet(scenario["rows"] + 1, latency=scenario["latency"], quota=scenario["quota"])
+    keywords = generate_keywords(rng, scenario["rows"], scenario["duplicates"])
+    groups = [f"Group {group}" for group in rng.integers(scenario["cardinality"], size=scenario["rows"]).tolist()]
+    spreadsheet.sheet1.fill([SOURCE_COLUMN, GROUP_COLUMN], [keywords, groups])
+
+    results = [run_tool(scenario, spreadsheet, "initial" if scenario["mode"] == "incremental" else "full")]
+    if scenario["mode"] == "incremental":
+        change_rows(rng, spreadsheet.sheet1, scenario["changed"])
+        results.append(run_tool(scenario, spreadsheet, "changed"))
+    return results
+
+
+def generate_keywords(rng: np.random.Generator, rows: int, duplicates: float) -> list[str]:
+    """Returns random keywords in several languages, of which the given fraction repeats other keywords.
+
+    Args:
+        rng (np.random.Generator): The random number generator.
+        rows (int): The number of keywords.
+        duplicates (float): The fraction of keywords that repeat other keywords.
+
+    """
+    languages = list(VOCABULARY)
+    unique_keywords = [
+        " ".join(rng.choice(VOCABULARY[languages[idx % len(languages)]], KEYWORD_LENGTH))
+        for idx in range(max(1, round(rows * (1 - duplicates))))
+    ]
+    # Every unique keyword appears at least once, the remaining rows repeat random ones.
+    repeated = rng.integers(len(unique_keywords), size=rows - len(unique_keywords))
+    keywords = np.concatenate(
+        (np.array(unique_keywords, dtype=object), np.array(unique_keywords, dtype=object)[repeated])
+    )
+    rng.shuffle(keywords)
+    return keywords.tolist()
+
+
+def change_rows(rng: np.random.Generator, worksheet: FakeWorksheet, changed: float) -> None:
+    """Changes the keyword and group of the given fraction of rows, like users editing the sheet.
+
+    Args:
+        rng (np.random.Generator): The random number generator.
+        worksheet (FakeWorksheet): The worksheet to change.
+        changed (float): The fraction of rows to change.
+
+    """
+    rows = worksheet.row_count - 1
+    for row_idx in rng.choice(rows, size=round(rows * changed), replace=False).tolist():
+        worksheet.columns[0][row_idx + 1] += " new"
+        worksheet.columns[1][row_idx + 1] = f"Changed group {row_idx % 10}"
+
+
+def run_tool(scenario: Scenario, spreadsheet: FakeSpreadsheet, name: str) -> RunResult:
+    """Runs the stages of the tool as a background job, like the app does, and measures them.
+
+    Args:
+        scenario (Scenario): The settings of the benchmark run.
+        spreadsheet (FakeSpreadsheet): The spreadsheet to run the tool on.
+        name (str): The name of the run.
+
+    """
+    stages = get_stages(scenario["tool"], scenario["mode"])
+    context: dict[str, Any] = {
+        "worksheet": spreadsheet.sheet1,
+        "columns": [GROUP_COLUMN if scenario["tool"] == "highlight_rows" else SOURCE_COLUMN],
+        "source_column": SOURCE_COLUMN,
+        "destination_column": DESTINATION_COLUMN,
+        "detector": scenario["detector"],
+        "analyzer": scenario["mode"],
+        "group_column": GROUP_COLUMN,
+        "incremental": scenario["mode"] == "incremental",
+        "dtype": "category" if scenario["tool"] == "highlight_rows" else "auto",
+    }
+    checkpoint = utils.Checkpoint(utils.CheckpointStore(), f"benchmark:{name}", "benchmark")
+    stage_metrics: list[utils.StageMetrics] = []
+    calls_before = len(spreadsheet.calls)
+    throttled_before = spreadsheet.throttled_seconds
+
+    def run(job: utils.Job) -> None:
+        for idx, stage in enumerate(stages):
+            job.set_stage(idx)
+            parameters = inspect.signature(stage["func"]).parameters
+            func_kwargs = {key: value for key, value in context.items() if key in parameters}
+            if "checkpoint" in parameters:
+                func_kwargs["checkpoint"] = checkpoint
+            with utils.measure_stage(
+                stage["name"], lambda: spreadsheet.traffic, scenario["profiler"], stage_metrics.append
+            ):
+                if new_context := stage["func"](**func_kwargs):
+                    context.update(new_context)
+            checkpoint.complete_stage({key: value for key, value in context.items() if key != "worksheet"})
+        checkpoint.delete()
+
+    started_at = time.perf_counter()
+    job = utils.JobRunner(workers=1).submit("benchmark", scenario["tool"], [stage["name"] for stage in stages], run)
+    while not job.done:
+        time.sleep(0.01)
+    if job.error is not None:
+        raise RuntimeError(f"The benchmark failed with {job.error_type}: {job.error}")
+
+    calls = spreadsheet.calls[calls_before:]
+    calls_by_method: dict[str, int] = {}
+    for call in calls:
+        calls_by_method[call["method"]] = calls_by_method.get(call["method"], 0) + 1
+    return {
+        "name": name,
+        "wall_seconds": round(time.perf_counter() - started_at, 3),
+        "api_calls": len(calls),
+        "bytes_sent": sum(call["bytes_sent"] for call in calls),
+        "bytes_received": sum(call["bytes_received"] for call in calls),
+        "throttled_seconds": round(spreadsheet.throttled_seconds - throttled_before, 3),
+        "calls_by_method": calls_by_method,
+        "stages": stage_metrics,
+    }
+
+
+def get_stages(tool: ToolName, mode: str) -> list[components.Stage]:
+    """Returns the stages the page of the tool runs in the background in the given mode.
+
+    Args:
+        tool (ToolName): The tool.
+        mode (str): The mode of the tool, one of `MODES`.
+
+    """
+    if tool == "detect_language":
+        return gsheet_detect_language.get_stages(streaming=mode == "streaming")
+    if tool == "cluster_keywords":
+        return gsheet_cluster_keywords.get_stages()
+    if tool == "find_duplicates":
+        return gsheet_find_duplicates.get_stages(highlight=mode == "highlight")
+    return gsheet_highlight_rows.get_stages(conditional=mode == "conditional", incremental=mode == "incremental")
+
+
+def main() -> None:
+    """Runs the scenario given as a JSON argument and prints the results as JSON.
+
+    The scenario runs in its own process with its own home directory, so the language cache and the checkpoints
+    start empty and the peak memory of the process belongs to the scenario alone.
+    """
+    scenario: Scenario = json.loads(sys.argv[1])
+    secrets_path = Path.home() / "secrets.toml"
+    secrets_path.write_text(f"language_detection_workers = {scenario['workers']}\n", encoding="utf-8")
+    config.set_option("secrets.files", [str(secrets_path)])
+    print(json.dumps({**scenario, "runs": run_scenario(scenario)}, default=str))
+
+
+if __name__ == "__main__":
+    main()
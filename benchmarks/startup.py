@@ -0,0 +1,124 @@
+import argparse
+import importlib
+import json
+import statistics
+import sys
+import time
+from typing import Any, TypedDict
+
+from run import SRC_PATH, run_script, write_results
+
+PAGES = [
+    "pages/home.py",
+    "pages/gsheet_highlight_rows.py",
+    "pages/gsheet_detect_language.py",
+    "pages/gsheet_cluster_keywords.py",
+    "pages/gsheet_find_duplicates.py",
+    "pages/local_files.py",
+]
+
+
+class StartupResult(TypedDict):
+    """A dictionary with the startup time of a page in a new process.
+
+    Attributes:
+        page (str): The page, as passed to `st.navigation` in `main.py`.
+        streamlit_import_seconds (float): The time to import Streamlit, paid once when the server starts.
+        first_run_seconds (float): The time from the first run of `main.py` until the page is fully rendered.
+        rerun_seconds (float): The duration of a second run of the page.
+        imported_packages (list[str]): The top-level packages first imported by the first run.
+        exceptions (list[str]): The messages of the exceptions raised by the page.
+
+    """
+
+    page: str
+    streamlit_import_seconds: float
+    first_run_seconds: float
+    rerun_seconds: float
+    imported_packages: list[str]
+    exceptions: list[str]
+
+
+def main() -> None:
+    """Measures the startup time of the pages and writes the results as a JSON document."""
+    args = parse_args()
+    if args.child:
+        print(json.dumps(measure_page(args.child)))
+        return
+
+    results = []
+    for page in args.pages:
+        runs: list[StartupResult] = [run_script("startup.py", "--child", page) for _ in range(args.repeat)]
+        print(f"{page}: {statistics.median(run['first_run_seconds'] for run in runs):.3f}s", file=sys.stderr)
+        results.append(
+            {
+                "page": page,
+                "first_run_seconds": statistics.median(run["first_run_seconds"] for run in runs),
+                "rerun_seconds": statistics.median(run["rerun_seconds"] for run in runs),
+                "runs": runs,
+            }
+        )
+    write_results(results, args.output)
+
+
+def parse_args() -> argparse.Namespace:
+    """Returns the command line arguments."""
+    parser = argparse.ArgumentParser(description="Measures the time to the first render of every page of the app.")
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of new processes to measure each page in.")
+    parser.add_argument("--output", help="Path of the JSON results. Defaults to the standard output.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def measure_page(page: str) -> StartupResult:
+    """Runs the page twice with the Streamlit app testing framework and measures both runs.
+
+    The testing framework runs pages without `st.navigation`, so the imports of `main.py` are timed by importing it
+    and counted in the first run, and the page gets the logged out user `main.py` would set. The cookie component
+    needs a browser, so it's replaced by a fake that has no user cookie.
+
+    Args:
+        page (str): The page to measure.
+
+    """
+    started_at = time.perf_counter()
+    # pylint: disable=C0415
+    import streamlit_cookies_controller
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_import_seconds = time.perf_counter() - started_at
+    streamlit_cookies_controller.CookieController = FakeCookieController
+    packages_before = {name.partition(".")[0] for name in sys.modules}
+
+    started_at = time.perf_counter()
+    importlib.import_module("main")
+    app = AppTest.from_file(str(SRC_PATH / "main.py"), default_timeout=60)
+    app.switch_page(page)
+    app.session_state["user"] = None
+    app.run()
+    first_run_seconds = time.perf_counter() - started_at
+    imported_packages = sorted({name.partition(".")[0] for name in sys.modules} - packages_before)
+
+    started_at = time.perf_counter()
+    app.run()
+    return {
+        "page": page,
+        "streamlit_import_seconds": round(streamlit_import_seconds, 3),
+        "first_run_seconds": round(first_run_seconds, 3),
+        "rerun_seconds": round(time.perf_counter() - started_at, 3),
+        "imported_packages": [name for name in imported_packages if not name.startswith("_")],
+        "exceptions": [exception.value for exception in app.exception],
+    }
+
+
+class FakeCookieController:  # pylint: disable=R0903
+    """Stand-in for `streamlit_cookies_controller.CookieController` without a browser and cookies."""
+
+    def get(self, name: str) -> Any:  # pylint: disable=W0613
+        """Returns None, as the user isn't logged in."""
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -17,3 +17,6 @@ pylint src/
 
 echo "Mypy checking..."
 mypy src/
+
+echo "Running tests..."
+PYTHONPATH=src python -m unittest discover tests
@@ -1,15 +1,20 @@
+import functools
 import json
+from typing import TYPE_CHECKING
 
 import requests
 import streamlit as st
-from cryptography.fernet import Fernet
-from google_auth_oauthlib.flow import Flow
 from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # pylint: disable=E0611
 from streamlit.runtime.scriptrunner_utils.script_run_context import (
     get_script_run_ctx as _get_script_run_ctx,
 )
 from streamlit_cookies_controller import CookieController
 
+# The cryptography and OAuth libraries are imported on first use, as most reruns of a logged out user need neither.
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
+    from google_auth_oauthlib.flow import Flow
+
 
 def get_user() -> dict[str, str] | None:
     """Retrieves the user information from cookies or Google OAuth flow.
@@ -89,7 +94,7 @@ def encrypt_user(user: dict[str, str]) -> str:
 
     """
     user_json = json.dumps(user)
-    fernet = Fernet(st.secrets["cookies_fernet_key"])
+    fernet = get_fernet(st.secrets["cookies_fernet_key"])
     return fernet.encrypt(user_json.encode()).decode()
 
 
@@ -100,11 +105,24 @@ def decrypt_user(user: str) -> dict[str, str]:
         user (str): The encrypted user information to decrypt.
 
     """
-    fernet = Fernet(st.secrets["cookies_fernet_key"])
+    fernet = get_fernet(st.secrets["cookies_fernet_key"])
     user_json = fernet.decrypt(user).decode()
     return json.loads(user_json)
 
 
+@functools.cache
+def get_fernet(key: str) -> "Fernet":
+    """Returns the Fernet instance for the key, created once per key as the user cookie is decrypted on every rerun.
+
+    Args:
+        key (str): The Fernet key.
+
+    """
+    from cryptography.fernet import Fernet  # pylint: disable=C0415
+
+    return Fernet(key)
+
+
 def get_user_info(access_token: str) -> dict[str, str] | None:
     """Retrieves user information from Google API using the access token.
 
@@ -129,10 +147,14 @@ def get_user_info(access_token: str) -> dict[str, str] | None:
     return None
 
 
-def get_google_auth_flow() -> Flow:
+def get_google_auth_flow() -> "Flow":
     """Returns Google OAuth flow object for authentication."""
+    from google_auth_oauthlib.flow import Flow  # pylint: disable=C0415
+
+    from components.gsheet import get_oauth_client_config  # pylint: disable=C0415
+
     return Flow.from_client_config(
-        json.loads(st.secrets["google_oauth_client_config"]),
+        get_oauth_client_config(),
         scopes=[
             "openid",
             "https://www.googleapis.com/auth/userinfo.email",
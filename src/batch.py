@@ -0,0 +1,496 @@
+import abc
+import time
+import tomllib
+from pathlib import Path
+from typing import Any, Callable, TypedDict
+
+import gspread
+from google.oauth2.service_account import Credentials
+
+import components
+import utils
+from pages import (
+    gsheet_cluster_keywords,
+    gsheet_detect_language,
+    gsheet_find_duplicates,
+    gsheet_highlight_rows,
+)
+
+# The number of seconds between polls of the running jobs.
+POLL_INTERVAL = 0.5
+# The minimum number of seconds between two progress lines of the same job in the console.
+PROGRESS_INTERVAL = 10.0
+# The keys of a job in the manifest that aren't settings of the tool.
+JOB_KEYS = ("name", "url", "worksheet")
+
+
+class ManifestError(ValueError):
+    """Raised when the manifest of a batch run is invalid."""
+
+
+class Tool(TypedDict):
+    """A dictionary describing how a tool runs on a worksheet without its page.
+
+    Attributes:
+        job (str): The name of the job of the tool, as used by its page.
+        column (str): The setting with the name of the column the data is extracted from.
+        settings (dict[str, Any]): The settings of the tool and their defaults, None for required settings.
+        stages (Callable[[dict[str, Any]], list[components.Stage]]): Returns the stages that run
+            after the retrieval of the worksheet for the settings.
+
+    """
+
+    job: str
+    column: str
+    settings: dict[str, Any]
+    stages: Callable[[dict[str, Any]], list[components.Stage]]
+
+
+class BatchJob(TypedDict):
+    """A dictionary with a worksheet to run the tool on and the settings of the run.
+
+    Attributes:
+        name (str): The name of the job in the reports.
+        url (str): The URL of the Google Sheets document.
+        worksheet (str): The name of the worksheet.
+        settings (dict[str, Any]): The settings of the tool.
+
+    """
+
+    name: str
+    url: str
+    worksheet: str
+    settings: dict[str, Any]
+
+
+class JobSummary(TypedDict):
+    """A dictionary with the result and the resources used by a job of a batch run.
+
+    Attributes:
+        name (str): The name of the job.
+        url (str): The URL of the Google Sheets document.
+        worksheet (str): The name of the worksheet.
+        state (utils.JobState): How the job ended.
+        wall_seconds (float): The duration of the stages of the job, without the time it was queued.
+        rows (int | None): The number of extracted rows, if the tool extracts the whole column.
+        api_calls (int): The number of Sheets API requests of the job.
+        error (str | None): The error that stopped the job, if any.
+        stages (list[utils.StageMetrics]): The metrics of each completed or failed stage.
+
+    """
+
+    name: str
+    url: str
+    worksheet: str
+    state: utils.JobState
+    wall_seconds: float
+    rows: int | None
+    api_calls: int
+    error: str | None
+    stages: list[utils.StageMetrics]
+
+
+def _get_detect_language_stages(settings: dict[str, Any]) -> list[components.Stage]:
+    """Returns the stages of Detect Language, rejecting the settings its page doesn't allow."""
+    if settings["streaming"] and settings["incremental"]:
+        raise ManifestError("Incremental mode of Detect Language can't be combined with streaming mode.")
+    return gsheet_detect_language.get_stages(settings["streaming"])
+
+
+TOOLS: dict[str, Tool] = {
+    "detect-language": {
+        "job": "gsheet_detect_language",
+        "column": "source_column",
+        "settings": {
+            "source_column": None,
+            "destination_column": "Detected Language",
+            "detector": "langdetect",
+            "streaming": False,
+            "incremental": False,
+        },
+        "stages": _get_detect_language_stages,
+    },
+    "highlight-rows": {
+        "job": "gsheet_highlight_rows",
+        "column": "group_column",
+        "settings": {"group_column": None, "conditional": False, "incremental": False, "dtype": "category"},
+        "stages": lambda settings: gsheet_highlight_rows.get_stages(settings["conditional"], settings["incremental"]),
+    },
+    "cluster-keywords": {
+        "job": "gsheet_cluster_keywords",
+        "column": "source_column",
+        "settings": {
+            "source_column": None,
+            "destination_column": "Cluster",
+            "analyzer": "char",
+            "threshold": gsheet_cluster_keywords.DEFAULT_THRESHOLD,
+        },
+        "stages": lambda settings: gsheet_cluster_keywords.get_stages(),
+    },
+    "find-duplicates": {
+        "job": "gsheet_find_duplicates",
+        "column": "source_column",
+        "settings": {
+            "source_column": None,
+            "destination_column": "Canonical Keyword",
+            "threshold": gsheet_find_duplicates.DEFAULT_THRESHOLD,
+            "highlight": False,
+        },
+        "stages": lambda settings: gsheet_find_duplicates.get_stages(settings["highlight"]),
+    },
+}
+
+
+def load_manifest(path: Path) -> dict[str, Any]:
+    """Returns the parsed TOML manifest of a batch run.
+
+    Args:
+        path (Path): The path of the manifest.
+
+    """
+    try:
+        with path.open("rb") as file:
+            return tomllib.load(file)
+    except (OSError, tomllib.TOMLDecodeError) as error:
+        raise ManifestError(f"Can't read the manifest {path}: {error}") from error
+
+
+def get_batch_jobs(manifest: dict[str, Any], tool: Tool) -> list[BatchJob]:
+    """Returns the jobs of the manifest with their settings, validated against the settings of the tool.
+
+    The settings of a job are the defaults of the tool, overridden by the `defaults` table of the manifest
+    and then by the keys of the job itself.
+
+    Args:
+        manifest (dict[str, Any]): The parsed manifest.
+        tool (Tool): The tool to run.
+
+    """
+    if not manifest.get("jobs"):
+        raise ManifestError("The manifest has no [[jobs]].")
+
+    batch_jobs: list[BatchJob] = []
+    for idx, job in enumerate(manifest["jobs"], start=1):
+        name = str(job.get("name", f"job-{idx}"))
+        settings = {**tool["settings"], **manifest.get("defaults", {})}
+        settings.update((key, value) for key, value in job.items() if key not in JOB_KEYS)
+        if missing := [key for key in ("url", "worksheet") if not job.get(key)]:
+            raise ManifestError(f"Job {name} has no {" or ".join(missing)}.")
+        _validate_settings(name, settings, tool["settings"])
+        # The stages reject combinations of settings the page doesn't allow, before any job starts.
+        tool["stages"](settings)
+        batch_jobs.append({"name": name, "url": job["url"], "worksheet": job["worksheet"], "settings": settings})
+    return batch_jobs
+
+
+def _validate_settings(name: str, settings: dict[str, Any], defaults: dict[str, Any]) -> None:
+    """Raises `ManifestError` for unknown and missing settings, and for values of another type than the default."""
+    if unknown := settings.keys() - defaults.keys():
+        raise ManifestError(f"Job {name} has unknown settings: {", ".join(sorted(unknown))}.")
+    for key, value in settings.items():
+        default = defaults[key]
+        if value is None:
+            raise ManifestError(f"Job {name} has no {key}.")
+        # Integers are valid thresholds, as TOML distinguishes `1` from `1.0`.
+        types = (float, int) if isinstance(default, float) else (type(default),)
+        if default is not None and not isinstance(value, types):
+            raise ManifestError(f"Job {name} has an invalid {key}: {value!r}.")
+
+
+class Reporter(abc.ABC):
+    """Interface of the reports of a batch run, called from the thread polling the jobs."""
+
+    name: str
+
+    @abc.abstractmethod
+    def job_started(self, batch_job: BatchJob, job: utils.Job) -> None:
+        """Reports that a job left the queue.
+
+        Args:
+            batch_job (BatchJob): The job of the manifest.
+            job (utils.Job): The running job.
+
+        """
+
+    @abc.abstractmethod
+    def stage_completed(self, batch_job: BatchJob, metrics: utils.StageMetrics) -> None:
+        """Reports the metrics of a completed or failed stage.
+
+        Args:
+            batch_job (BatchJob): The job of the manifest.
+            metrics (utils.StageMetrics): The metrics of the stage.
+
+        """
+
+    @abc.abstractmethod
+    def progress(self, batch_job: BatchJob, progress: utils.JobProgress) -> None:
+        """Reports the progress of the current stage of a job.
+
+        Args:
+            batch_job (BatchJob): The job of the manifest.
+            progress (utils.JobProgress): The progress of the stage.
+
+        """
+
+    @abc.abstractmethod
+    def job_finished(self, summary: JobSummary) -> None:
+        """Reports how a job ended.
+
+        Args:
+            summary (JobSummary): The summary of the job.
+
+        """
+
+    @abc.abstractmethod
+    def batch_finished(self, summaries: list[JobSummary], wall_seconds: float) -> None:
+        """Reports the summary of all jobs.
+
+        Args:
+            summaries (list[JobSummary]): The summaries of the jobs, in the order of the manifest.
+            wall_seconds (float): The duration of the batch run.
+
+        """
+
+
+class ConsoleReporter(Reporter):
+    """Prints readable progress lines and a table of the jobs at the end."""
+
+    name = "console"
+
+    def __init__(self) -> None:
+        self._progress_printed_at: dict[str, float] = {}
+
+    def job_started(self, batch_job: BatchJob, job: utils.Job) -> None:
+        print(f"[{batch_job["name"]}] Started on {batch_job["worksheet"]} of {batch_job["url"]}", flush=True)
+
+    def stage_completed(self, batch_job: BatchJob, metrics: utils.StageMetrics) -> None:
+        mark = "✓" if metrics["status"] == "ok" else "✗"
+        print(f"[{batch_job["name"]}] {mark} {metrics["stage"]} · {utils.format_metrics(metrics)}", flush=True)
+
+    def progress(self, batch_job: BatchJob, progress: utils.JobProgress) -> None:
+        now = time.monotonic()
+        if now - self._progress_printed_at.get(batch_job["name"], 0.0) < PROGRESS_INTERVAL:
+            return
+        self._progress_printed_at[batch_job["name"]] = now
+        print(
+            f"[{batch_job["name"]}] {progress["label"]} ({progress["processed"]}/{progress["total"]})"
+            f"{progress["details"]}",
+            flush=True,
+        )
+
+    def job_finished(self, summary: JobSummary) -> None:
+        error = f": {summary["error"]}" if summary["error"] else ""
+        print(
+            f"[{summary["name"]}] {summary["state"].capitalize()} in {summary["wall_seconds"]:.1f} s{error}", flush=True
+        )
+
+    def batch_finished(self, summaries: list[JobSummary], wall_seconds: float) -> None:
+        rows = [["Job", "State", "Seconds", "Rows", "API calls", "Error"]] + [
+            [
+                summary["name"],
+                summary["state"],
+                f"{summary["wall_seconds"]:.1f}",
+                "" if summary["rows"] is None else str(summary["rows"]),
+                str(summary["api_calls"]),
+                summary["error"] or "",
+            ]
+            for summary in summaries
+        ]
+        widths = [max(len(row[idx]) for row in rows) for idx in range(len(rows[0]))]
+        print()
+        for row in rows:
+            print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+        completed = sum(summary["state"] == "completed" for summary in summaries)
+        print(f"\n{completed} of {len(summaries)} jobs completed in {utils.format_duration(wall_seconds)}.", flush=True)
+
+
+class LogReporter(Reporter):
+    """Emits every event as a JSON log line, next to the metrics of the stages logged by `components.run_stage`."""
+
+    name = "log"
+
+    def job_started(self, batch_job: BatchJob, job: utils.Job) -> None:
+        utils.log_event("job_started", name=batch_job["name"], job_id=job.id, url=batch_job["url"])
+
+    def stage_completed(self, batch_job: BatchJob, metrics: utils.StageMetrics) -> None:
+        # The metrics of every stage are already logged when the stage ends.
+        return
+
+    def progress(self, batch_job: BatchJob, progress: utils.JobProgress) -> None:
+        utils.log_event("job_progress", name=batch_job["name"], **progress)
+
+    def job_finished(self, summary: JobSummary) -> None:
+        utils.log_event("job_finished", **{key: value for key, value in summary.items() if key != "stages"})
+
+    def batch_finished(self, summaries: list[JobSummary], wall_seconds: float) -> None:
+        states = [summary["state"] for summary in summaries]
+        utils.log_event(
+            "batch_finished",
+            jobs=len(summaries),
+            **{state: states.count(state) for state in sorted(set(states))},
+            wall_seconds=round(wall_seconds, 3),
+        )
+
+
+REPORTERS: dict[str, type[Reporter]] = {
+    ConsoleReporter.name: ConsoleReporter,
+    LogReporter.name: LogReporter,
+}
+
+
+def run_batch(  # pylint: disable=R0913,R0917
+    tool_name: str,
+    batch_jobs: list[BatchJob],
+    credentials: Credentials,
+    reporter: Reporter,
+    workers: int = 4,
+    quota: utils.QuotaConfig | None = None,
+) -> list[JobSummary]:
+    """Runs the tool on the worksheets of the jobs and returns the summary of every job.
+
+    The jobs run on a pool of `workers` threads, like the background jobs of the app. All of them use the same
+    account, so their requests share one scheduler and stay within the Sheets API quotas of the account together.
+    An interrupt cancels the jobs, which stop at their next progress update or stage boundary.
+
+    Args:
+        tool_name (str): The name of the tool in `TOOLS`.
+        batch_jobs (list[BatchJob]): The jobs to run.
+        credentials (Credentials): The credentials of the service account the spreadsheets are shared with.
+        reporter (Reporter): The reporter of the progress and the results.
+        workers (int): The number of jobs running at the same time. Defaults to 4.
+        quota (utils.QuotaConfig | None): The Sheets API quotas of the account. Defaults to `utils.DEFAULT_QUOTA`.
+
+    """
+    started_at = time.perf_counter()
+    # Jobs are limited by the pool alone, as they all belong to the same account.
+    runner = utils.JobRunner(workers, max_jobs_per_user=workers)
+    scheduler = utils.get_scheduler(credentials.service_account_email, quota)
+    jobs = [
+        (batch_job, *_submit_job(runner, TOOLS[tool_name], batch_job, credentials, scheduler))
+        for batch_job in batch_jobs
+    ]
+
+    watcher = _JobWatcher(jobs, reporter)
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        for _, job, _ in jobs:
+            job.cancel()
+        watcher.watch()
+
+    summaries = [_get_summary(batch_job, job, results) for batch_job, job, results in jobs]
+    reporter.batch_finished(summaries, time.perf_counter() - started_at)
+    return summaries
+
+
+def _get_worksheet_func(
+    credentials: Credentials, scheduler: utils.SheetsScheduler, url: str, worksheet_name: str
+) -> Callable[[], gspread.Worksheet]:
+    """Returns a function that opens the worksheet with a client of its own, sending requests through the scheduler.
+
+    Every job has its own HTTP session, so the traffic in the metrics of its stages belongs to the job alone.
+    """
+
+    def get_worksheet() -> gspread.Worksheet:
+        client = gspread.Client(credentials)
+        client.http_client = utils.ScheduledHTTPClient(credentials, scheduler=scheduler)
+        return client.open_by_url(url).worksheet(worksheet_name)
+
+    return get_worksheet
+
+
+def _submit_job(
+    runner: utils.JobRunner,
+    tool: Tool,
+    batch_job: BatchJob,
+    credentials: Credentials,
+    scheduler: utils.SheetsScheduler,
+) -> tuple[utils.Job, dict[str, int | None]]:
+    """Submits a job that runs the stages of the tool one after another, like the background jobs of the app.
+
+    The context of the stages lives only while the job runs, so a batch run holds the data of at most
+    `workers` worksheets at once. What the summary needs is recorded in the results when the job ends.
+
+    Returns:
+        tuple[utils.Job, dict[str, int | None]]: The submitted job and its results, the number of `rows`.
+
+    """
+    stages: list[components.Stage] = [
+        {
+            "name": "Retrieving worksheet",
+            "func": components.return_stage_context("worksheet")(
+                _get_worksheet_func(credentials, scheduler, batch_job["url"], batch_job["worksheet"])
+            ),
+        },
+        *tool["stages"](batch_job["settings"]),
+    ]
+    results: dict[str, int | None] = {"rows": None}
+
+    def run(job: utils.Job) -> None:
+        context = {**batch_job["settings"], "columns": [batch_job["settings"][tool["column"]]]}
+        try:
+            for idx, stage in enumerate(stages):
+                job.set_stage(idx)
+                log_fields = {"job": tool["job"], "job_id": job.id, "name": batch_job["name"]}
+                components.run_stage(stage, context, log_fields=log_fields, results=job.metrics)
+        finally:
+            results["rows"] = len(context["df"]) if "df" in context else None
+
+    user_key = credentials.service_account_email
+    return runner.submit(user_key, tool["job"], [stage["name"] for stage in stages], run), results
+
+
+class _JobWatcher:  # pylint: disable=R0903
+    """Polls the jobs of a batch run and reports what changed since the last poll."""
+
+    def __init__(self, jobs: list[tuple[BatchJob, utils.Job, dict[str, int | None]]], reporter: Reporter) -> None:
+        self.jobs = jobs
+        self.reporter = reporter
+        self._started: set[str] = set()
+        self._finished: set[str] = set()
+        self._reported_stages: dict[str, int] = {}
+        self._reported_progress: dict[str, utils.JobProgress] = {}
+
+    def watch(self) -> None:
+        """Reports the changes of the jobs until all of them are done."""
+        while True:
+            for batch_job, job, results in self.jobs:
+                if job.id not in self._finished and job.state != "queued":
+                    self._report(batch_job, job, results)
+            if len(self._finished) == len(self.jobs):
+                return
+            time.sleep(POLL_INTERVAL)
+
+    def _report(self, batch_job: BatchJob, job: utils.Job, results: dict[str, int | None]) -> None:
+        """Reports the changes of a job that left the queue."""
+        # The state is read before the metrics, so all metrics of a finished job are reported.
+        done = job.done
+        metrics = job.metrics[slice(self._reported_stages.get(job.id, 0), None)]
+        if job.id not in self._started and (metrics or not done):
+            self._started.add(job.id)
+            self.reporter.job_started(batch_job, job)
+        for stage_metrics in metrics:
+            self.reporter.stage_completed(batch_job, stage_metrics)
+        self._reported_stages[job.id] = self._reported_stages.get(job.id, 0) + len(metrics)
+
+        if not done and (progress := job.progress) and progress is not self._reported_progress.get(job.id):
+            self._reported_progress[job.id] = progress
+            self.reporter.progress(batch_job, progress)
+        if done:
+            self._finished.add(job.id)
+            self.reporter.job_finished(_get_summary(batch_job, job, results))
+
+
+def _get_summary(batch_job: BatchJob, job: utils.Job, results: dict[str, int | None]) -> JobSummary:
+    """Returns the summary of a finished job."""
+    return {
+        "name": batch_job["name"],
+        "url": batch_job["url"],
+        "worksheet": batch_job["worksheet"],
+        "state": job.state,
+        "wall_seconds": round(sum(metrics["wall_seconds"] for metrics in job.metrics), 3),
+        "rows": results["rows"],
+        "api_calls": sum(metrics["api_calls"] or 0 for metrics in job.metrics),
+        "error": f"{job.error_type}: {job.error}" if job.error is not None else None,
+        "stages": job.metrics,
+    }
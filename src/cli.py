@@ -0,0 +1,86 @@
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import cast
+
+import gspread
+from google.oauth2.service_account import Credentials
+from streamlit import config
+
+import batch
+import utils
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Parses the command line arguments.
+
+    Args:
+        args (list[str] | None): The arguments. Defaults to None, which parses `sys.argv`.
+
+    """
+    parser = argparse.ArgumentParser(description="Runs the Google Sheets tools without the app.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Runs a tool on every worksheet of a manifest.")
+    run.add_argument("tool", choices=list(batch.TOOLS), help="The tool to run.")
+    run.add_argument("--manifest", type=Path, required=True, help="The TOML manifest with the jobs.")
+    run.add_argument(
+        "--workers",
+        type=int,
+        help="The number of worksheets processed at the same time. Defaults to `workers` of the manifest, or 4.",
+    )
+    run.add_argument(
+        "--reporter", choices=list(batch.REPORTERS), default="console", help="How progress and results are reported."
+    )
+    run.add_argument("--summary", type=Path, help="Saves the summary of every job to this JSON file.")
+    return parser.parse_args(args)
+
+
+def main(args: list[str] | None = None) -> int:
+    """Runs the tool on the worksheets of the manifest and returns the exit code.
+
+    The manifest is also read as a Streamlit secrets file, so settings of the app like `sheets_quota` and
+    `language_detection_workers` apply to batch runs as well.
+
+    Args:
+        args (list[str] | None): The command line arguments. Defaults to None, which parses `sys.argv`.
+
+    Returns:
+        int: 0 if all jobs completed, 1 if any job failed or was cancelled, and 2 for an invalid manifest.
+
+    """
+    parsed = parse_args(args)
+    try:
+        manifest = batch.load_manifest(parsed.manifest)
+        batch_jobs = batch.get_batch_jobs(manifest, batch.TOOLS[parsed.tool])
+        if "credentials" not in manifest:
+            raise batch.ManifestError("The manifest has no credentials of a service account.")
+        credentials = Credentials.from_service_account_file(
+            parsed.manifest.parent / manifest["credentials"], scopes=gspread.auth.DEFAULT_SCOPES
+        )
+    # Invalid manifests raise `batch.ManifestError`, and invalid service account keys a `ValueError` as well.
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    config.set_option("secrets.files", [*config.get_option("secrets.files"), str(parsed.manifest)])
+    if parsed.reporter == "console":
+        # The console reporter prints the metrics of the stages itself, so they aren't logged as JSON as well.
+        logging.getLogger(utils.log_metrics.__module__).setLevel(logging.WARNING)
+
+    summaries = batch.run_batch(
+        parsed.tool,
+        batch_jobs,
+        credentials,
+        batch.REPORTERS[parsed.reporter](),
+        workers=parsed.workers or manifest.get("workers", 4),
+        quota=cast(utils.QuotaConfig, {**utils.DEFAULT_QUOTA, **manifest.get("sheets_quota", {})}),
+    )
+    if parsed.summary:
+        parsed.summary.write_text(json.dumps(summaries, indent=2, default=str), encoding="utf-8")
+    return 0 if all(summary["state"] == "completed" for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,37 @@
-from .card import card_grid
-from .gsheet import gsheet_selector
-from .image import example_image
-from .status import progress_status, return_stage_context, stage_status
+from typing import TYPE_CHECKING
+
+from utils import lazy_exports
+
+if TYPE_CHECKING:
+    from .card import card_grid
+    from .gsheet import gsheet_selector
+    from .image import example_image
+    from .jobs import job_status
+    from .metrics import stage_metrics
+    from .status import (
+        Stage,
+        pending_stage_status,
+        progress_status,
+        return_stage_context,
+        run_stage,
+        stage_status,
+    )
+
+# Submodules are imported on first use of one of their names, so the Home page doesn't import the Google Sheets
+# components and their dependencies.
+_SUBMODULES = {
+    "card": ("card_grid",),
+    "gsheet": ("gsheet_selector",),
+    "image": ("example_image",),
+    "jobs": ("job_status",),
+    "metrics": ("stage_metrics",),
+    "status": (
+        "Stage",
+        "pending_stage_status",
+        "progress_status",
+        "return_stage_context",
+        "run_stage",
+        "stage_status",
+    ),
+}
+__getattr__, __dir__ = lazy_exports(__name__, _SUBMODULES)
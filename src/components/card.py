@@ -1,13 +1,18 @@
-from typing import TypedDict
+import io
+from typing import NotRequired, TypedDict
 
 import streamlit as st
+from PIL import Image
+
+# The width of card images in pixels, about twice the width of a card for sharp images on high-density displays.
+THUMBNAIL_WIDTH = 400
 
 
 class Card(TypedDict):
     """A dictionary representing a card.
 
     Attributes:
-        image (str): The URL of the image to display on the card.
+        image (NotRequired[str]): The path of the image to display on the card, if there is one.
         page (str): Streamlit page link (just python module).
         label (str): The label for page link.
         icon (str): The icon for page link.
@@ -15,7 +20,7 @@ class Card(TypedDict):
 
     """
 
-    image: str
+    image: NotRequired[str]
     page: str
     label: str
     icon: str
@@ -35,7 +40,8 @@ def card_grid(cards: list[Card], num_columns: int = 2) -> None:
     for idx, card in enumerate(cards):
         with card_columns[idx % num_columns]:
             with st.container(border=True):
-                st.image(card["image"])
+                if "image" in card:
+                    st.image(get_thumbnail(card["image"]))
                 st.page_link(
                     card["page"],
                     label=f"**{card["label"]}**",
@@ -43,3 +49,19 @@ def card_grid(cards: list[Card], num_columns: int = 2) -> None:
                     use_container_width=True,
                 )
                 st.write(f"*{card["description"]}*")
+
+
+@st.cache_data(show_spinner=False)
+def get_thumbnail(path: str, width: int = THUMBNAIL_WIDTH) -> bytes:
+    """Returns the image downscaled to the width as WebP, generated once per process instead of on every render.
+
+    Args:
+        path (str): The path of the image.
+        width (int): The maximum width of the thumbnail in pixels. Defaults to `THUMBNAIL_WIDTH`.
+
+    """
+    with Image.open(path) as image:
+        image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "WEBP", quality=85)
+    return buffer.getvalue()
@@ -1,10 +1,14 @@
+import copy
+import hashlib
 import json
-from typing import Callable
+from typing import Any, Callable, cast
 
 import gspread
 import streamlit as st
 from google.oauth2.credentials import Credentials
 
+import utils
+
 
 def gsheet_selector() -> Callable[[], gspread.Worksheet] | None:
     """Component to select a Google Sheets document and worksheet.
@@ -26,16 +30,98 @@ def gsheet_selector() -> Callable[[], gspread.Worksheet] | None:
         return None
 
     def get_worksheet() -> gspread.Worksheet:
-        google_oauth_client_config = json.loads(st.secrets["google_oauth_client_config"])
-        credentials = Credentials(
-            token=None,
-            refresh_token=st.session_state["user"]["refresh_token"],
-            token_uri=google_oauth_client_config["web"]["token_uri"],
-            client_id=google_oauth_client_config["web"]["client_id"],
-            client_secret=google_oauth_client_config["web"]["client_secret"],
-        )
-        client = gspread.Client(credentials)
-        sheet = client.open_by_url(document_url)
-        return sheet.worksheet(worksheet_name)
+        user_key = cast(str, get_user_key())
+        client = get_client(user_key, st.session_state["user"]["refresh_token"])
+        return open_worksheet(user_key, document_url, worksheet_name, client)
 
     return get_worksheet
+
+
+def get_user_key() -> str | None:
+    """Returns the key identifying the logged in user, or None if nobody is logged in."""
+    if not st.session_state.get("user"):
+        return None
+    # The key is a hash of the refresh token, so the token itself is never used as a cache or job key.
+    return hashlib.sha256(st.session_state["user"]["refresh_token"].encode()).hexdigest()
+
+
+@st.cache_resource(max_entries=256, ttl=3600, show_spinner=False)
+def get_client(user_key: str, _refresh_token: str) -> gspread.Client:
+    """Returns the gspread client of a user, shared across reruns and sessions.
+
+    The client keeps its credentials and HTTP session, so the access token is reused until it expires
+    and connections are pooled instead of being opened for every run.
+
+    Args:
+        user_key (str): The hash of the refresh token, used as the cache key.
+        _refresh_token (str): The refresh token of the user.
+
+    """
+    google_oauth_client_config = get_oauth_client_config()
+    credentials = Credentials(
+        token=None,
+        refresh_token=_refresh_token,
+        token_uri=google_oauth_client_config["web"]["token_uri"],
+        client_id=google_oauth_client_config["web"]["client_id"],
+        client_secret=google_oauth_client_config["web"]["client_secret"],
+    )
+    client = gspread.Client(credentials)
+    # All requests of the user share one scheduler, which keeps them within the Sheets API quotas.
+    client.http_client = utils.ScheduledHTTPClient(
+        credentials, scheduler=utils.get_scheduler(user_key, get_sheets_quota())
+    )
+    return client
+
+
+def open_worksheet(user_key: str, document_url: str, worksheet_name: str, client: gspread.Client) -> gspread.Worksheet:
+    """Returns a new handle of the worksheet, built from its cached metadata.
+
+    Every call returns a handle of its own, as the tools update the grid size of their handle, and runs of the
+    same user in several sessions or background jobs can run at the same time.
+
+    Args:
+        user_key (str): The hash of the refresh token, so metadata is never shared between users.
+        document_url (str): The URL of the Google Sheets document.
+        worksheet_name (str): The name of the worksheet.
+        client (gspread.Client): The client of the user.
+
+    """
+    spreadsheet, properties = get_worksheet_metadata(user_key, document_url, worksheet_name, client)
+    return gspread.Worksheet(spreadsheet, copy.deepcopy(properties), spreadsheet.id, spreadsheet.client)
+
+
+@st.cache_resource(max_entries=256, ttl=60, show_spinner=False)
+def get_worksheet_metadata(  # pylint: disable=W0613
+    user_key: str, document_url: str, worksheet_name: str, _client: gspread.Client
+) -> tuple[gspread.Spreadsheet, dict[str, Any]]:
+    """Returns the spreadsheet and the properties of the worksheet, cached to skip the metadata requests.
+
+    The metadata is reused for a short time on repeated runs. The returned objects are shared between the sessions
+    and the background jobs of the user, so they must not be changed.
+
+    Args:
+        user_key (str): The hash of the refresh token, so metadata is never shared between users.
+        document_url (str): The URL of the Google Sheets document.
+        worksheet_name (str): The name of the worksheet.
+        _client (gspread.Client): The client of the user.
+
+    Raises:
+        gspread.WorksheetNotFound: If the document has no worksheet with the name.
+
+    """
+    spreadsheet = _client.open_by_url(document_url)
+    for sheet in spreadsheet.fetch_sheet_metadata()["sheets"]:
+        if sheet["properties"]["title"] == worksheet_name:
+            return spreadsheet, sheet["properties"]
+    raise gspread.WorksheetNotFound(worksheet_name)
+
+
+@st.cache_resource(show_spinner=False)
+def get_oauth_client_config() -> dict[str, Any]:
+    """Returns the Google OAuth client config from the secrets, parsed once instead of on every login and run."""
+    return json.loads(st.secrets["google_oauth_client_config"])
+
+
+def get_sheets_quota() -> utils.QuotaConfig:
+    """Returns the Sheets API quotas, overridden by the optional `sheets_quota` secret."""
+    return cast(utils.QuotaConfig, {**utils.DEFAULT_QUOTA, **st.secrets.get("sheets_quota", {})})
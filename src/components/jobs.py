@@ -0,0 +1,66 @@
+from typing import Literal
+
+import streamlit as st
+
+import utils
+
+from .metrics import stage_metrics
+
+# Seconds between refreshes of the status of a running job.
+POLL_INTERVAL = 1.0
+
+JOB_LABELS = {
+    "queued": "Waiting for other jobs to finish...",
+    "running": "In progress...",
+    "completed": "Successfully completed!",
+    "failed": "An error occurred.",
+    "cancelled": "Cancelled.",
+}
+
+
+def job_status(job: utils.Job) -> None:
+    """Displays the status of a background job, refreshing it while the job is queued or running.
+
+    Args:
+        job (utils.Job): The job to display.
+
+    """
+    st.fragment(_job_status, run_every=None if job.done else POLL_INTERVAL)(job, polling=not job.done)
+
+
+def _job_status(job: utils.Job, polling: bool) -> None:
+    """Renders the stages and progress of the job."""
+    state: Literal["running", "complete", "error"] = (
+        "error" if job.state == "failed" else "complete" if job.done else "running"
+    )
+    with st.status(JOB_LABELS[job.state], state=state, expanded=job.state != "completed"):
+        metrics = {stage_metrics["stage"]: stage_metrics for stage_metrics in job.metrics}
+        for idx, name in enumerate(job.stages):
+            if (idx < job.stage or job.state == "completed") and name in metrics:
+                stage_metrics(metrics[name])
+            elif idx < job.stage or job.state == "completed":
+                st.badge(name, color="green", icon=":material/check:")
+            elif idx > job.stage or job.state == "queued":
+                st.badge(name, color="gray", icon=":material/schedule:")
+            elif job.state == "running":
+                st.badge(name, color="blue", icon=":material/progress_activity:")
+                if progress := job.progress:
+                    st.progress(
+                        value=progress["processed"] / max(progress["total"], 1),
+                        text=f"{progress["label"]} ({progress["processed"]}/{progress["total"]}){progress["details"]}",
+                    )
+            elif job.state == "cancelled":
+                st.badge(name, color="orange", icon=":material/cancel:")
+            else:
+                st.badge(name, color="red", icon=":material/close:")
+
+        if job.error is not None:
+            st.error(f"{job.error_type}: {job.error}", icon="🚨")
+        if job.state in ("failed", "cancelled"):
+            st.caption("The progress is saved, so the job can be resumed by running the tool again.")
+
+    if not job.done:
+        st.button("Cancel", key=f"cancel_{job.id}", on_click=job.cancel, disabled=job.cancelled)
+    elif polling:
+        # The job finished since the last refresh, so the whole page is rerun to stop polling.
+        st.rerun()
@@ -0,0 +1,17 @@
+import streamlit as st
+
+import utils
+
+
+def stage_metrics(metrics: utils.StageMetrics) -> None:
+    """Displays the badge of a completed stage with its metrics and profile, if the stage was profiled.
+
+    Args:
+        metrics (utils.StageMetrics): The metrics of the stage.
+
+    """
+    st.badge(metrics["stage"], color="green", icon=":material/check:")
+    st.caption(utils.format_metrics(metrics))
+    if metrics["profile"]:
+        with st.expander(f"Profile of {metrics["stage"]}"):
+            st.code(metrics["profile"], language=None)
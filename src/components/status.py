@@ -1,9 +1,19 @@
 import functools
+import hashlib
 import inspect
-from typing import Any, Callable, Iterator, TypedDict
+import json
+import time
+from typing import Any, Callable, Iterator, TypedDict, cast
 
+import gspread
 import streamlit as st
 
+import utils
+
+from .gsheet import get_user_key
+from .jobs import job_status
+from .metrics import stage_metrics
+
 
 def return_stage_context(key: str) -> Callable[[Callable[..., Any]], Callable[..., dict[str, Any]]]:
     """Decorator to return a dictionary with a specific key and the result of the function.
@@ -38,37 +48,188 @@ class Stage(TypedDict):
     func: Callable[..., dict[str, Any] | None]
 
 
-def stage_status(stages: list[Stage], context: dict[str, Any] | None = None) -> None:
+def stage_status(stages: list[Stage], context: dict[str, Any] | None = None, job: str | None = None) -> None:
     """Displays the status for few stages.
 
+    When a job name is given, only the stages up to the retrieval of the worksheet run in the page. The rest
+    of the stages is submitted as a background job, so it survives reruns and closed tabs, and its status is
+    polled by the page. Background jobs are checkpointed: the context is saved after every stage, and stages with
+    a `checkpoint` parameter can save their own progress. If an earlier run of the job on the same worksheet and
+    with the same settings was interrupted, the user is asked whether to resume it, and the stages wait until
+    `pending_stage_status` is called on the next rerun. While a job of the user on the same worksheet is still
+    running, e.g. after a reload of the page, that job is shown instead of submitting another one.
+
     Args:
         stages (list[Stage]): A list of stages to be executed.
         context (dict[str, Any] | None): A dictionary containing the context for the stages. Defaults to None.
+        job (str | None): The name of the tool, used to run the stages in the background. Defaults to None.
 
     """
+    full_context = context.copy() if context else {}
+    fingerprint = hashlib.sha256(json.dumps(full_context, sort_keys=True, default=str).encode()).hexdigest()
+    resume = st.session_state.pop(f"resume_{job}", None)
+    background_job: utils.Job | None = None
+    profiler = _get_profiler()
+
     with st.status("In progress...", expanded=True) as status:
         try:
-            full_context = context.copy() if context else {}
-
-            for stage in stages:
-                func = stage["func"]
-                func_kwargs = {
-                    key: value for key, value in full_context.items() if key in inspect.signature(func).parameters
-                }
-                if new_context := func(**func_kwargs):
-                    full_context.update(new_context)
-
-                st.badge(stage["name"], color="green", icon=":material/check:")
+            for idx, stage in enumerate(stages):
+                stage_metrics(run_stage(stage, full_context, profiler=profiler, log_fields={"job": job}))
 
-            status.update(label="Successfully completed!", expanded=False)
+                if job and "worksheet" in full_context:
+                    user_key = cast(str, get_user_key())
+                    key = _get_checkpoint_key(job, user_key, full_context["worksheet"])
+                    # The checkpoint of a running job looks like an interrupted run, so the job is shown instead.
+                    if (running_job := _get_job_runner().find(user_key, job, key)) and not running_job.done:
+                        background_job = running_job
+                        status.update(label="Already running in the background.", state="complete", expanded=False)
+                        break
+                    checkpoint = utils.CheckpointStore().load(key)
+                    if checkpoint and checkpoint.fingerprint == fingerprint and resume is None:
+                        st.session_state[f"pending_stages_{job}"] = (stages, context)
+                        status.update(label="An interrupted run was found.", state="complete")
+                        _resume_prompt(job, checkpoint, stages)
+                        return
+                    if checkpoint and checkpoint.fingerprint == fingerprint and resume:
+                        full_context = {**checkpoint.context, **full_context}
+                    else:
+                        checkpoint = utils.Checkpoint(utils.CheckpointStore(), key, fingerprint, stage=idx)
+                        checkpoint.complete_stage(_get_stored_context(full_context))
+                    background_job = _submit_job(job, stages, full_context, checkpoint, profiler)
+                    status.update(label="Submitted to the background.", state="complete", expanded=False)
+                    break
+            else:
+                status.update(label="Successfully completed!", expanded=False)
         except Exception:
             st.badge(stage["name"], color="red", icon=":material/close:")
             status.update(label="An error occurred.")
             raise
 
+    if background_job:
+        job_status(background_job)
+
+
+def pending_stage_status(job: str) -> None:
+    """Displays the latest background job of the tool, or runs the stages waiting for the resume decision.
+
+    Args:
+        job (str): The name of the tool passed to `stage_status`.
+
+    """
+    if f"resume_{job}" in st.session_state and (pending := st.session_state.pop(f"pending_stages_{job}", None)):
+        stages, context = pending
+        stage_status(stages, context, job)
+    elif (user_key := get_user_key()) and (background_job := _get_job_runner().find(user_key, job)):
+        job_status(background_job)
+
+
+def run_stage(  # pylint: disable=R0913,R0917
+    stage: Stage,
+    context: dict[str, Any],
+    checkpoint: utils.Checkpoint | None = None,
+    profiler: utils.ProfilerName | None = None,
+    log_fields: dict[str, Any] | None = None,
+    results: list[utils.StageMetrics] | None = None,
+) -> utils.StageMetrics:
+    """Runs the stage with the matching values of the context and adds its results to the context.
+
+    The resources used by the stage are logged, returned and added to `results`, also when the stage fails.
+
+    Args:
+        stage (Stage): The stage to run.
+        context (dict[str, Any]): The context, updated with the results of the stage.
+        checkpoint (utils.Checkpoint | None): The checkpoint passed to stages with a `checkpoint` parameter.
+            Defaults to None.
+        profiler (utils.ProfilerName | None): The profiler to run during the stage. Defaults to None.
+        log_fields (dict[str, Any] | None): Additional fields of the logged metrics. Defaults to None.
+        results (list[utils.StageMetrics] | None): The list the metrics are added to. Defaults to None.
+
+    """
+    func = stage["func"]
+    parameters = inspect.signature(func).parameters
+    func_kwargs = {key: value for key, value in context.items() if key in parameters}
+    if "checkpoint" in parameters:
+        func_kwargs["checkpoint"] = checkpoint
+
+    def traffic() -> utils.TrafficStats | None:
+        return utils.get_traffic_stats(context["worksheet"]) if "worksheet" in context else None
+
+    def report(metrics: utils.StageMetrics) -> None:
+        utils.log_metrics(metrics, **(log_fields or {}))
+        if results is not None:
+            results.append(metrics)
+
+    with utils.measure_stage(stage["name"], traffic, profiler, report) as metrics:
+        if new_context := func(**func_kwargs):
+            context.update(new_context)
+    return metrics
+
+
+def _get_profiler() -> utils.ProfilerName | None:
+    """Returns the profiler enabled by the `profile` query parameter or the optional `profiler` secret."""
+    profiler = st.query_params.get("profile") or st.secrets.get("profiler")
+    return profiler if profiler in utils.PROFILERS else None
+
+
+def _submit_job(
+    name: str,
+    stages: list[Stage],
+    context: dict[str, Any],
+    checkpoint: utils.Checkpoint,
+    profiler: utils.ProfilerName | None = None,
+) -> utils.Job:
+    """Submits the stages after the last checkpointed one as a background job."""
+
+    def run(job: utils.Job) -> None:
+        for idx in range(checkpoint.stage, len(stages)):
+            job.set_stage(idx)
+            run_stage(stages[idx], context, checkpoint, profiler, {"job": name, "job_id": job.id}, job.metrics)
+            checkpoint.complete_stage(_get_stored_context(context))
+        checkpoint.delete()
+
+    user_key = cast(str, get_user_key())
+    background_job = _get_job_runner().submit(user_key, name, [stage["name"] for stage in stages], run, checkpoint.key)
+    background_job.stage = checkpoint.stage
+    return background_job
+
+
+def _get_job_runner() -> utils.JobRunner:
+    """Returns the job runner, configured by the optional `background_jobs` secret."""
+    return utils.get_job_runner(**st.secrets.get("background_jobs", {}))
+
+
+def _get_stored_context(context: dict[str, Any]) -> dict[str, Any]:
+    """Returns the context to checkpoint."""
+    # The worksheet holds the credentials of the user, so it is retrieved again instead of being stored.
+    return {key: value for key, value in context.items() if key != "worksheet"}
+
+
+def _resume_prompt(job: str, checkpoint: utils.Checkpoint, stages: list[Stage]) -> None:
+    """Asks the user whether to resume the interrupted run or to start over."""
+    stopped_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(checkpoint.updated_at))
+    progress = f", row {checkpoint.progress["row"]}" if "row" in checkpoint.progress else ""
+    st.info(
+        f"A previous run on this worksheet stopped at {stopped_at} during "
+        f"*{stages[min(checkpoint.stage, len(stages) - 1)]["name"]}*{progress}.",
+        icon="⏸️",
+    )
+    left, right = st.columns(2)
+    left.button("Resume", type="primary", on_click=st.session_state.__setitem__, args=(f"resume_{job}", True))
+    right.button("Start over", on_click=st.session_state.__setitem__, args=(f"resume_{job}", False))
+
+
+def _get_checkpoint_key(job: str, user_key: str, worksheet: gspread.Worksheet) -> str:
+    """Returns the key of the checkpoints of the job of the user on the worksheet."""
+    # Users of a shared sheet have their own checkpoints, so they aren't asked to resume each other's runs.
+    return f"{job}:{user_key}:{worksheet.spreadsheet_id}:{worksheet.id}"
+
 
 def progress_status[T](
-    label: str, total: int, func: Callable[..., Iterator[T]], context: dict[str, Any] | None = None
+    label: str,
+    total: int,
+    func: Callable[..., Iterator[T]],
+    context: dict[str, Any] | None = None,
+    stats: utils.SchedulerStats | None = None,
 ) -> Iterator[T]:
     """Displays a progress bar for a given function.
 
@@ -77,14 +238,43 @@ def progress_status[T](
         total (int): The total number of items to be processed.
         func (Callable[..., Iterator[T]]): The function to be executed. It should yield items.
         context (dict[str, Any] | None): A dictionary containing the context for the function. Defaults to None.
+        stats (utils.SchedulerStats | None): Sheets API request counters used to show throttling. Defaults to None.
 
     """
-    processed = 0
-    progress_bar = st.progress(value=0, text=label)
+    # Every update of the progress bar is a message sent to the browser, so updates are coalesced.
+    meter = utils.ProgressMeter(total)
+    # Background jobs can't render elements, so they report the progress to the job polled by the page instead.
+    job = utils.get_current_job()
+    progress_bar = st.progress(value=0, text=label) if job is None else None
 
-    for item in func(**(context or {})):
+    for processed, item in enumerate(func(**(context or {})), start=1):
         yield item
-        processed += 1
-        progress_bar.progress(value=processed / total, text=f"{label} ({processed}/{total})")
+        if not meter.update(processed):
+            continue
+        details = f"{meter.describe()}{throttling_text(stats)}"
+        if job:
+            job.set_progress(label, processed, total, details)
+        elif progress_bar:
+            progress_bar.progress(
+                value=min(processed / max(total, 1), 1.0), text=f"{label} ({processed}/{total}){details}"
+            )
+
+    if progress_bar:
+        progress_bar.empty()
 
-    progress_bar.empty()
+
+def throttling_text(stats: utils.SchedulerStats | None) -> str:
+    """Returns a short description of the Sheets API throttling to append to a progress label.
+
+    Args:
+        stats (utils.SchedulerStats | None): Sheets API request counters.
+
+    """
+    if not stats:
+        return ""
+    text = ""
+    if stats["waiting"]:
+        text += " · waiting for Sheets API quota"
+    if stats["retries"]:
+        text += f" · {stats["retries"]} retried requests"
+    return text
@@ -33,6 +33,26 @@ def main() -> None:
                     icon="🔍",
                     url_path="/gsheet-detect-language",
                 ),
+                st.Page(
+                    page="pages/gsheet_cluster_keywords.py",
+                    title="Cluster Keywords",
+                    icon="🧩",
+                    url_path="/gsheet-cluster-keywords",
+                ),
+                st.Page(
+                    page="pages/gsheet_find_duplicates.py",
+                    title="Find Duplicates",
+                    icon="👯",
+                    url_path="/gsheet-find-duplicates",
+                ),
+            ],
+            "Local Files": [
+                st.Page(
+                    page="pages/local_files.py",
+                    title="Process File",
+                    icon="📁",
+                    url_path="/local-files",
+                ),
             ],
         }
     )
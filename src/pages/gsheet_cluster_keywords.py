@@ -0,0 +1,231 @@
+from typing import Iterator, Sequence
+
+import gspread
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import streamlit as st
+
+import components
+import utils
+
+ANALYZER_LABELS = {
+    "char": "Fuzzy (character n-grams)",
+    "word": "Exact words",
+}
+# The default minimum similarity of a keyword to the leading keyword of its cluster.
+DEFAULT_THRESHOLD = 0.6
+# The number of cluster IDs written in a single request.
+WRITE_CHUNK_SIZE = 10_000
+
+
+def main() -> None:
+    """Displays page for clustering keywords in a Google Sheets."""
+    st.title("🧩 Cluster Keywords")
+    st.markdown(
+        "This tool groups similar keywords of a Google Sheets column and saves the cluster ID of every keyword "
+        "to another column. Every cluster is led by its most frequent keyword, and the other keywords join "
+        "the most similar leading keyword. Clusters are numbered by size, starting with `1` for the largest one. "
+        "Keywords are compared case-insensitively, and empty cells are left empty."
+    )
+
+    with st.form(key="gsheet_cluster_keywords"):
+        worksheet_func = components.gsheet_selector()
+        source_column = st.text_input(
+            "Source column",
+            help="This column will be used as the source of keywords.",
+        )
+        destination_column = st.text_input(
+            "Destination column",
+            value="Cluster",
+            help="This column will be used to save the cluster IDs.",
+        )
+        analyzer = st.selectbox(
+            "Similarity",
+            options=list(ANALYZER_LABELS),
+            format_func=lambda name: ANALYZER_LABELS.get(name, name),
+            help="Fuzzy similarity compares sequences of characters, so it also groups misspellings and word forms. "
+            "Exact similarity compares whole words and is faster on large sheets.",
+        )
+        threshold = st.slider(
+            "Similarity threshold",
+            min_value=0.1,
+            max_value=1.0,
+            value=DEFAULT_THRESHOLD,
+            step=0.05,
+            help="The minimum cosine similarity of a keyword to the leading keyword of its cluster. "
+            "Higher values make smaller clusters of closer keywords.",
+        )
+        submitted = st.form_submit_button("Cluster", type="primary")
+
+    # pylint: disable=R0801
+    if submitted:
+        if not worksheet_func or not source_column or not destination_column:
+            st.warning("Please make sure you are logged in and have filled in all fields.", icon="⚠️")
+        else:
+            components.stage_status(
+                stages=[
+                    {
+                        "name": "Retrieving worksheet",
+                        "func": components.return_stage_context("worksheet")(worksheet_func),
+                    },
+                    *get_stages(),
+                ],
+                context={
+                    "columns": [source_column],
+                    "source_column": source_column,
+                    "destination_column": destination_column,
+                    "analyzer": analyzer,
+                    "threshold": threshold,
+                },
+                job="gsheet_cluster_keywords",
+            )
+    else:
+        components.pending_stage_status("gsheet_cluster_keywords")
+
+
+def get_stages() -> list[components.Stage]:
+    """Returns the stages that cluster the keywords of a retrieved worksheet."""
+    return [
+        {
+            "name": "Data extraction",
+            "func": components.return_stage_context("df")(utils.get_data_from_worksheet),
+        },
+        {
+            "name": "Keyword clustering and saving to sheet",
+            "func": cluster_keywords_and_save,
+        },
+    ]
+
+
+def cluster_keywords_and_save(  # pylint: disable=R0913,R0917
+    worksheet: gspread.Worksheet,
+    df: pd.DataFrame,
+    source_column: str,
+    destination_column: str,
+    analyzer: utils.Analyzer = "char",
+    threshold: float = DEFAULT_THRESHOLD,
+) -> None:
+    """Clusters the keywords of the source column and saves the cluster IDs to the destination column.
+
+    The cluster IDs are written in batched range updates.
+
+    Args:
+        worksheet (gspread.Worksheet): The Google Sheets worksheet.
+        df (pd.DataFrame): The DataFrame containing the data from the worksheet.
+        source_column (str): The name of the source column with the keywords.
+        destination_column (str): The name of the destination column to save the cluster IDs.
+        analyzer (utils.Analyzer): The features keywords are compared by, `char` or `word`. Defaults to `char`.
+        threshold (float): The minimum similarity of a keyword to the leading keyword of its cluster.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    """
+    cluster_ids = get_keyword_clusters(df[source_column], analyzer, threshold)
+    header = worksheet.row_values(1)
+    (destination_column_idx,) = utils.append_columns(worksheet, header, [destination_column])
+    with utils.ColumnWriter(worksheet, destination_column_idx, chunk_size=WRITE_CHUNK_SIZE) as writer:
+        for row, cluster_id in enumerate(cluster_ids.tolist(), start=2):
+            writer.write(row, cluster_id)
+
+
+def get_keyword_clusters(
+    keywords: pd.Series, analyzer: utils.Analyzer = "char", threshold: float = DEFAULT_THRESHOLD
+) -> npt.NDArray[np.object_]:
+    """Returns the cluster ID of every keyword, or an empty string for empty keywords.
+
+    Keywords are compared in lowercase with single spaces, and duplicate keywords are clustered only once.
+
+    Args:
+        keywords (pd.Series): The keywords.
+        analyzer (utils.Analyzer): The features keywords are compared by, `char` or `word`. Defaults to `char`.
+        threshold (float): The minimum similarity of a keyword to the leading keyword of its cluster.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    """
+    codes, distinct = pd.factorize(keywords.astype(str).str.lower().map(utils.normalize_text))
+    return get_factorized_clusters(codes, distinct.tolist(), analyzer, threshold)
+
+
+def get_factorized_clusters(
+    codes: npt.NDArray[np.integer],
+    distinct: Sequence[str],
+    analyzer: utils.Analyzer = "char",
+    threshold: float = DEFAULT_THRESHOLD,
+) -> npt.NDArray[np.object_]:
+    """Returns the cluster ID of every keyword encoded as the code of its normalized form.
+
+    Args:
+        codes (npt.NDArray[np.integer]): The index of the normalized form of every keyword in `distinct`.
+        distinct (Sequence[str]): The distinct normalized keywords.
+        analyzer (utils.Analyzer): The features keywords are compared by, `char` or `word`. Defaults to `char`.
+        threshold (float): The minimum similarity of a keyword to the leading keyword of its cluster.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    """
+    leaders = np.empty(len(distinct), dtype=np.int64)
+    for keyword_idx, leader_idx in components.progress_status(
+        "Keyword clustering",
+        total=len(distinct),
+        func=cluster_keywords,
+        context={
+            "keywords": distinct,
+            "counts": np.bincount(codes, minlength=len(distinct)),
+            "analyzer": analyzer,
+            "threshold": threshold,
+        },
+    ):
+        leaders[keyword_idx] = leader_idx
+    is_empty = np.fromiter((keyword == "" for keyword in distinct), dtype=bool, count=len(distinct))
+    return get_cluster_ids(leaders[codes], is_empty[codes])
+
+
+def cluster_keywords(
+    keywords: Sequence[str],
+    counts: npt.NDArray[np.int64],
+    analyzer: utils.Analyzer = "char",
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Iterator[tuple[int, int]]:
+    """Clusters the distinct keywords around leading keywords.
+
+    The most frequent keywords, and the shortest of equally frequent ones, are clustered first,
+    so they lead the clusters. Keywords are vectorized as TF-IDF and clustered in blocks,
+    see `utils.iter_leader_clusters`.
+
+    Args:
+        keywords (Sequence[str]): The distinct normalized keywords.
+        counts (npt.NDArray[np.int64]): The number of occurrences of every keyword.
+        analyzer (utils.Analyzer): The features keywords are compared by, `char` or `word`. Defaults to `char`.
+        threshold (float): The minimum similarity of a keyword to the leading keyword of its cluster.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    Yields:
+        tuple[int, int]: The index of a keyword and the index of the leading keyword of its cluster.
+
+    """
+    matrix = utils.vectorize_texts(keywords, analyzer)
+    lengths = np.fromiter(map(len, keywords), dtype=np.int64, count=len(keywords))
+    order = np.lexsort((lengths, -counts))
+    for rows, leaders in utils.iter_leader_clusters(matrix, threshold, order):
+        yield from zip(rows.tolist(), leaders.tolist())
+
+
+def get_cluster_ids(leaders: npt.NDArray[np.int64], is_empty: npt.NDArray[np.bool_]) -> npt.NDArray[np.object_]:
+    """Returns the cluster ID of every row, numbering clusters by size and then by their first row.
+
+    Args:
+        leaders (npt.NDArray[np.int64]): The leading keyword of the cluster of every row.
+        is_empty (npt.NDArray[np.bool_]): Whether the keyword of the row is empty, which gets an empty cluster ID.
+
+    """
+    _, first_rows, inverse, sizes = np.unique(
+        leaders[~is_empty], return_index=True, return_inverse=True, return_counts=True
+    )
+    ranks = np.empty(len(sizes), dtype=np.int64)
+    ranks[np.lexsort((first_rows, -sizes))] = np.arange(1, len(sizes) + 1)
+    cluster_ids = np.full(len(leaders), "", dtype=object)
+    cluster_ids[~is_empty] = ranks[inverse]
+    return cluster_ids
+
+
+if __name__ == "__main__":
+    main()
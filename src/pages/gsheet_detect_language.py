@@ -1,14 +1,23 @@
-from typing import Iterator
+import itertools
+from typing import Callable, Iterable, Iterator, TypedDict
 
 import gspread
-import langcodes
-import langdetect
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import streamlit as st
 
 import components
 import utils
 
+DETECTOR_LABELS = {
+    "langdetect": "Standard (langdetect)",
+    "ngram": "Fast (n-gram scoring)",
+}
+# The number of windows read, and of windows written, at the same time in streaming mode.
+STREAMING_READS = 4
+STREAMING_WRITES = 2
+
 
 def main() -> None:
     """Displays page for detecting language in a Google Sheets."""
@@ -16,7 +25,8 @@ def main() -> None:
     st.markdown(
         "This tool detects the language of the text in a Google Sheets column "
         "and saves the detected language to another column. "
-        "The detected language is saved as a string in the format `lang_name (lang_code)`."
+        "The detected language is saved as a string in the format `lang_name (lang_code)`. "
+        "Cells without any recognizable text, such as numbers or links, are marked as `Unknown`."
     )
     components.example_image(
         "This example shows results of the language detection.",
@@ -34,12 +44,32 @@ def main() -> None:
             value="Detected Language",
             help="This column will be used to save the detected language.",
         )
+        detector = st.selectbox(
+            "Detection engine",
+            options=list(utils.DETECTORS),
+            format_func=lambda name: DETECTOR_LABELS.get(name, name),
+            help="The fast engine uses the same language profiles, but scores whole batches of texts at once. "
+            "It is much faster on large sheets and its results may slightly differ from the standard engine.",
+        )
+        streaming = st.toggle(
+            "Streaming mode",
+            help="Reads, detects and writes the sheet in windows of rows that overlap with each other. "
+            "Recommended for very large sheets, as memory usage doesn't grow with the sheet size.",
+        )
+        incremental = st.toggle(
+            "Incremental mode",
+            help="Reuses an existing destination column and detects only rows whose source text changed "
+            "since the last incremental run. Hashes of the source texts are kept in a hidden column. "
+            "Not available in streaming mode.",
+        )
         submitted = st.form_submit_button("Detect", type="primary")
 
     # pylint: disable=R0801
     if submitted:
         if not worksheet_func or not source_column or not destination_column:
             st.warning("Please make sure you are logged in and have filled in all fields.", icon="⚠️")
+        elif streaming and incremental:
+            st.warning("Incremental mode can't be combined with streaming mode.", icon="⚠️")
         else:
             components.stage_status(
                 stages=[
@@ -47,61 +77,290 @@ def main() -> None:
                         "name": "Retrieving worksheet",
                         "func": components.return_stage_context("worksheet")(worksheet_func),
                     },
-                    {
-                        "name": "Data extraction",
-                        "func": components.return_stage_context("df")(utils.get_data_from_worksheet),
-                    },
-                    {
-                        "name": "Language detection and saving to sheet",
-                        "func": detect_language_and_save,
-                    },
+                    *get_stages(streaming),
                 ],
                 context={
                     "columns": [source_column],
                     "source_column": source_column,
                     "destination_column": destination_column,
+                    "detector": detector,
+                    "incremental": incremental,
+                    "streaming": streaming,
                 },
+                job="gsheet_detect_language",
             )
+    else:
+        components.pending_stage_status("gsheet_detect_language")
+
 
+def get_stages(streaming: bool = False) -> list[components.Stage]:
+    """Returns the stages that detect the languages of a retrieved worksheet.
+
+    Args:
+        streaming (bool): Whether to detect the languages in windows of rows. Defaults to False.
 
-def detect_language_and_save(
-    worksheet: gspread.Worksheet, df: pd.DataFrame, source_column: str, destination_column: str
+    """
+    if streaming:
+        return [
+            {
+                "name": "Streaming language detection and saving to sheet",
+                "func": detect_language_streaming,
+            }
+        ]
+    return [
+        {
+            "name": "Data extraction",
+            "func": components.return_stage_context("df")(utils.get_data_from_worksheet),
+        },
+        {
+            "name": "Language detection and saving to sheet",
+            "func": detect_language_and_save,
+        },
+    ]
+
+
+def detect_language_and_save(  # pylint: disable=R0913,R0917
+    worksheet: gspread.Worksheet,
+    df: pd.DataFrame,
+    source_column: str,
+    destination_column: str,
+    detector: str = "langdetect",
+    incremental: bool = False,
+    checkpoint: utils.Checkpoint | None = None,
 ) -> None:
     """Detects the language of the text in the source column and saves it to the destination column.
 
+    In incremental mode an existing destination column is reused, and only rows whose source text
+    changed since the last incremental run, or whose detected language is missing, are detected and written.
+
+    Args:
+        worksheet (gspread.Worksheet): The Google Sheets worksheet.
+        df (pd.DataFrame): The DataFrame containing the data from the worksheet.
+        source_column (str): The name of the source column to detect language from.
+        destination_column (str): The name of the destination column to save detected language.
+        detector (str): The name of the language detector to use. Defaults to `langdetect`.
+        incremental (bool): Whether to process only new and changed rows. Defaults to False.
+        checkpoint (utils.Checkpoint | None): The checkpoint used to resume an interrupted run. Defaults to None.
+
+    """
+    if incremental:
+        # Incremental runs are resumable on their own, as rows written before an interruption are unchanged.
+        detect_changed_languages(worksheet, df, source_column, destination_column, detector)
+        return
+
+    header = worksheet.row_values(1)
+    destination_column_idx, start_row = resume_destination_column(worksheet, header, destination_column, checkpoint)
+    rows = np.arange(start_row, len(df) + 2)
+    write_languages(
+        worksheet,
+        df[source_column].iloc[rows - 2],
+        rows,
+        destination_column_idx,
+        detector,
+        on_flush=save_written_row(checkpoint),
+    )
+
+
+def detect_changed_languages(
+    worksheet: gspread.Worksheet,
+    df: pd.DataFrame,
+    source_column: str,
+    destination_column: str,
+    detector: str = "langdetect",
+) -> None:
+    """Detects the language of the rows whose source text changed since the last incremental run.
+
+    The hashes of the source texts are saved to a hidden column next to the detected languages.
+
     Args:
         worksheet (gspread.Worksheet): The Google Sheets worksheet.
         df (pd.DataFrame): The DataFrame containing the data from the worksheet.
         source_column (str): The name of the source column to detect language from.
         destination_column (str): The name of the destination column to save detected language.
+        detector (str): The name of the language detector to use. Defaults to `langdetect`.
 
     """
-    worksheet.add_cols(1)
-    destination_column_idx = len(worksheet.row_values(1)) + 1
-    worksheet.update_cell(1, destination_column_idx, destination_column)
-    counter = 2
+    header = worksheet.row_values(1)
+    hash_column = f"{destination_column} (source hashes)"
+    new_columns = [column for column in (destination_column, hash_column) if column not in header]
+    utils.append_columns(worksheet, header, new_columns, hidden=[hash_column])
+    state = utils.get_data_from_worksheet(worksheet, [destination_column, hash_column], header, dtype="string")
+
+    # The detector is part of the hash, so switching the engine detects all rows again.
+    hashes = utils.hash_values(df[source_column], detector, utils.normalize_text)
+    missing_languages = state[destination_column].reindex(range(len(df)), fill_value="").to_numpy() == ""
+    changed = utils.get_changed_rows(hashes, state[hash_column]) | missing_languages
+
+    write_languages(
+        worksheet,
+        df[source_column][changed],
+        np.flatnonzero(changed) + 2,
+        header.index(destination_column) + 1,
+        detector,
+        hashes={"column_idx": header.index(hash_column) + 1, "values": hashes[changed]},
+    )
 
-    for language in components.progress_status(
+
+class HashColumn(TypedDict):
+    """A dictionary with the hashes of the detected texts and the column they are saved to.
+
+    Attributes:
+        column_idx (int): The 1-based index of the hash column.
+        values (npt.NDArray[np.object_]): The hashes, one per detected row.
+
+    """
+
+    column_idx: int
+    values: npt.NDArray[np.object_]
+
+
+def write_languages(  # pylint: disable=R0913,R0917
+    worksheet: gspread.Worksheet,
+    texts: pd.Series,
+    rows: npt.NDArray[np.intp],
+    destination_column_idx: int,
+    detector: str = "langdetect",
+    hashes: HashColumn | None = None,
+    on_flush: Callable[[int], None] | None = None,
+) -> None:
+    """Detects the language of the texts and writes it to the given rows of the destination column.
+
+    Args:
+        worksheet (gspread.Worksheet): The Google Sheets worksheet.
+        texts (pd.Series): The texts to detect the language of.
+        rows (npt.NDArray[np.intp]): The 1-based indices of the rows of the texts.
+        destination_column_idx (int): The 1-based index of the destination column.
+        detector (str): The name of the language detector to use. Defaults to `langdetect`.
+        hashes (HashColumn | None): The hashes of the texts, written next to the detected languages. Defaults to None.
+        on_flush (Callable[[int], None] | None): Called with the last written row after each write. Defaults to None.
+
+    """
+    languages = components.progress_status(
         "Language detection and writing to sheet",
-        total=len(df),
+        total=len(texts),
         func=detect_language,
-        context={"data": df[source_column]},
-    ):
-        worksheet.update_cell(counter, destination_column_idx, language)
-        counter += 1
+        context={"data": texts, "detector": detector},
+        stats=utils.get_scheduler_stats(worksheet),
+    )
+    # Hashes that look like numbers would be parsed as numbers, so values are written as text.
+    with utils.ColumnWriter(
+        worksheet, destination_column_idx, on_flush=on_flush, value_input_option=gspread.utils.ValueInputOption.raw
+    ) as writer:
+        for idx, (row, language) in enumerate(zip(rows.tolist(), languages)):
+            writer.write(row, language)
+            if hashes:
+                writer.write(row, hashes["values"][idx], hashes["column_idx"])
+
+
+def resume_destination_column(
+    worksheet: gspread.Worksheet, header: list[str], destination_column: str, checkpoint: utils.Checkpoint | None
+) -> tuple[int, int]:
+    """Returns the index of the destination column and the first row to detect.
 
+    A new destination column is added, unless an interrupted run already added it. In that case
+    detection continues after the last row written by that run.
 
-def detect_language(data: pd.Series) -> Iterator[str]:
+    Args:
+        worksheet (gspread.Worksheet): The Google Sheets worksheet.
+        header (list[str]): The values of the header row.
+        destination_column (str): The name of the destination column to save detected language.
+        checkpoint (utils.Checkpoint | None): The checkpoint of the run.
+
+    """
+    progress = checkpoint.progress if checkpoint else {}
+    if "destination_column_idx" in progress:
+        return progress["destination_column_idx"], progress.get("row", 1) + 1
+
+    (destination_column_idx,) = utils.append_columns(worksheet, header, [destination_column])
+    if checkpoint:
+        checkpoint.update(destination_column_idx=destination_column_idx)
+    return destination_column_idx, 2
+
+
+def save_written_row(checkpoint: utils.Checkpoint | None) -> Callable[[int], None] | None:
+    """Returns a callback that saves the last written row to the checkpoint, if there is one.
+
+    Args:
+        checkpoint (utils.Checkpoint | None): The checkpoint of the run.
+
+    """
+    if checkpoint is None:
+        return None
+    return lambda row: checkpoint.update(row=row)
+
+
+def detect_language_streaming(  # pylint: disable=R0913,R0917
+    worksheet: gspread.Worksheet,
+    source_column: str,
+    destination_column: str,
+    detector: str = "langdetect",
+    window_size: int = 5000,
+    checkpoint: utils.Checkpoint | None = None,
+) -> None:
+    """Detects languages like `detect_language_and_save`, but streams the sheet in windows of rows.
+
+    The next windows are fetched concurrently while the current one is detected, and detected languages
+    are written in the background as well, so the latency of the requests overlaps and only a few windows
+    are kept in memory.
+
+    Args:
+        worksheet (gspread.Worksheet): The Google Sheets worksheet.
+        source_column (str): The name of the source column to detect language from.
+        destination_column (str): The name of the destination column to save detected language.
+        detector (str): The name of the language detector to use. Defaults to `langdetect`.
+        window_size (int): The number of rows read and written at once. Defaults to 5000.
+        checkpoint (utils.Checkpoint | None): The checkpoint used to resume an interrupted run. Defaults to None.
+
+    """
+    header = worksheet.row_values(1)
+    destination_column_idx, start_row = resume_destination_column(worksheet, header, destination_column, checkpoint)
+    # The rows to stream are the rows of the grid on the server, not of the cached worksheet metadata.
+    utils.refresh_grid_properties(worksheet)
+
+    # One copy of the cells feeds the detection, the other one lags behind by at most one chunk to provide the rows.
+    text_cells, row_cells = itertools.tee(
+        (row, text)
+        for window_start, values in utils.iter_column_windows(
+            worksheet, header.index(source_column) + 1, window_size, start_row, max_workers=STREAMING_READS
+        )
+        for row, text in enumerate(values, start=window_start)
+    )
+    languages = components.progress_status(
+        "Language detection and writing to sheet",
+        total=worksheet.row_count - start_row + 1,
+        func=detect_language,
+        context={"data": (text for _, text in text_cells), "detector": detector},
+        stats=utils.get_scheduler_stats(worksheet),
+    )
+
+    with utils.ColumnWriter(
+        worksheet,
+        destination_column_idx,
+        chunk_size=window_size,
+        background=True,
+        on_flush=save_written_row(checkpoint),
+        max_pending=STREAMING_WRITES,
+    ) as writer:
+        for (row, _), language in zip(row_cells, languages):
+            writer.write(row, language)
+
+
+def detect_language(data: Iterable[str], detector: str = "langdetect") -> Iterator[str]:
     """Detects the language of the text in the given data.
 
+    Duplicate texts are detected only once and results are cached between runs. The number of
+    worker processes can be set with the optional `language_detection_workers` secret.
+
+    Args:
+        data (Iterable[str]): The texts to detect the language of.
+        detector (str): The name of the language detector to use. Defaults to `langdetect`.
+
     Yields:
         str: The detected language in the format `language_name (language_code)`.
 
     """
-    for text in data:
-        lang_code = langdetect.detect(text)
-        lang_name = langcodes.Language.get(lang_code).language_name()
-        yield f"{lang_name} ({lang_code})"
+    workers = st.secrets.get("language_detection_workers", utils.language.DEFAULT_WORKERS)
+    yield from utils.detect_languages(data, detector, workers=workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+from typing import Sequence
+
+import gspread
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import streamlit as st
+
+import components
+import utils
+from pages import gsheet_highlight_rows
+
+OUTPUT_MODES = ["Canonical keyword column", "Highlight duplicates"]
+# The default minimum estimated Jaccard similarity of near-duplicate keywords.
+DEFAULT_THRESHOLD = 0.8
+# The number of canonical keywords written in a single request.
+WRITE_CHUNK_SIZE = 10_000
+# The plural endings of English words removed before comparing keywords, e.g. `flights`, `boxes` or `dishes`.
+# Words ending in `ss`, `is` or `us`, and words of up to two letters before the ending, e.g. `gas` or `axes`,
+# are kept as they are.
+PLURAL_SUFFIX = r"(?<=\w\w[xz])es\b|(?<=\w(?:ch|sh|ss))es\b|(?<=\w\w[^\W\d_siu])s\b"
+
+
+def main() -> None:
+    """Displays page for finding near-duplicate keywords in a Google Sheets."""
+    st.title("👯 Find Duplicates")
+    st.markdown(
+        "This tool finds near-duplicate keywords in a Google Sheets column, such as plurals, reordered words "
+        "and keywords that differ only in punctuation or case. Similar keywords are linked into groups, "
+        "which are either highlighted with the colors of Highlight Rows, or saved as a column with the canonical "
+        "keyword of every row, which is the most frequent keyword of its group. Empty cells are skipped."
+    )
+
+    with st.form(key="gsheet_find_duplicates"):
+        worksheet_func = components.gsheet_selector()
+        source_column = st.text_input(
+            "Source column",
+            help="This column will be searched for near-duplicate keywords.",
+        )
+        threshold = st.slider(
+            "Similarity threshold",
+            min_value=0.5,
+            max_value=1.0,
+            value=DEFAULT_THRESHOLD,
+            step=0.05,
+            help="The minimum share of the character sequences of the words two keywords need to have in common. "
+            "Lower values also find keywords with more different words.",
+        )
+        output_mode = st.radio(
+            "Output",
+            options=OUTPUT_MODES,
+            horizontal=True,
+            help="The canonical keyword column lets you filter or deduplicate the sheet by the canonical keyword. "
+            "Highlighting colors the rows of every group of duplicates and leaves the other rows as they are.",
+        )
+        destination_column = st.text_input(
+            "Destination column",
+            value="Canonical Keyword",
+            help="This column will be used to save the canonical keywords. Not used for highlighting.",
+        )
+        submitted = st.form_submit_button("Find", type="primary")
+
+    # pylint: disable=R0801
+    if submitted:
+        if not worksheet_func or not source_column or not destination_column:
+            st.warning("Please make sure you are logged in and have filled in all fields.", icon="⚠️")
+        else:
+            components.stage_status(
+                stages=[
+                    {
+                        "name": "Retrieving worksheet",
+                        "func": components.return_stage_context("worksheet")(worksheet_func),
+                    },
+                    *get_stages(output_mode == "Highlight duplicates"),
+                ],
+                context={
+                    "columns": [source_column],
+                    "source_column": source_column,
+                    "destination_column": destination_column,
+                    "threshold": threshold,
+                },
+                job="gsheet_find_duplicates",
+            )
+    else:
+        components.pending_stage_status("gsheet_find_duplicates")
+
+
+def get_stages(highlight: bool = False) -> list[components.Stage]:
+    """Returns the stages that find the near-duplicate keywords of a retrieved worksheet.
+
+    Args:
+        highlight (bool): Whether to highlight the groups of duplicates instead of saving the canonical keywords.
+            Defaults to False.
+
+    """
+    extraction: components.Stage = {
+        "name": "Data extraction",
+        "func": components.return_stage_context("df")(utils.get_data_from_worksheet),
+    }
+    if highlight:
+        return [
+            extraction,
+            {"name": "Duplicate detection and color generation", "func": generate_duplicate_color_groups},
+            {"name": "Range generation", "func": gsheet_highlight_rows.generate_color_ranges},
+            {"name": "Applying formatting", "func": gsheet_highlight_rows.apply_formatting},
+        ]
+    return [extraction, {"name": "Duplicate detection and saving to sheet", "func": save_canonical_keywords}]
+
+
+def find_duplicate_groups(keywords: pd.Series, threshold: float = DEFAULT_THRESHOLD) -> npt.NDArray[np.int64]:
+    """Groups the near-duplicate keywords.
+
+    Keywords are compared in lowercase with single spaces, so duplicate keywords are hashed only once.
+    Near duplicates are found with MinHash signatures of the character 3-grams of the words, bucketed
+    with LSH, see `utils.find_near_duplicates`.
+
+    Args:
+        keywords (pd.Series): The keywords.
+        threshold (float): The minimum estimated Jaccard similarity of near-duplicate keywords.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    Returns:
+        npt.NDArray[np.int64]: The group of every keyword, which is the position of the first occurrence of
+            the most frequent keyword of the group, or -1 for empty keywords.
+
+    """
+    codes, distinct = pd.factorize(keywords.astype(str).str.lower().map(utils.normalize_text))
+    canonical = get_canonical_keywords(codes, distinct.tolist(), threshold)
+    _, first_positions = np.unique(codes, return_index=True)
+    keyword_groups = first_positions[canonical][codes]
+    keyword_groups[np.asarray(distinct)[codes] == ""] = -1
+    return keyword_groups
+
+
+def get_canonical_keywords(
+    codes: npt.NDArray[np.integer], distinct: Sequence[str], threshold: float = DEFAULT_THRESHOLD
+) -> npt.NDArray[np.int64]:
+    """Returns the canonical keyword of every distinct keyword, the most frequent one of its group of near duplicates.
+
+    Plural endings are removed from the words before hashing, see `PLURAL_SUFFIX`, as the character 3-grams
+    of a short keyword and of its plural often differ by more than the threshold allows.
+
+    Args:
+        codes (npt.NDArray[np.integer]): The index of the normalized form of every keyword in `distinct`.
+        distinct (Sequence[str]): The distinct normalized keywords.
+        threshold (float): The minimum estimated Jaccard similarity of near-duplicate keywords.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    Returns:
+        npt.NDArray[np.int64]: The index of the canonical keyword in `distinct`, the first one of equally
+            frequent keywords.
+
+    """
+    singular = pd.Series(distinct, dtype=object).str.replace(PLURAL_SUFFIX, "", regex=True)
+    groups = utils.find_near_duplicates(utils.minhash_signatures(singular.tolist()), threshold)
+    counts = np.bincount(codes, minlength=len(distinct))
+    order = np.lexsort((np.arange(len(distinct)), -counts, groups))
+    group_values, group_starts = np.unique(groups[order], return_index=True)
+    canonical = np.empty(len(distinct), dtype=np.int64)
+    canonical[group_values] = order[group_starts]
+    return canonical[groups]
+
+
+def save_canonical_keywords(
+    worksheet: gspread.Worksheet,
+    df: pd.DataFrame,
+    source_column: str,
+    destination_column: str,
+    threshold: float = DEFAULT_THRESHOLD,
+) -> None:
+    """Saves the canonical keyword of every row to the destination column.
+
+    The canonical keyword is the first cell of the most frequent keyword of the group of near duplicates.
+    Rows without near duplicates get their own keyword, and empty cells stay empty. The canonical keywords
+    are written in batched range updates.
+
+    Args:
+        worksheet (gspread.Worksheet): The Google Sheets worksheet.
+        df (pd.DataFrame): The DataFrame containing the data from the worksheet.
+        source_column (str): The name of the source column with the keywords.
+        destination_column (str): The name of the destination column to save the canonical keywords.
+        threshold (float): The minimum estimated Jaccard similarity of near-duplicate keywords.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    """
+    keywords = df[source_column].to_numpy(dtype=object)
+    groups = find_duplicate_groups(df[source_column], threshold)
+    canonical_keywords = np.where(groups >= 0, keywords[groups], "")
+
+    header = worksheet.row_values(1)
+    (destination_column_idx,) = utils.append_columns(worksheet, header, [destination_column])
+    # Keywords are written as they are, so keywords like `=sum` or `1/2` aren't parsed as formulas or dates.
+    with utils.ColumnWriter(
+        worksheet,
+        destination_column_idx,
+        chunk_size=WRITE_CHUNK_SIZE,
+        value_input_option=gspread.utils.ValueInputOption.raw,
+    ) as writer:
+        for row, keyword in enumerate(canonical_keywords.tolist(), start=2):
+            writer.write(row, keyword)
+
+
+@components.return_stage_context("color_groups")
+def generate_duplicate_color_groups(
+    df: pd.DataFrame, source_column: str, threshold: float = DEFAULT_THRESHOLD
+) -> dict[str, npt.NDArray[np.intp]]:
+    """Assigns a color from the palette to every group of near-duplicate keywords with more than one row.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the data from the worksheet.
+        source_column (str): The name of the source column with the keywords.
+        threshold (float): The minimum estimated Jaccard similarity of near-duplicate keywords.
+            Defaults to `DEFAULT_THRESHOLD`.
+
+    Returns:
+        dict[str, npt.NDArray[np.intp]]: A dictionary where keys are colors and values are sorted arrays of row indices.
+
+    """
+    groups = find_duplicate_groups(df[source_column], threshold)
+    group_sizes = np.bincount(groups[groups >= 0], minlength=len(groups))
+    duplicate_rows = np.flatnonzero((groups >= 0) & (group_sizes[groups] > 1))
+    codes, uniques = pd.factorize(groups[duplicate_rows])
+    palette = utils.generate_palette(min(len(uniques), utils.PALETTE_SIZE))
+    # Add 2 to the index to account for the header row and 1-based indexing in Google Sheets.
+    return gsheet_highlight_rows.group_rows(palette, codes % utils.PALETTE_SIZE, duplicate_rows + 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-import collections
-import random
-from typing import cast
+import itertools
 
 import gspread
 import gspread_formatting
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import streamlit as st
 
@@ -18,7 +18,10 @@ def main() -> None:
         "This tool allows you to highlight rows in a Google Sheets document based on the values of a specific column. "
         "You can use this to visually group data in your spreadsheet."
     )
-    st.write("Please note that the colors are generated randomly, but each group will have its own unique color.")
+    st.write(
+        f"Each group gets its own color from a fixed palette of {utils.PALETTE_SIZE} distinct colors. "
+        "If there are more groups than colors, the palette is reused."
+    )
     components.example_image(
         "This is an example of how the rows will be highlighted based on the values in `Metric` column.",
         "src/images/examples/gsheet_highlight_rows.png",
@@ -30,6 +33,19 @@ def main() -> None:
             "Group column",
             help="The name of the column you want to group by. This column will determine the colors of the rows.",
         )
+        mode = st.radio(
+            "Highlighting mode",
+            options=["Static formatting", "Conditional formatting"],
+            horizontal=True,
+            help="Static formatting colors the rows once. Conditional formatting adds one rule per group, "
+            "so the colors follow the data when it is edited later. Empty cells are not highlighted in this mode.",
+        )
+        incremental = st.toggle(
+            "Incremental mode",
+            help="Re-formats only rows whose group value changed since the last run, and keeps the colors "
+            "of existing groups. The group of each row is remembered in a hidden column. "
+            "Applies to static formatting, as conditional formatting follows the data on its own.",
+        )
         submitted = st.form_submit_button("Highlight", type="primary")
 
     if submitted:
@@ -42,98 +58,293 @@ def main() -> None:
                         "name": "Retrieving worksheet",
                         "func": components.return_stage_context("worksheet")(worksheet_func),
                     },
-                    {
-                        "name": "Data extraction",
-                        "func": components.return_stage_context("df")(utils.get_data_from_worksheet),
-                    },
-                    {
-                        "name": "Data grouping and color generation",
-                        "func": generate_color_groups,
-                    },
-                    {"name": "Range generation", "func": generate_color_ranges},
-                    {"name": "Applying formatting", "func": apply_formatting},
+                    *get_stages(mode == "Conditional formatting", incremental),
                 ],
-                context={"group_column": group_column, "columns": [group_column]},
+                context={
+                    "group_column": group_column,
+                    "columns": [group_column],
+                    "mode": mode,
+                    "incremental": incremental,
+                    # Rows are only grouped by the values, so they are stored as a compact categorical.
+                    "dtype": "category",
+                },
+                job="gsheet_highlight_rows",
             )
+    else:
+        components.pending_stage_status("gsheet_highlight_rows")
+
+
+def get_stages(conditional: bool = False, incremental: bool = False) -> list[components.Stage]:
+    """Returns the stages that highlight the rows of a retrieved worksheet.
+
+    Args:
+        conditional (bool): Whether to add conditional formatting rules instead of static formatting.
+            Defaults to False.
+        incremental (bool): Whether to re-format only the changed rows with static formatting. Defaults to False.
+
+    """
+    extraction: components.Stage = {
+        "name": "Data extraction",
+        "func": components.return_stage_context("df")(utils.get_data_from_worksheet),
+    }
+    if conditional:
+        return [
+            extraction,
+            {"name": "Data grouping and color generation", "func": generate_group_colors},
+            {"name": "Applying conditional formatting", "func": apply_conditional_formatting},
+        ]
+    return [
+        extraction,
+        {
+            "name": "Data grouping and color generation",
+            "func": generate_changed_color_groups if incremental else generate_color_groups,
+        },
+        {"name": "Range generation", "func": generate_color_ranges},
+        {"name": "Applying formatting", "func": apply_formatting},
+        {"name": "Saving highlighted groups", "func": save_highlight_state},
+    ]
+
+
+@components.return_stage_context("color_groups")
+def generate_color_groups(df: pd.DataFrame, group_column: str) -> dict[str, npt.NDArray[np.intp]]:
+    """Groups data and assigns a color from the palette to each group.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the data to be grouped.
+        group_column (str): The name of the column to group by.
+
+    Returns:
+        dict[str, npt.NDArray[np.intp]]: A dictionary where keys are colors and values are sorted arrays of row indices.
+
+    """
+    codes, uniques = pd.factorize(df[group_column], use_na_sentinel=False)
+    palette = utils.generate_palette(min(len(uniques), utils.PALETTE_SIZE))
+    # Groups beyond the palette size share colors, so their rows are merged under the same color.
+    # Add 2 to the index to account for the header row and 1-based indexing in Google Sheets.
+    return group_rows(palette, codes % utils.PALETTE_SIZE, np.arange(2, len(df) + 2))
 
 
 @components.return_stage_context("color_groups")
-def generate_color_groups(df: pd.DataFrame, group_column: str) -> dict[str, list[int]]:
-    """Groups data and generates unique colors for each group.
+def generate_changed_color_groups(
+    worksheet: gspread.Worksheet, df: pd.DataFrame, group_column: str
+) -> dict[str, npt.NDArray[np.intp]]:
+    """Groups the rows whose group value changed since the last run and assigns a color to each group.
+
+    Groups highlighted by earlier runs keep their colors. New groups get the palette colors
+    that aren't used yet, so the rest of the sheet doesn't have to be re-formatted.
 
     Args:
+        worksheet (gspread.Worksheet): The worksheet with the state of the last run.
         df (pd.DataFrame): The DataFrame containing the data to be grouped.
         group_column (str): The name of the column to group by.
 
     Returns:
-        dict[str, list[int]]: A dictionary where keys are unique colors and values are lists of row indices.
+        dict[str, npt.NDArray[np.intp]]: A dictionary where keys are colors and values are sorted arrays of row indices.
 
     """
-    unique_colors = set()
-    group_colors = {}
+    header = worksheet.row_values(1)
+    state_column = _get_state_column(group_column)
+    utils.append_columns(worksheet, header, [state_column] if state_column not in header else [], [state_column])
+    state = utils.get_data_from_worksheet(worksheet, [state_column], header, dtype="string")[state_column]
+
+    # Each state cell holds the hash of the group value and the color of the row.
+    stored_hashes = pd.Series([cell.partition(" ")[0] for cell in state], dtype=object)
+    group_colors = dict(cell.partition(" ")[::2] for cell in state if cell)
+
+    hashes = utils.hash_values(df[group_column])
+    changed = utils.get_changed_rows(hashes, stored_hashes)
+    # Hash-based lookup, as `np.isin` compares object arrays pairwise.
+    new_groups = changed & ~pd.Series(hashes).isin(list(group_colors)).to_numpy()
+    _assign_new_colors(group_colors, pd.unique(hashes[new_groups]))
+
+    codes, colors = pd.factorize(pd.Series(hashes[changed]).map(group_colors))
+    return group_rows(colors.tolist(), codes, np.flatnonzero(changed) + 2)
 
-    for group in df[group_column].unique():
-        while True:
-            color = "#" + "".join(random.choice("89ABCDEF") for _ in range(6))
-            if color not in unique_colors:
-                unique_colors.add(color)
-                group_colors[group] = color
-                break
 
-    color_groups = collections.defaultdict(list)
-    for idx, row in df.iterrows():
-        color = group_colors[row[group_column]]
-        idx = cast(int, idx)
-        # Add 2 to the index to account for the header row and 1-based indexing in Google Sheets.
-        color_groups[color].append(idx + 2)
+def _assign_new_colors(group_colors: dict[str, str], new_groups: npt.NDArray[np.object_]) -> None:
+    """Assigns the palette colors that aren't used by any group yet to the new groups, reusing colors if needed."""
+    palette = utils.generate_palette(utils.PALETTE_SIZE)
+    used_colors = set(group_colors.values())
+    unused_colors = [color for color in palette if color not in used_colors]
+    group_colors.update(zip(new_groups, itertools.chain(unused_colors, itertools.cycle(palette))))
 
-    return color_groups
+
+def group_rows(
+    colors: list[str], codes: npt.NDArray[np.intp], rows: npt.NDArray[np.intp]
+) -> dict[str, npt.NDArray[np.intp]]:
+    """Returns the rows of each color, given the index of the color of each row.
+
+    Args:
+        colors (list[str]): The colors.
+        codes (npt.NDArray[np.intp]): The index of the color of each row.
+        rows (npt.NDArray[np.intp]): The 1-based indices of the rows in ascending order.
+
+    Returns:
+        dict[str, npt.NDArray[np.intp]]: A dictionary where keys are colors and values are sorted arrays of row indices.
+
+    """
+    # Stable sorting keeps the row indices of each color in ascending order.
+    sorted_rows = rows[np.argsort(codes, kind="stable")]
+    counts = np.bincount(codes, minlength=len(colors))
+    return dict(zip(colors, np.split(sorted_rows, np.cumsum(counts)[:-1])))
 
 
 @components.return_stage_context("color_ranges")
-def generate_color_ranges(color_groups: dict[str, list[int]]) -> list[tuple[str, gspread_formatting.CellFormat]]:
+def generate_color_ranges(
+    color_groups: dict[str, npt.NDArray[np.intp]],
+) -> list[tuple[str, gspread_formatting.CellFormat]]:
     """Generates color ranges for batch updating in Google Sheets.
 
     Args:
-        color_groups (dict[str, list[int]]): Groups of colors and their corresponding row indices.
+        color_groups (dict[str, npt.NDArray[np.intp]]): Groups of colors and their corresponding row indices.
 
     Returns:
         list[tuple[str, gspread_formatting.CellFormat]]: A list of tuples where each tuple
             contains a cell range and its format.
 
     """
-    color_ranges = []
+    color_ranges: list[tuple[str, gspread_formatting.CellFormat]] = []
 
     for color, rows in color_groups.items():
         cell_format = gspread_formatting.CellFormat(backgroundColor=gspread_formatting.Color.fromHex(color))
 
-        start_row = rows[0]
-        end_row = start_row
-        for current_row in rows[1:]:
-            if current_row == end_row + 1:
-                end_row = current_row
-            else:
-                color_ranges.append((f"{start_row}:{end_row}", cell_format))
-                start_row = current_row
-                end_row = current_row
-
-        color_ranges.append((f"{start_row}:{end_row}", cell_format))
+        # Run boundaries are the positions where the next row index is not consecutive.
+        breaks = np.flatnonzero(np.diff(rows) != 1)
+        start_rows = rows[np.concatenate(([0], breaks + 1))]
+        end_rows = rows[np.concatenate((breaks, [len(rows) - 1]))]
+        color_ranges.extend(
+            (f"{start_row}:{end_row}", cell_format)
+            for start_row, end_row in zip(start_rows.tolist(), end_rows.tolist())
+        )
 
     return color_ranges
 
 
 def apply_formatting(
-    worksheet: gspread.Worksheet, color_ranges: list[tuple[str, gspread_formatting.CellFormat]]
+    worksheet: gspread.Worksheet,
+    color_ranges: list[tuple[str, gspread_formatting.CellFormat]],
+    checkpoint: utils.Checkpoint | None = None,
 ) -> None:
-    """Applies formatting to the worksheet using batch updates.
+    """Applies formatting to the worksheet using size-limited batch updates sent in parallel.
 
     Args:
         worksheet (gspread.Worksheet): The worksheet to apply formatting to.
         color_ranges (list[tuple[str, gspread_formatting.CellFormat]]): Cell ranges and their formats.
+        checkpoint (utils.Checkpoint | None): The checkpoint used to skip payloads sent by an interrupted run.
+            Defaults to None.
 
     """
-    with gspread_formatting.batch_updater(worksheet.spreadsheet) as batch:
-        batch.format_cell_ranges(worksheet, color_ranges)  # pylint: disable=E1101
+    requests = gspread_formatting.batch_update_requests.format_cell_ranges(worksheet, color_ranges)
+    utils.batch_update(
+        worksheet.spreadsheet,
+        requests,
+        start=checkpoint.progress.get("payloads", 0) if checkpoint else 0,
+        on_payload=(lambda sent: checkpoint.update(payloads=sent)) if checkpoint else None,
+    )
+
+
+def save_highlight_state(
+    worksheet: gspread.Worksheet,
+    df: pd.DataFrame,
+    group_column: str,
+    color_groups: dict[str, npt.NDArray[np.intp]],
+) -> None:
+    """Remembers the group value and color of the highlighted rows for the next incremental run.
+
+    The state is saved only if the worksheet already has a state column, i.e. after an incremental run,
+    so that later incremental runs stay correct when the sheet is re-formatted in the regular mode.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to save the state to.
+        df (pd.DataFrame): The DataFrame containing the grouped data.
+        group_column (str): The name of the column to group by.
+        color_groups (dict[str, npt.NDArray[np.intp]]): Colors and the row indices highlighted with them.
+
+    """
+    header = worksheet.row_values(1)
+    if (state_column := _get_state_column(group_column)) not in header:
+        return
+
+    hashes = utils.hash_values(df[group_column])
+    with utils.ColumnWriter(
+        worksheet,
+        header.index(state_column) + 1,
+        chunk_size=10_000,
+        value_input_option=gspread.utils.ValueInputOption.raw,
+    ) as writer:
+        for color, rows in color_groups.items():
+            for row, row_hash in zip(rows.tolist(), hashes[rows - 2]):
+                writer.write(row, f"{row_hash} {color}")
+
+
+def _get_state_column(group_column: str) -> str:
+    """Returns the name of the hidden column with the highlighted groups of the group column."""
+    return f"{group_column} (highlighted groups)"
+
+
+@components.return_stage_context("group_colors")
+def generate_group_colors(df: pd.DataFrame, group_column: str) -> dict[str, str]:
+    """Assigns a color from the palette to each unique value of the group column.
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the data to be grouped.
+        group_column (str): The name of the column to group by.
+
+    Returns:
+        dict[str, str]: A dictionary where keys are group values and values are colors.
+
+    """
+    groups = pd.unique(df[group_column])
+    return dict(zip(groups, utils.generate_palette(len(groups))))
+
+
+def apply_conditional_formatting(worksheet: gspread.Worksheet, group_colors: dict[str, str], group_column: str) -> None:
+    """Replaces the group rules of the worksheet with one conditional formatting rule per group.
+
+    Each rule highlights the rows from the second one to the end of the sheet whose group cell exactly
+    matches the group value, so rows added later are highlighted as well.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to apply formatting to.
+        group_colors (dict[str, str]): Group values and their colors.
+        group_column (str): The name of the column to group by.
+
+    """
+    column_idx = worksheet.row_values(1).index(group_column) + 1
+    column_letter = gspread.utils.rowcol_to_a1(1, column_idx).removesuffix("1")
+    formula_prefix = f"=EXACT(${column_letter}2,"
+
+    new_rules = [
+        gspread_formatting.ConditionalFormatRule(
+            ranges=[gspread_formatting.GridRange(sheetId=worksheet.id, startRowIndex=1)],
+            booleanRule=gspread_formatting.BooleanRule(
+                condition=gspread_formatting.BooleanCondition(
+                    "CUSTOM_FORMULA", [f'{formula_prefix}"{group.replace('"', '""')}")']
+                ),
+                format=gspread_formatting.CellFormat(backgroundColor=gspread_formatting.Color.fromHex(color)),
+            ),
+        )
+        for group, color in group_colors.items()
+        if group != ""
+    ]
+
+    rules = gspread_formatting.get_conditional_format_rules(worksheet)
+    # Rules from previous runs on the same column are replaced, so re-running the tool doesn't stack them.
+    kept_rules = [rule for rule in rules if not _is_group_rule(rule, formula_prefix)]
+    rules.clear()
+    rules.extend(kept_rules + new_rules)
+    rules.save()
+
+
+def _is_group_rule(rule: gspread_formatting.ConditionalFormatRule, formula_prefix: str) -> bool:
+    """Returns whether the conditional formatting rule was created for the group column by this tool."""
+    condition = rule.booleanRule.condition if getattr(rule, "booleanRule", None) else None
+    return bool(
+        condition
+        and condition.type == "CUSTOM_FORMULA"
+        and condition.values
+        and condition.values[0].userEnteredValue.startswith(formula_prefix)
+    )
 
 
 if __name__ == "__main__":
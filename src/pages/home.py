@@ -6,9 +6,7 @@ import components
 def main() -> None:
     """Displays the home page."""
     st.title("SEO Automation")
-    st.write(
-        "A suite of SEO tools, including automation for Google Sheets and keyword clustering features (coming soon)."
-    )
+    st.write("A suite of SEO tools, including automation for Google Sheets and keyword clustering.")
 
     st.subheader("Google Sheets")
     components.card_grid(
@@ -27,6 +25,30 @@ def main() -> None:
                 "icon": "🔍",
                 "description": "Detect the language of text in a Google Sheets column.",
             },
+            {
+                "page": "pages/gsheet_cluster_keywords.py",
+                "label": "Cluster Keywords",
+                "icon": "🧩",
+                "description": "Group similar keywords of a Google Sheets column into clusters.",
+            },
+            {
+                "page": "pages/gsheet_find_duplicates.py",
+                "label": "Find Duplicates",
+                "icon": "👯",
+                "description": "Find near-duplicate keywords in a Google Sheets column.",
+            },
+        ]
+    )
+
+    st.subheader("Local Files")
+    components.card_grid(
+        [
+            {
+                "page": "pages/local_files.py",
+                "label": "Process File",
+                "icon": "📁",
+                "description": "Detect languages, cluster keywords or find duplicates in a large CSV or Parquet file.",
+            },
         ]
     )
 
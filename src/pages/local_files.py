@@ -0,0 +1,266 @@
+import tempfile
+from pathlib import PurePath
+from typing import IO, Any
+
+import numpy as np
+import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+import components
+import utils
+from pages import (
+    gsheet_cluster_keywords,
+    gsheet_detect_language,
+    gsheet_find_duplicates,
+)
+
+TOOLS = {
+    "detect_language": "🔍 Detect Language",
+    "cluster_keywords": "🧩 Cluster Keywords",
+    "find_duplicates": "👯 Find Duplicates",
+}
+# The default name of the column with the results of every tool.
+DESTINATION_COLUMNS = {
+    "detect_language": "Language",
+    "cluster_keywords": "Cluster",
+    "find_duplicates": "Canonical Keyword",
+}
+MIME_TYPES = {
+    ".csv": "text/csv",
+    ".parquet": "application/vnd.apache.parquet",
+    ".pq": "application/vnd.apache.parquet",
+}
+
+
+def main() -> None:
+    """Displays page for running the tools on an uploaded file."""
+    st.title("📁 Process File")
+    st.markdown(
+        "This tool runs Detect Language, Cluster Keywords or Find Duplicates on a column of a CSV or Parquet file "
+        "instead of a Google Sheets, e.g. for datasets too large for Google Sheets. The file is read in chunks, "
+        "and the result is a file of the same format with the results in the destination column."
+    )
+
+    tool = st.radio("Tool", options=list(TOOLS), format_func=lambda name: TOOLS.get(name, name), horizontal=True)
+    with st.form(key="local_files"):
+        uploaded_file = st.file_uploader(
+            "File",
+            type=[extension.lstrip(".") for source in utils.DATA_SOURCES.values() for extension in source.extensions],
+            help="A CSV file with a header row, or a Parquet file.",
+        )
+        source_column = st.text_input(
+            "Source column",
+            help="This column will be used as the source of texts or keywords.",
+        )
+        destination_column = st.text_input(
+            "Destination column",
+            value=DESTINATION_COLUMNS[tool],
+            help="This column will be added to the file to save the results. An existing column is replaced.",
+        )
+        settings = tool_settings(tool)
+        submitted = st.form_submit_button("Run", type="primary")
+
+    if submitted:
+        if not uploaded_file or not source_column or not destination_column:
+            st.warning("Please make sure you have uploaded a file and filled in all fields.", icon="⚠️")
+        else:
+            with tempfile.TemporaryFile() as output:
+                components.stage_status(
+                    stages=[
+                        {
+                            "name": "Opening file",
+                            "func": components.return_stage_context("source")(open_uploaded_file),
+                        },
+                        *get_stages(tool),
+                    ],
+                    context={
+                        "file": uploaded_file,
+                        "output": output,
+                        "source_column": source_column,
+                        "destination_column": destination_column,
+                        **settings,
+                    },
+                )
+                # The download button accepts only the contents, not a file object.
+                output.seek(0)
+                file_name = PurePath(uploaded_file.name)
+                st.download_button(
+                    "Download results",
+                    data=output.read(),
+                    file_name=f"{file_name.stem}_{tool}{file_name.suffix}",
+                    mime=MIME_TYPES.get(file_name.suffix.lower()),
+                    on_click="ignore",
+                    type="primary",
+                    icon="⬇️",
+                )
+
+
+def tool_settings(tool: str) -> dict[str, Any]:
+    """Displays the settings of the tool and returns them as the context of its stages.
+
+    Args:
+        tool (str): The name of the tool in `TOOLS`.
+
+    """
+    if tool == "detect_language":
+        detector = st.selectbox(
+            "Detector",
+            options=list(gsheet_detect_language.DETECTOR_LABELS),
+            format_func=lambda name: gsheet_detect_language.DETECTOR_LABELS.get(name, name),
+            help="The standard detector is the most accurate one. The fast detector is many times faster "
+            "on large files.",
+        )
+        return {"detector": detector}
+    if tool == "cluster_keywords":
+        analyzer = st.selectbox(
+            "Similarity",
+            options=list(gsheet_cluster_keywords.ANALYZER_LABELS),
+            format_func=lambda name: gsheet_cluster_keywords.ANALYZER_LABELS.get(name, name),
+            help="Fuzzy similarity compares sequences of characters, exact similarity compares whole words.",
+        )
+        threshold = st.slider(
+            "Similarity threshold",
+            min_value=0.1,
+            max_value=1.0,
+            value=gsheet_cluster_keywords.DEFAULT_THRESHOLD,
+            step=0.05,
+            help="The minimum cosine similarity of a keyword to the leading keyword of its cluster.",
+        )
+        return {"analyzer": analyzer, "threshold": threshold}
+    threshold = st.slider(
+        "Similarity threshold",
+        min_value=0.5,
+        max_value=1.0,
+        value=gsheet_find_duplicates.DEFAULT_THRESHOLD,
+        step=0.05,
+        help="The minimum share of the character sequences of the words two keywords need to have in common.",
+    )
+    return {"threshold": threshold}
+
+
+def get_stages(tool: str) -> list[components.Stage]:
+    """Returns the stages that run the tool on an opened file and write the results.
+
+    Args:
+        tool (str): The name of the tool in `TOOLS`.
+
+    """
+    if tool == "detect_language":
+        return [{"name": "Language detection and writing to file", "func": detect_language_to_file}]
+    if tool == "cluster_keywords":
+        return [{"name": "Keyword clustering and writing to file", "func": cluster_keywords_to_file}]
+    return [{"name": "Duplicate detection and writing to file", "func": find_duplicates_to_file}]
+
+
+def open_uploaded_file(file: UploadedFile, source_column: str) -> utils.DataSource:
+    """Returns the data source of the uploaded file, reading its contents without copying them.
+
+    Args:
+        file (UploadedFile): The uploaded file.
+        source_column (str): The name of the source column, which has to exist in the file.
+
+    """
+    source = utils.open_data_source(file.name, file.getbuffer())
+    if source_column not in source.columns:
+        raise KeyError(f"The file has no column {source_column!r}, its columns are: {", ".join(source.columns)}.")
+    return source
+
+
+def detect_language_to_file(
+    source: utils.DataSource,
+    output: IO[bytes],
+    source_column: str,
+    destination_column: str,
+    detector: str = "langdetect",
+) -> None:
+    """Detects the language of every text of the source column and writes the file with the results.
+
+    Texts are read, detected and written one chunk at a time, so the memory doesn't grow with the file.
+
+    Args:
+        source (utils.DataSource): The data source of the file.
+        output (IO[bytes]): The file to write the results to.
+        source_column (str): The name of the source column to detect language from.
+        destination_column (str): The name of the destination column to save detected language.
+        detector (str): The name of the language detector to use. Defaults to `langdetect`.
+
+    """
+    languages = components.progress_status(
+        "Language detection and writing to file",
+        total=source.num_rows,
+        func=gsheet_detect_language.detect_language,
+        context={
+            "data": (text for chunk in source.iter_column(source_column) for text in chunk),
+            "detector": detector,
+        },
+    )
+    utils.write_results(source, output, {destination_column: languages})
+
+
+def cluster_keywords_to_file(  # pylint: disable=R0913,R0917
+    source: utils.DataSource,
+    output: IO[bytes],
+    source_column: str,
+    destination_column: str,
+    analyzer: utils.Analyzer = "char",
+    threshold: float = gsheet_cluster_keywords.DEFAULT_THRESHOLD,
+) -> None:
+    """Clusters the keywords of the source column and writes the file with the cluster IDs.
+
+    Only the distinct keywords and a code per row are kept in memory, see `utils.factorize_chunks`.
+
+    Args:
+        source (utils.DataSource): The data source of the file.
+        output (IO[bytes]): The file to write the results to.
+        source_column (str): The name of the source column with the keywords.
+        destination_column (str): The name of the destination column to save the cluster IDs.
+        analyzer (utils.Analyzer): The features keywords are compared by, `char` or `word`. Defaults to `char`.
+        threshold (float): The minimum similarity of a keyword to the leading keyword of its cluster.
+            Defaults to `gsheet_cluster_keywords.DEFAULT_THRESHOLD`.
+
+    """
+    codes, distinct, _ = utils.factorize_chunks(source.iter_column(source_column), key=normalize_keyword)
+    cluster_ids = gsheet_cluster_keywords.get_factorized_clusters(codes, distinct, analyzer, threshold)
+    utils.write_results(source, output, {destination_column: cluster_ids})
+
+
+def find_duplicates_to_file(
+    source: utils.DataSource,
+    output: IO[bytes],
+    source_column: str,
+    destination_column: str,
+    threshold: float = gsheet_find_duplicates.DEFAULT_THRESHOLD,
+) -> None:
+    """Finds the near-duplicate keywords of the source column and writes the file with the canonical keywords.
+
+    The canonical keyword of a row is the first occurrence of the most frequent keyword of its group,
+    like in `gsheet_find_duplicates.save_canonical_keywords`. Empty cells stay empty.
+
+    Args:
+        source (utils.DataSource): The data source of the file.
+        output (IO[bytes]): The file to write the results to.
+        source_column (str): The name of the source column with the keywords.
+        destination_column (str): The name of the destination column to save the canonical keywords.
+        threshold (float): The minimum estimated Jaccard similarity of near-duplicate keywords.
+            Defaults to `gsheet_find_duplicates.DEFAULT_THRESHOLD`.
+
+    """
+    codes, distinct, first_keywords = utils.factorize_chunks(source.iter_column(source_column), key=normalize_keyword)
+    canonical = gsheet_find_duplicates.get_canonical_keywords(codes, distinct, threshold)
+    canonical_keywords = np.array(first_keywords, dtype=object)[canonical]
+    canonical_keywords[np.array(distinct, dtype=object) == ""] = ""
+    utils.write_results(source, output, {destination_column: canonical_keywords[codes]})
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Returns the keyword in lowercase with single spaces, the form keywords are compared in.
+
+    Args:
+        keyword (str): The keyword.
+
+    """
+    return utils.normalize_text(keyword.lower())
+
+
+if __name__ == "__main__":
+    main()
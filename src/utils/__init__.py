@@ -1 +1,143 @@
-from .gsheet import get_data_from_worksheet
+from typing import TYPE_CHECKING
+
+from .lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .checkpoint import Checkpoint, CheckpointStore
+    from .clustering import (
+        Analyzer,
+        SparseMatrix,
+        iter_leader_clusters,
+        vectorize_texts,
+    )
+    from .color import PALETTE_SIZE, generate_palette
+    from .detectors import DETECTORS, UNKNOWN_LANGUAGE, LanguageDetector, get_detector
+    from .files import (
+        DATA_SOURCES,
+        CSVSource,
+        DataSource,
+        FileSource,
+        ParquetSource,
+        open_data_source,
+        write_results,
+    )
+    from .gsheet import (
+        ColumnDtype,
+        ColumnWriter,
+        append_columns,
+        batch_update,
+        get_data_from_worksheet,
+        iter_column_windows,
+        refresh_grid_properties,
+        split_requests,
+    )
+    from .incremental import get_changed_rows, hash_value, hash_values
+    from .jobs import (
+        Job,
+        JobCancelledError,
+        JobProgress,
+        JobRunner,
+        JobState,
+        get_current_job,
+        get_job_runner,
+    )
+    from .language import (
+        LanguageCache,
+        detect_languages,
+        get_language_name,
+        normalize_text,
+    )
+    from .metrics import (
+        PROFILERS,
+        ProfilerName,
+        StageMetrics,
+        TrafficStats,
+        format_metrics,
+        log_event,
+        log_metrics,
+        measure_stage,
+    )
+    from .minhash import (
+        MIN_RECALL,
+        NUM_PERMUTATIONS,
+        connected_components,
+        estimate_similarity,
+        find_near_duplicates,
+        get_lsh_bands,
+        minhash_signatures,
+    )
+    from .progress import ProgressMeter, format_duration
+    from .quota import (
+        DEFAULT_QUOTA,
+        QuotaConfig,
+        ScheduledHTTPClient,
+        SchedulerStats,
+        SheetsScheduler,
+        get_scheduler,
+        get_scheduler_stats,
+        get_traffic_stats,
+    )
+    from .stream import factorize_chunks, prefetch
+
+# Submodules are imported on first use of one of their names, so a page imports only the dependencies of the
+# utilities it uses, e.g. the Home page imports neither pandas nor gspread.
+_SUBMODULES = {
+    "checkpoint": ("Checkpoint", "CheckpointStore"),
+    "clustering": ("Analyzer", "SparseMatrix", "iter_leader_clusters", "vectorize_texts"),
+    "color": ("PALETTE_SIZE", "generate_palette"),
+    "detectors": ("DETECTORS", "UNKNOWN_LANGUAGE", "LanguageDetector", "get_detector"),
+    "files": (
+        "DATA_SOURCES",
+        "CSVSource",
+        "DataSource",
+        "FileSource",
+        "ParquetSource",
+        "open_data_source",
+        "write_results",
+    ),
+    "gsheet": (
+        "ColumnDtype",
+        "ColumnWriter",
+        "append_columns",
+        "batch_update",
+        "get_data_from_worksheet",
+        "iter_column_windows",
+        "refresh_grid_properties",
+        "split_requests",
+    ),
+    "incremental": ("get_changed_rows", "hash_value", "hash_values"),
+    "jobs": ("Job", "JobCancelledError", "JobProgress", "JobRunner", "JobState", "get_current_job", "get_job_runner"),
+    "language": ("LanguageCache", "detect_languages", "get_language_name", "normalize_text"),
+    "metrics": (
+        "PROFILERS",
+        "ProfilerName",
+        "StageMetrics",
+        "TrafficStats",
+        "format_metrics",
+        "log_event",
+        "log_metrics",
+        "measure_stage",
+    ),
+    "minhash": (
+        "MIN_RECALL",
+        "NUM_PERMUTATIONS",
+        "connected_components",
+        "estimate_similarity",
+        "find_near_duplicates",
+        "get_lsh_bands",
+        "minhash_signatures",
+    ),
+    "progress": ("ProgressMeter", "format_duration"),
+    "quota": (
+        "DEFAULT_QUOTA",
+        "QuotaConfig",
+        "ScheduledHTTPClient",
+        "SchedulerStats",
+        "SheetsScheduler",
+        "get_scheduler",
+        "get_scheduler_stats",
+        "get_traffic_stats",
+    ),
+    "stream": ("factorize_chunks", "prefetch"),
+}
+__getattr__, __dir__ = lazy_exports(__name__, _SUBMODULES)
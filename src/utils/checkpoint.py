@@ -0,0 +1,162 @@
+import contextlib
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from . import sqlite
+
+CHECKPOINT_PATH = Path.home() / ".cache" / "seo-automation" / "checkpoints.sqlite3"
+
+
+class Checkpoint:  # pylint: disable=R0902
+    """Saved state of a run of stages, used to resume the run after it was interrupted.
+
+    Args:
+        store (CheckpointStore): The store the checkpoint is saved to.
+        key (str): The key identifying the job, e.g. the tool, spreadsheet and worksheet.
+        fingerprint (str): The hash of the settings of the run. Runs with other settings can't resume it.
+        stage (int): The number of completed stages. Defaults to 0.
+        context (dict[str, Any] | None): The context after the completed stages. Defaults to None.
+        progress (dict[str, Any] | None): The progress of the current stage, saved by the stage itself.
+            Defaults to None.
+        updated_at (float | None): The time of the last save. Defaults to now.
+
+    """
+
+    def __init__(  # pylint: disable=R0913,R0917
+        self,
+        store: "CheckpointStore",
+        key: str,
+        fingerprint: str,
+        stage: int = 0,
+        context: dict[str, Any] | None = None,
+        progress: dict[str, Any] | None = None,
+        updated_at: float | None = None,
+    ) -> None:
+        self.store = store
+        self.key = key
+        self.fingerprint = fingerprint
+        self.stage = stage
+        self.context = context or {}
+        self.progress = progress or {}
+        self.updated_at = updated_at or time.time()
+        self._lock = threading.Lock()
+
+    def complete_stage(self, context: dict[str, Any]) -> None:
+        """Saves the context after a completed stage and clears the stage progress.
+
+        Args:
+            context (dict[str, Any]): The context after the stage. Values that can't be pickled are skipped.
+
+        """
+        with self._lock:
+            self.stage += 1
+            self.context = context
+            self.progress = {}
+            self.store.save(self)
+
+    def update(self, **progress: Any) -> None:
+        """Saves the progress of the current stage. It can be called from any thread.
+
+        Args:
+            **progress (Any): The progress values to save, e.g. the last written row.
+
+        """
+        with self._lock:
+            self.progress.update(progress)
+            self.store.save(self, progress_only=True)
+
+    def delete(self) -> None:
+        """Deletes the checkpoint once the run is completed."""
+        self.store.delete(self.key)
+
+
+class CheckpointStore:
+    """Persistent store of checkpoints keyed by job.
+
+    Checkpoints are stored in a SQLite database, so they survive disconnected sessions and restarts
+    of the app. Checkpoints that weren't updated for `max_age` seconds are discarded.
+
+    Args:
+        path (Path): The path to the SQLite database file. Defaults to `CHECKPOINT_PATH`.
+        max_age (float): The number of seconds after which checkpoints expire. Defaults to 7 days.
+
+    """
+
+    def __init__(self, path: Path = CHECKPOINT_PATH, max_age: float = 7 * 24 * 3600) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite.connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "stage INTEGER NOT NULL, context BLOB NOT NULL, progress BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def load(self, key: str) -> Checkpoint | None:
+        """Returns the checkpoint of the job, or None if there is no recent checkpoint.
+
+        Args:
+            key (str): The key identifying the job.
+
+        """
+        with sqlite.connect(self.path) as connection:
+            connection.execute("DELETE FROM checkpoints WHERE updated_at < ?", (time.time() - self.max_age,))
+            row = connection.execute(
+                "SELECT fingerprint, stage, context, progress, updated_at FROM checkpoints WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        fingerprint, stage, context, progress, updated_at = row
+        context = {name: pickle.loads(value) for name, value in pickle.loads(context).items()}
+        return Checkpoint(self, key, fingerprint, stage, context, pickle.loads(progress), updated_at)
+
+    def save(self, checkpoint: Checkpoint, progress_only: bool = False) -> None:
+        """Saves the checkpoint, replacing the previous checkpoint of the job.
+
+        Args:
+            checkpoint (Checkpoint): The checkpoint to save.
+            progress_only (bool): Whether to update only the stage progress, which is much cheaper
+                than saving the whole context. Defaults to False.
+
+        """
+        checkpoint.updated_at = time.time()
+        progress = pickle.dumps(checkpoint.progress)
+        with sqlite.connect(self.path) as connection:
+            if progress_only:
+                connection.execute(
+                    "UPDATE checkpoints SET progress = ?, updated_at = ? WHERE key = ?",
+                    (progress, checkpoint.updated_at, checkpoint.key),
+                )
+                return
+
+            context = {}
+            for name, value in checkpoint.context.items():
+                # Values like open connections can't be stored. Stages that need them must create them again.
+                with contextlib.suppress(pickle.PicklingError, TypeError, AttributeError):
+                    context[name] = pickle.dumps(value)
+            connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (key, fingerprint, stage, context, progress, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    checkpoint.key,
+                    checkpoint.fingerprint,
+                    checkpoint.stage,
+                    pickle.dumps(context),
+                    progress,
+                    checkpoint.updated_at,
+                ),
+            )
+
+    def delete(self, key: str) -> None:
+        """Deletes the checkpoint of the job.
+
+        Args:
+            key (str): The key identifying the job.
+
+        """
+        with sqlite.connect(self.path) as connection:
+            connection.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
@@ -0,0 +1,396 @@
+from typing import Iterator, Literal, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+Analyzer = Literal["word", "char", "char_wb"]
+
+# Features are hashed into 2**FEATURE_BITS columns, so no vocabulary has to be kept in memory.
+FEATURE_BITS = 20
+# Texts are truncated to this many characters before their character n-grams are extracted.
+MAX_TEXT_LENGTH = 200
+# The number of rows clustered at once.
+BLOCK_SIZE = 2000
+# The maximum number of feature products computed at once by the similarity search, which bounds its memory.
+MAX_PRODUCTS = 2_000_000
+# Multiplier of the Fibonacci hashing of character n-grams into feature columns.
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Pairs of rows: the positions of rows in a block, the other rows and the similarities of the pairs.
+_Pairs = tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.float64]]
+
+
+class SparseMatrix:
+    """Rows of a sparse matrix in compressed sparse row format.
+
+    Args:
+        indptr (npt.NDArray[np.int64]): The offsets of the rows in `indices` and `data`, one more than the rows.
+        indices (npt.NDArray[np.int64]): The column of every stored value, sorted within each row.
+        data (npt.NDArray[np.float32]): The stored values.
+        n_columns (int): The number of columns.
+
+    """
+
+    def __init__(
+        self,
+        indptr: npt.NDArray[np.int64],
+        indices: npt.NDArray[np.int64],
+        data: npt.NDArray[np.float32],
+        n_columns: int,
+    ) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_columns = n_columns
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def rows(self) -> npt.NDArray[np.int64]:
+        """The row of every stored value."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+
+def vectorize_texts(texts: Sequence[str], analyzer: Analyzer = "word", chunk_size: int = 10_000) -> SparseMatrix:
+    """Returns the TF-IDF vectors of the texts as rows of a sparse matrix with unit norms.
+
+    Texts are split into lowercase words, or into character 3-grams of the lowercase text with single spaces,
+    which also match misspellings and word forms, see `extract_features`. Features are hashed into
+    `2**FEATURE_BITS` columns. Term frequencies are sublinear and inverse document frequencies are smoothed.
+    Texts without features, e.g. empty ones, have empty rows.
+
+    Args:
+        texts (Sequence[str]): The texts to vectorize.
+        analyzer (Analyzer): The features of the texts. Defaults to `word`.
+        chunk_size (int): The number of texts split into features at once. Defaults to 10000.
+
+    """
+    keys_chunks, counts_chunks = [], []
+    for start in range(0, len(texts), chunk_size):
+        rows, features = extract_features(pd.Series(texts[slice(start, start + chunk_size)], dtype=object), analyzer)
+        keys, counts = np.unique((rows + start) << FEATURE_BITS | features, return_counts=True)
+        keys_chunks.append(keys)
+        counts_chunks.append(counts)
+
+    keys = np.concatenate(keys_chunks) if keys_chunks else np.empty(0, dtype=np.int64)
+    counts = np.concatenate(counts_chunks) if counts_chunks else np.empty(0, dtype=np.int64)
+    rows = keys >> FEATURE_BITS
+    features = keys & ((1 << FEATURE_BITS) - 1)
+    document_frequency = np.bincount(features, minlength=1 << FEATURE_BITS)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    data = (1 + np.log(counts)) * idf[features]
+    data /= np.sqrt(np.bincount(rows, data**2, minlength=len(texts)))[rows]
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(texts)))))
+    return SparseMatrix(indptr, features, data.astype(np.float32), 1 << FEATURE_BITS)
+
+
+def extract_features(texts: pd.Series, analyzer: Analyzer) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Returns the row and the hashed feature of every occurrence of a feature in the texts.
+
+    Args:
+        texts (pd.Series): The texts, with a range index.
+        analyzer (Analyzer): `word` for lowercase words, `char` for character 3-grams of the lowercase text with
+            single spaces, or `char_wb` for character 3-grams of every lowercase word padded with spaces,
+            which ignore punctuation and the order of the words.
+
+    """
+    if analyzer == "char_wb":
+        words = texts.str.lower().str.findall(r"\w+").explode().dropna()
+        rows, features = extract_features(pd.Series(words.to_numpy(dtype=object), dtype=object), "char")
+        return words.index.to_numpy(dtype=np.int64)[rows], features
+    if analyzer == "word":
+        words = texts.str.lower().str.findall(r"\w+").explode().dropna()
+        hashes = pd.util.hash_array(words.to_numpy(dtype=object))
+        return words.index.to_numpy(dtype=np.int64), (hashes >> np.uint64(64 - FEATURE_BITS)).astype(np.int64)
+
+    padded = " " + texts.str.lower().str.split().str.join(" ").str.slice(0, MAX_TEXT_LENGTH) + " "
+    lengths = padded.str.len().to_numpy(dtype=np.int64)
+    width = int(lengths.max(initial=3))
+    # Every character is a code point below 2**21, so three of them make a unique 63-bit n-gram code.
+    codes = np.array(padded.tolist(), dtype=f"<U{width}").view(np.uint32).reshape(len(padded), width)
+    codes = codes.astype(np.uint64)
+    grams = codes[:, :-2] << np.uint64(42) | codes[:, 1:-1] << np.uint64(21) | codes[:, 2:]
+    valid = np.arange(width - 2) < (lengths - 2)[:, np.newaxis]
+    hashes = grams[valid] * _HASH_MULTIPLIER >> np.uint64(64 - FEATURE_BITS)
+    return np.nonzero(valid)[0].astype(np.int64), hashes.astype(np.int64)
+
+
+def iter_leader_clusters(
+    matrix: SparseMatrix,
+    threshold: float,
+    order: npt.NDArray[np.int64] | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> Iterator[tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]]:
+    """Clusters the rows around leader rows and yields the leader of every row, block by block.
+
+    Rows are processed in the given order. A row joins the most similar leader of the previous blocks whose
+    cosine similarity is at least the threshold. The remaining rows of a block are processed one by one:
+    a row joins its most similar earlier leader of the block, or becomes a new leader. Unlike linking all
+    similar pairs, clusters can't grow into chains of gradually changing rows, and rows are only compared
+    with leaders, so the work depends on the number of clusters rather than on the number of pairs of rows.
+
+    Args:
+        matrix (SparseMatrix): The rows, with unit norms. Empty rows become leaders of their own.
+        threshold (float): The minimum cosine similarity of a row to its leader, greater than 0.
+        order (npt.NDArray[np.int64] | None): The rows in the order they're processed, e.g. the most important
+            ones first, so they become leaders. Defaults to None, which is the order of the rows.
+        block_size (int): The number of rows processed at once. Defaults to `BLOCK_SIZE`.
+
+    Yields:
+        tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]: The rows of the block and the leader of every row.
+
+    """
+    search = _SimilaritySearch(matrix, threshold)
+    order = np.arange(len(matrix), dtype=np.int64) if order is None else order
+    no_leaders = np.empty(0, dtype=np.int64)
+    # New leaders are indexed separately until there are enough of them to rebuild the main index.
+    indexed, pending = _Postings(search, no_leaders), _Postings(search, no_leaders)
+    for start in range(0, len(order), block_size):
+        rows = order[slice(start, start + block_size)]
+        leaders = _most_similar(_concat_pairs([search.find(rows, indexed), search.find(rows, pending)]), len(rows))
+        unmatched = np.flatnonzero(leaders < 0)
+        leaders[unmatched] = _cluster_block(search, rows[unmatched])
+
+        new_leaders = rows[unmatched][leaders[unmatched] == rows[unmatched]]
+        if pending.size + len(new_leaders) > max(indexed.size // 4, block_size):
+            indexed = _Postings(search, np.concatenate((indexed.leaders, pending.leaders, new_leaders)))
+            pending = _Postings(search, no_leaders)
+        else:
+            pending = _Postings(search, np.concatenate((pending.leaders, new_leaders)))
+        yield rows, leaders
+
+
+def _most_similar(pairs: _Pairs, size: int) -> npt.NDArray[np.int64]:
+    """Returns the most similar row at every position, or -1 for positions without similar rows."""
+    positions, candidates, similarity = pairs
+    order = np.lexsort((-similarity, positions))
+    matched, first_idx = np.unique(positions[order], return_index=True)
+    most_similar = np.full(size, -1, dtype=np.int64)
+    most_similar[matched] = candidates[order][first_idx]
+    return most_similar
+
+
+def _cluster_block(search: "_SimilaritySearch", rows: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Returns the leader of every row, picking the leaders among the rows one by one in their order."""
+    positions, candidates, similarity = search.find(rows, _Postings(search, rows))
+    sorter = np.argsort(rows)
+    candidates = sorter[np.searchsorted(rows, candidates, sorter=sorter)]
+    # The candidate leaders of every row are the earlier similar rows, the most similar first.
+    earlier = candidates < positions
+    positions, candidates, similarity = positions[earlier], candidates[earlier], similarity[earlier]
+    order = np.lexsort((-similarity, positions))
+    ordered_candidates = candidates[order].tolist()
+    bounds = np.searchsorted(positions[order], np.arange(len(rows) + 1)).tolist()
+
+    leaders = list(range(len(rows)))
+    for idx in range(len(rows)):
+        for candidate in ordered_candidates[slice(bounds[idx], bounds[idx + 1])]:
+            if leaders[candidate] == candidate:
+                leaders[idx] = candidate
+                break
+    return rows[leaders]
+
+
+def _concat_pairs(pairs: list[_Pairs]) -> _Pairs:
+    """Returns the concatenated pairs of rows."""
+    positions, candidates, similarity = zip(*pairs)
+    return np.concatenate(positions), np.concatenate(candidates), np.concatenate(similarity)
+
+
+def _concat_ranges(starts: npt.NDArray[np.int64], counts: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Returns the concatenated ranges of the given starts and lengths."""
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum(), dtype=np.int64)
+
+
+def _iter_groups(sizes_before: npt.NDArray[np.int64], max_size: int) -> Iterator[tuple[int, int]]:
+    """Yields the bounds of consecutive groups of items whose total size is at most `max_size`.
+
+    Args:
+        sizes_before (npt.NDArray[np.int64]): The total size of the items before every item, and of all items.
+        max_size (int): The maximum total size of a group, exceeded only by groups of a single item.
+
+    Yields:
+        tuple[int, int]: The first item of the group and the item after the group.
+
+    """
+    start = 0
+    while start < len(sizes_before) - 1:
+        end = int(np.searchsorted(sizes_before, sizes_before[start] + max_size, side="right")) - 1
+        end = max(end, start + 1)
+        yield start, end
+        start = end
+
+
+class _Postings:  # pylint: disable=R0903
+    """Inverted index of the rare features of the leader rows, with the values of every feature sorted by row.
+
+    Args:
+        search (_SimilaritySearch): The similarity search that splits the features of the rows.
+        leaders (npt.NDArray[np.int64]): The indexed rows.
+
+    """
+
+    def __init__(self, search: "_SimilaritySearch", leaders: npt.NDArray[np.int64]) -> None:
+        self.leaders = leaders
+        self.size = len(leaders)
+        counts = search.probe_ptr[leaders + 1] - search.probe_ptr[leaders]
+        values = search.probes[_concat_ranges(search.probe_ptr[leaders], counts)]
+        order = np.argsort(search.matrix.indices[values], kind="stable")
+        self.features = search.matrix.indices[values][order]
+        self.rows = np.repeat(leaders, counts)[order]
+        self.data = search.matrix.data[values][order]
+        self.suffix_norms = search.suffix_norms[values][order]
+
+
+class _SimilaritySearch:  # pylint: disable=R0903
+    """Finds the indexed rows similar to the given rows, with prefix filtering.
+
+    The most common features of a row, as long as their norm is below the threshold, are its common features
+    and the others its rare features. Features are ordered by their frequency, so of two similar rows, the one
+    whose common features start first can't reach the threshold with them alone, and the rows share a feature
+    that is rare in both. Only rare features are indexed and looked up, which skips the long lists of rows of
+    the most common features. Candidates whose similarity can't reach the threshold are dropped before their
+    exact similarity is computed. At most `max_products` feature products are computed at once, unless a single
+    row needs more.
+
+    Args:
+        matrix (SparseMatrix): The rows, with unit norms.
+        threshold (float): The minimum cosine similarity, greater than 0.
+        max_products (int): The number of feature products computed at once. Defaults to `MAX_PRODUCTS`.
+
+    """
+
+    def __init__(self, matrix: SparseMatrix, threshold: float, max_products: int = MAX_PRODUCTS) -> None:
+        self.matrix = matrix
+        self.threshold = threshold
+        self.max_products = max_products
+        rows = matrix.rows
+
+        # Values sorted by row, most common features first. The slack keeps rounding errors from losing pairs.
+        frequency = np.bincount(matrix.indices, minlength=matrix.n_columns)
+        order = np.lexsort((-frequency[matrix.indices], rows))
+        squares = matrix.data[order].astype(np.float64) ** 2
+        cumulative = np.cumsum(squares)
+        cumulative -= np.concatenate(([0.0], cumulative))[matrix.indptr[:-1]][rows[order]]
+        is_common = cumulative < threshold**2 * (1 - 1e-6)
+        # The norm of the features of the row from every feature to its most common feature.
+        self.suffix_norms = np.empty(len(matrix.data), dtype=np.float32)
+        self.suffix_norms[order] = np.sqrt(cumulative)
+        self.probes = order[~is_common]
+        self.probe_ptr = np.concatenate(([0], np.cumsum(np.bincount(rows[self.probes], minlength=len(matrix)))))
+        self.common_norms = np.sqrt(np.bincount(rows[order[is_common]], squares[is_common], minlength=len(matrix)))
+
+    def find(self, rows: npt.NDArray[np.int64], index: _Postings) -> _Pairs:
+        """Returns the pairs of a row and an indexed row whose similarity is at least the threshold.
+
+        Args:
+            rows (npt.NDArray[np.int64]): The rows to find similar rows of.
+            index (_Postings): The indexed rows.
+
+        Returns:
+            _Pairs: The positions of the rows in `rows`, the similar indexed rows and their similarities.
+
+        """
+        probe_counts = self.probe_ptr[rows + 1] - self.probe_ptr[rows]
+        probes = self.probes[_concat_ranges(self.probe_ptr[rows], probe_counts)]
+        positions = np.repeat(np.arange(len(rows), dtype=np.int64), probe_counts)
+        starts = np.searchsorted(index.features, self.matrix.indices[probes], side="left")
+        counts = np.searchsorted(index.features, self.matrix.indices[probes], side="right") - starts
+
+        probes_before = np.concatenate(([0], np.cumsum(probe_counts)))
+        products_before = np.concatenate(([0], np.cumsum(np.bincount(positions, counts, minlength=len(rows)))))
+        results: list[_Pairs] = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))]
+        for start, end in _iter_groups(products_before, self.max_products):
+            group = slice(probes_before[start], probes_before[end])
+            results.append(self._find_group(rows, positions[group], probes[group], starts[group], counts[group], index))
+        return _concat_pairs(results)
+
+    def _find_group(  # pylint: disable=R0913,R0917
+        self,
+        rows: npt.NDArray[np.int64],
+        positions: npt.NDArray[np.int64],
+        probes: npt.NDArray[np.int64],
+        starts: npt.NDArray[np.int64],
+        counts: npt.NDArray[np.int64],
+        index: _Postings,
+    ) -> _Pairs:
+        """Returns the similar pairs of a group of rows, given the postings matching their rare features."""
+        first, second, bound = self._bound_pairs(rows, positions, probes, counts, _concat_ranges(starts, counts), index)
+        candidate = bound >= self.threshold * (1 - 1e-6)
+        first, second = first[candidate], second[candidate]
+        similarity = self._dot(rows, first, second)
+        similar = similarity >= self.threshold
+        return first[similar], second[similar], similarity[similar]
+
+    def _bound_pairs(  # pylint: disable=R0913,R0917
+        self,
+        rows: npt.NDArray[np.int64],
+        positions: npt.NDArray[np.int64],
+        probes: npt.NDArray[np.int64],
+        counts: npt.NDArray[np.int64],
+        postings: npt.NDArray[np.int64],
+        index: _Postings,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """Returns the pairs of rows sharing rare features and upper bounds of their similarities."""
+        values = np.repeat(self.matrix.data[probes], counts).astype(np.float64)
+        pairs, inverse = np.unique(
+            np.repeat(positions, counts) * len(self.matrix) + index.rows[postings], return_inverse=True
+        )
+        partial = np.bincount(inverse, values * index.data[postings], minlength=len(pairs))
+        first, second = pairs // len(self.matrix), pairs % len(self.matrix)
+        # All shared features follow the first shared rare feature, so the norms of both rows from that feature on
+        # bound the similarity.
+        bound = np.zeros(len(pairs))
+        np.maximum.at(bound, inverse, np.repeat(self.suffix_norms[probes], counts) * index.suffix_norms[postings])
+        # The other shared features are common in a row, and add at most the norm of the common features of the row
+        # whose common features start first, and at most the product of the norms of the other features.
+        other_bound = np.minimum(
+            np.maximum(self.common_norms[rows[first]], self.common_norms[second]),
+            _other_norms(inverse, values, len(pairs)) * _other_norms(inverse, index.data[postings], len(pairs)),
+        )
+        return first, second, np.minimum(bound, partial + other_bound)
+
+    def _dot(
+        self, rows: npt.NDArray[np.int64], first: npt.NDArray[np.int64], second: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.float64]:
+        """Returns the dot products of the rows at the first positions with the second rows."""
+        # The features of the second rows are looked up among the few values of the rows, rather than all values.
+        row_counts = self.matrix.indptr[rows + 1] - self.matrix.indptr[rows]
+        row_values = _concat_ranges(self.matrix.indptr[rows], row_counts)
+        keys = np.repeat(np.arange(len(rows), dtype=np.int64), row_counts) << FEATURE_BITS
+        keys |= self.matrix.indices[row_values]
+
+        counts = self.matrix.indptr[second + 1] - self.matrix.indptr[second]
+        values_before = np.concatenate(([0], np.cumsum(counts)))
+        dots = np.empty(len(first), dtype=np.float64)
+        for start, end in _iter_groups(values_before, self.max_products):
+            group = slice(start, end)
+            values = _concat_ranges(self.matrix.indptr[second[group]], counts[group])
+            dots[group] = self._dot_values(keys, row_values, first[group], values, counts[group])
+        return dots
+
+    def _dot_values(  # pylint: disable=R0913,R0917
+        self,
+        keys: npt.NDArray[np.int64],
+        row_values: npt.NDArray[np.int64],
+        first: npt.NDArray[np.int64],
+        values: npt.NDArray[np.int64],
+        counts: npt.NDArray[np.int64],
+    ) -> npt.NDArray[np.float64]:
+        """Returns the dot products of the rows at the first positions with the values of the second rows."""
+        queries = np.repeat(first, counts) << FEATURE_BITS | self.matrix.indices[values]
+        matches = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+        products = self.matrix.data[values].astype(np.float64) * self.matrix.data[row_values[matches]]
+        products[keys[matches] != queries] = 0.0
+        dots = np.bincount(np.repeat(np.arange(len(first)), counts), products, minlength=len(first))
+        # The weighted counts are floats, which the type stubs of numpy don't know.
+        return dots.astype(np.float64, copy=False)
+
+
+def _other_norms(
+    inverse: npt.NDArray[np.int64], values: npt.NDArray[np.float32 | np.float64], size: int
+) -> npt.NDArray[np.float64]:
+    """Returns the norms of unit rows without the values of every pair, given the pair of every value."""
+    return np.sqrt(np.clip(1 - np.bincount(inverse, values.astype(np.float64) ** 2, minlength=size), 0, None))
@@ -0,0 +1,27 @@
+import colorsys
+
+# The palette walks the hue circle in steps close to the golden ratio (73 / 120), so consecutive colors are
+# far apart. After a full turn it switches to the next lightness/saturation tier, which keeps all colors unique.
+HUE_STEPS = 120
+HUE_STRIDE = 73
+TIERS = [(0.78, 0.85), (0.86, 0.75), (0.70, 0.65), (0.82, 0.55), (0.90, 0.85), (0.74, 0.45)]
+PALETTE_SIZE = HUE_STEPS * len(TIERS)
+
+
+def generate_palette(size: int) -> list[str]:
+    """Returns a deterministic palette of light, distinct colors as hex strings.
+
+    Colors are unique up to `PALETTE_SIZE`. Larger palettes repeat the colors in the same order.
+
+    Args:
+        size (int): The number of colors to generate.
+
+    """
+    palette = []
+    for idx in range(size):
+        tier, hue_step = divmod(idx % PALETTE_SIZE, HUE_STEPS)
+        lightness, saturation = TIERS[tier]
+        hue = hue_step * HUE_STRIDE % HUE_STEPS / HUE_STEPS
+        red, green, blue = colorsys.hls_to_rgb(hue, lightness, saturation)
+        palette.append(f"#{round(red * 255):02X}{round(green * 255):02X}{round(blue * 255):02X}")
+    return palette
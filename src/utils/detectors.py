@@ -0,0 +1,187 @@
+import abc
+import functools
+import re
+
+import langdetect
+import numpy as np
+import numpy.typing as npt
+from langdetect.detector import Detector
+from langdetect.lang_detect_exception import LangDetectException
+from langdetect.utils.ngram import NGram
+
+# langdetect is non-deterministic unless seeded, which would make cached and fresh results disagree.
+langdetect.DetectorFactory.seed = 0
+
+UNKNOWN_LANGUAGE = Detector.UNKNOWN_LANG
+
+
+class LanguageDetector(abc.ABC):
+    """Interface of a language detection backend.
+
+    Args:
+        max_length (int): The number of characters of each text used for detection. Defaults to 1000.
+
+    """
+
+    name: str
+
+    def __init__(self, max_length: int = 1000) -> None:
+        self.max_length = max_length
+
+    def detect(self, text: str) -> str:
+        """Returns the language code of a single text.
+
+        Args:
+            text (str): The text to detect the language of.
+
+        """
+        return self.detect_many([text])[0][0]
+
+    @abc.abstractmethod
+    def detect_many(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        """Returns the language codes of the texts and the confidence of each detection.
+
+        Texts without any language features get `UNKNOWN_LANGUAGE` with zero confidence.
+
+        Args:
+            texts (list[str]): The texts to detect the language of.
+
+        """
+
+
+class LangdetectDetector(LanguageDetector):
+    """Language detector backed by the `langdetect` library."""
+
+    name = "langdetect"
+
+    def __init__(self, max_length: int = 1000) -> None:
+        super().__init__(max_length)
+        langdetect.detector_factory.init_factory()
+
+    def detect_many(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        codes, probs = [], []
+        for text in texts:
+            detector = langdetect.detector_factory._factory.create()  # pylint: disable=W0212
+            detector.set_max_text_length(self.max_length)
+            detector.append(text)
+            try:
+                # Languages at or below the probability threshold of langdetect are left out, possibly all of them.
+                probabilities = detector.get_probabilities()
+            except LangDetectException:
+                probabilities = []
+            if probabilities:
+                codes.append(probabilities[0].lang)
+                probs.append(probabilities[0].prob)
+            else:
+                codes.append(UNKNOWN_LANGUAGE)
+                probs.append(0.0)
+        return codes, probs
+
+
+class NgramDetector(LanguageDetector):
+    """Language detector that scores whole batches of texts against precompiled n-gram profiles.
+
+    It uses the same profiles and text normalization as `langdetect`, but instead of sampling n-grams
+    at random it sums the log-probabilities of all n-grams of a text with NumPy, which is deterministic
+    and much faster. The confidence is the softmax of the resulting language scores.
+
+    Args:
+        max_length (int): The number of characters of each text used for detection. Defaults to 1000.
+
+    """
+
+    name = "ngram"
+
+    def __init__(self, max_length: int = 1000) -> None:
+        super().__init__(max_length)
+        langdetect.detector_factory.init_factory()
+        factory = langdetect.detector_factory._factory  # pylint: disable=W0212
+        self.languages = np.array(factory.langlist)
+
+        words = [word for word in factory.word_lang_prob_map if 1 <= len(word) <= NGram.N_GRAM]
+        self.vocabulary = {word: idx for idx, word in enumerate(words)}
+        probs = np.array([factory.word_lang_prob_map[word] for word in words], dtype=np.float32)
+        self.log_probs = np.log(probs + Detector.ALPHA_DEFAULT / Detector.BASE_FREQ)
+
+    def detect_many(self, texts: list[str]) -> tuple[list[str], list[float]]:
+        ngram_ids = [self._extract_ngram_ids(text) for text in texts]
+        counts = np.array([len(ids) for ids in ngram_ids])
+        if not counts.sum():
+            return [UNKNOWN_LANGUAGE] * len(texts), [0.0] * len(texts)
+
+        # Sum the log-probabilities of the n-grams of each text. Texts are stored one after another,
+        # so the sums are computed with a single `reduceat` over the start offsets of non-empty texts.
+        has_ngrams = counts > 0
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))[has_ngrams]
+        scores = np.add.reduceat(self.log_probs[np.concatenate(ngram_ids)], offsets, axis=0)
+
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        codes = np.full(len(texts), UNKNOWN_LANGUAGE, dtype=object)
+        confidences = np.zeros(len(texts))
+        codes[has_ngrams] = self.languages[probs.argmax(axis=1)]
+        confidences[has_ngrams] = probs.max(axis=1)
+        return codes.tolist(), confidences.tolist()
+
+    def _extract_ngram_ids(self, text: str) -> npt.NDArray[np.intp]:
+        """Returns vocabulary indices of the n-grams that `langdetect` would extract from the text."""
+        text = Detector.MAIL_RE.sub(" ", Detector.URL_RE.sub(" ", text))
+        text = _clean_text(NGram.normalize_vi(text)[: self.max_length])
+        text = " " + " ".join(text.translate(_get_normalization_table()).split())
+
+        ids = []
+        for end in range(1, len(text)):
+            # langdetect skips n-grams ending inside a run of capital letters.
+            if text[end].isupper() and text[end - 1].isupper():
+                continue
+            stop = end + 1
+            for start in range(end, max(end - NGram.N_GRAM, -1), -1):
+                # N-grams never span a space, except for the word boundaries at their ends.
+                if start < end - 1 and text[end - 1] == " ":
+                    break
+                ngram = text[start:stop]
+                if ngram != " " and (idx := self.vocabulary.get(ngram)) is not None:
+                    ids.append(idx)
+        return np.array(ids, dtype=np.intp)
+
+
+DETECTORS: dict[str, type[LanguageDetector]] = {
+    LangdetectDetector.name: LangdetectDetector,
+    NgramDetector.name: NgramDetector,
+}
+
+
+@functools.cache
+def get_detector(name: str) -> LanguageDetector:
+    """Returns a shared detector instance, so profiles are loaded only once per process.
+
+    Args:
+        name (str): The name of the detector in `DETECTORS`.
+
+    """
+    return DETECTORS[name]()
+
+
+@functools.cache
+def _get_normalization_table() -> dict[int, str]:
+    """Returns a `str.translate` table with the `langdetect` normalization of all BMP characters."""
+    table = {}
+    for code in range(0x10000):
+        normalized = NGram.normalize(chr(code))
+        if normalized != chr(code):
+            table[code] = normalized
+    return table
+
+
+_LATIN_RE = re.compile("[A-z]")
+# Characters from U+0300 on, except the Latin Extended Additional block.
+_NON_LATIN_RE = re.compile("[\u0300-\u1dff\u1f00-\U0010ffff]")
+
+
+def _clean_text(text: str) -> str:
+    """Removes Latin characters from texts mostly written in another alphabet, like `langdetect` does."""
+    if len(_LATIN_RE.findall(text)) * 2 < len(_NON_LATIN_RE.findall(text)):
+        return _LATIN_RE.sub("", text)
+    return text
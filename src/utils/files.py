@@ -0,0 +1,229 @@
+import abc
+import functools
+import itertools
+import os
+from pathlib import PurePath
+from typing import IO, Any, Iterable, Iterator, Mapping
+
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet as pq
+
+# A path of a file, or its contents, e.g. of an uploaded file.
+FileSource = str | os.PathLike[str] | bytes | memoryview
+# The number of rows of a Parquet file read at once.
+BATCH_SIZE = 10_000
+# The number of bytes of a CSV file parsed at once.
+CSV_BLOCK_SIZE = 1 << 20
+
+
+class DataSource(abc.ABC):
+    """Interface of a tabular file that is read in batches of rows, so files of any size fit into memory.
+
+    Every read opens the file again, so several readers, e.g. one for the source column and one for all
+    columns of the results, can stream the same file at the same time.
+
+    Args:
+        file (FileSource): The path of the file, or its contents.
+
+    """
+
+    name: str
+    extensions: tuple[str, ...]
+
+    def __init__(self, file: FileSource) -> None:
+        self.file = file
+
+    @property
+    @abc.abstractmethod
+    def schema(self) -> pa.Schema:
+        """The columns of the file and their types, as returned by `iter_batches`."""
+
+    @property
+    @abc.abstractmethod
+    def num_rows(self) -> int:
+        """The number of rows of the file, without the header."""
+
+    @property
+    def columns(self) -> list[str]:
+        """The names of the columns of the file."""
+        return list(self.schema.names)
+
+    @abc.abstractmethod
+    def iter_batches(self, columns: list[str] | None = None) -> Iterator[pa.RecordBatch]:
+        """Reads the file in batches of rows.
+
+        Args:
+            columns (list[str] | None): The columns to read. Defaults to None, which reads all columns.
+
+        Yields:
+            pa.RecordBatch: The next rows of the file.
+
+        """
+
+    @abc.abstractmethod
+    def open_writer(self, sink: str | os.PathLike[str] | IO[bytes], schema: pa.Schema) -> Any:
+        """Returns a writer of record batches to a file of the same format.
+
+        Args:
+            sink (str | os.PathLike[str] | IO[bytes]): The path or the file object to write to.
+            schema (pa.Schema): The schema of the written batches.
+
+        """
+
+    def iter_column(self, column: str) -> Iterator[list[str]]:
+        """Reads the cells of a column as strings, in batches of rows. Empty cells are empty strings.
+
+        Args:
+            column (str): The name of the column.
+
+        Yields:
+            list[str]: The cells of the next rows.
+
+        """
+        if column not in self.schema.names:
+            raise KeyError(f"The file has no column {column!r}.")
+        for batch in self.iter_batches([column]):
+            yield batch.column(0).cast(pa.string()).fill_null("").to_pylist()
+
+    def _open(self) -> Any:
+        """Returns the file in a form pyarrow readers accept, without copying contents."""
+        if isinstance(self.file, (bytes, memoryview)):
+            return pa.BufferReader(self.file)
+        return os.fspath(self.file)
+
+
+class CSVSource(DataSource):
+    """CSV file with a header row, parsed in blocks by the multithreaded pyarrow reader.
+
+    All cells are read as strings, so values like leading zeros or long numbers are written back unchanged.
+
+    Args:
+        file (FileSource): The path of the file, or its contents.
+
+    """
+
+    name = "csv"
+    extensions = (".csv",)
+
+    @functools.cached_property
+    def schema(self) -> pa.Schema:
+        with pyarrow.csv.open_csv(self._open(), read_options=self._read_options()) as reader:
+            return pa.schema([(name, pa.string()) for name in reader.schema.names])
+
+    @functools.cached_property
+    def num_rows(self) -> int:
+        return sum(batch.num_rows for batch in self.iter_batches(self.columns[:1]))
+
+    def iter_batches(self, columns: list[str] | None = None) -> Iterator[pa.RecordBatch]:
+        columns = self.columns if columns is None else columns
+        convert_options = pyarrow.csv.ConvertOptions(
+            include_columns=columns,
+            column_types={name: pa.string() for name in columns},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        )
+        with pyarrow.csv.open_csv(
+            self._open(), read_options=self._read_options(), convert_options=convert_options
+        ) as reader:
+            yield from reader
+
+    def open_writer(self, sink: str | os.PathLike[str] | IO[bytes], schema: pa.Schema) -> Any:
+        return pyarrow.csv.CSVWriter(sink, schema)
+
+    def _read_options(self) -> pyarrow.csv.ReadOptions:
+        return pyarrow.csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+
+
+class ParquetSource(DataSource):
+    """Parquet file, read in batches of `BATCH_SIZE` rows. Files on disk are memory-mapped.
+
+    Columns keep their types, and are converted to strings only when a column is read with `iter_column`.
+
+    Args:
+        file (FileSource): The path of the file, or its contents.
+
+    """
+
+    name = "parquet"
+    extensions = (".parquet", ".pq")
+
+    @functools.cached_property
+    def schema(self) -> pa.Schema:
+        with self._open_file() as parquet_file:
+            return parquet_file.schema_arrow
+
+    @functools.cached_property
+    def num_rows(self) -> int:
+        with self._open_file() as parquet_file:
+            return parquet_file.metadata.num_rows
+
+    def iter_batches(self, columns: list[str] | None = None) -> Iterator[pa.RecordBatch]:
+        with self._open_file() as parquet_file:
+            yield from parquet_file.iter_batches(batch_size=BATCH_SIZE, columns=columns)
+
+    def open_writer(self, sink: str | os.PathLike[str] | IO[bytes], schema: pa.Schema) -> Any:
+        return pq.ParquetWriter(sink, schema)
+
+    def _open_file(self) -> pq.ParquetFile:
+        return pq.ParquetFile(self._open(), memory_map=True)
+
+
+DATA_SOURCES: dict[str, type[DataSource]] = {
+    CSVSource.name: CSVSource,
+    ParquetSource.name: ParquetSource,
+}
+
+
+def open_data_source(file_name: str, file: FileSource | None = None) -> DataSource:
+    """Returns the data source of a file, chosen by the extension of its name.
+
+    Args:
+        file_name (str): The name or path of the file.
+        file (FileSource | None): The contents of the file. Defaults to None, which reads `file_name`.
+
+    Raises:
+        ValueError: If no data source supports the extension of the file.
+
+    """
+    extension = PurePath(file_name).suffix.lower()
+    for source in DATA_SOURCES.values():
+        if extension in source.extensions:
+            return source(file_name if file is None else file)
+    supported = ", ".join(extension for source in DATA_SOURCES.values() for extension in source.extensions)
+    raise ValueError(f"Unsupported file type {extension!r}, expected one of: {supported}.")
+
+
+def write_results(
+    source: DataSource, sink: str | os.PathLike[str] | IO[bytes], columns: Mapping[str, Iterable[Any]]
+) -> int:
+    """Writes the rows of the source with new columns to a file of the same format, one batch at a time.
+
+    The values of the new columns are consumed in step with the batches of the source, so they can be
+    produced lazily, e.g. by a detection that reads the source itself. Existing columns with the name of
+    a new column are replaced.
+
+    Args:
+        source (DataSource): The data source whose rows to write.
+        sink (str | os.PathLike[str] | IO[bytes]): The path or the file object to write to.
+        columns (Mapping[str, Iterable[Any]]): The values of every new column, one per row. Values are
+            written as strings.
+
+    Returns:
+        int: The number of written rows.
+
+    """
+    kept = [name for name in source.columns if name not in columns]
+    schema = pa.schema([*(source.schema.field(name) for name in kept), *((name, pa.string()) for name in columns)])
+    values = [iter(column_values) for column_values in columns.values()]
+    rows = 0
+    with source.open_writer(sink, schema) as writer:
+        # All columns are read, as an empty list of columns would read all of them from CSV files as well.
+        for batch in source.iter_batches():
+            new_columns = [
+                pa.array([str(value) for value in itertools.islice(column_values, batch.num_rows)], pa.string())
+                for column_values in values
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays([*batch.select(kept).columns, *new_columns], schema=schema))
+            rows += batch.num_rows
+    return rows
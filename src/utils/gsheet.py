@@ -1,20 +1,389 @@
+import itertools
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import TracebackType
+from typing import Any, Callable, Collection, Iterator, Literal, Mapping, Self
+
 import gspread
 import pandas as pd
 
+ColumnDtype = Literal["auto", "string", "category", "object"]
+# The largest fraction of distinct values of a column that is stored as a categorical in `auto` mode.
+CATEGORY_RATIO = 0.5
+
 
-def get_data_from_worksheet(worksheet: gspread.Worksheet, columns: list[str]) -> pd.DataFrame:
+def get_data_from_worksheet(
+    worksheet: gspread.Worksheet,
+    columns: list[str],
+    header: list[str] | None = None,
+    dtype: ColumnDtype | Mapping[str, ColumnDtype] = "auto",
+) -> pd.DataFrame:
     """Returns data from a Google Sheets worksheet.
 
+    Cells are stored as pyarrow-backed strings, or as categoricals for columns with few distinct values,
+    which take a fraction of the memory of Python string objects. Empty cells are empty strings.
+
     Args:
         worksheet (gspread.Worksheet): The worksheet to get data from.
         columns (list[str]): The columns to retrieve.
+        header (list[str] | None): The values of the header row, if already known. Defaults to None,
+            which reads the header from the worksheet.
+        dtype (ColumnDtype | Mapping[str, ColumnDtype]): The representation of all columns, or of each column
+            by name. `auto` picks a categorical when at most `CATEGORY_RATIO` of the values are distinct,
+            otherwise strings. Defaults to `auto`.
+
+    """
+    header = header if header is not None else worksheet.row_values(1)
+    ranges = []
+    for column in columns:
+        column_idx = header.index(column) + 1
+        # The range is open-ended, so it doesn't depend on the row count of a possibly outdated worksheet handle.
+        start = gspread.utils.rowcol_to_a1(2, column_idx)
+        column_letter = start.rstrip("0123456789")
+        ranges.append(f"{start}:{column_letter}")
+
+    # All columns are fetched in a single request. Trailing empty cells are omitted by the API,
+    # so shorter columns are padded with empty strings to keep the rows aligned.
+    value_ranges = worksheet.batch_get(ranges, major_dimension=gspread.utils.Dimension.cols)
+    values = [value_range[0] if value_range else [] for value_range in value_ranges]
+    length = max(map(len, values), default=0)
+    return pd.DataFrame(
+        {
+            column: _to_series(
+                column_values + [""] * (length - len(column_values)),
+                dtype if isinstance(dtype, str) else dtype.get(column, "auto"),
+            )
+            for column, column_values in zip(columns, values)
+        }
+    )
+
+
+def _to_series(values: list[str], dtype: ColumnDtype) -> pd.Series:
+    """Returns the cell values of a column in the given representation."""
+    if dtype == "object":
+        return pd.Series(values, dtype=object)
+    series = pd.Series(values, dtype="string[pyarrow]")
+    if dtype == "category" or (dtype == "auto" and series.nunique() <= len(series) * CATEGORY_RATIO):
+        return series.astype("category")
+    return series
+
+
+def append_columns(
+    worksheet: gspread.Worksheet, header: list[str], columns: list[str], hidden: Collection[str] = ()
+) -> list[int]:
+    """Adds columns with the given names after the last column of the header in a single request.
+
+    The grid is extended only when the sheet has no spare columns. Unlike `Worksheet.add_cols`, the grid is
+    extended relative to its current size on the server, so an outdated worksheet handle can't shrink it.
+    The size of the grid is refreshed first, as worksheet handles are built from cached metadata.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to add the columns to.
+        header (list[str]): The values of the header row. The names of the new columns are appended to it.
+        columns (list[str]): The names of the columns to add.
+        hidden (Collection[str]): The names of the new columns that are hidden from users. Defaults to none.
+
+    Returns:
+        list[int]: The 1-based indices of the new columns.
+
+    """
+    if not columns:
+        return []
+    start_idx = len(header)
+    requests: list[dict[str, Any]] = [
+        {
+            "updateCells": {
+                "rows": [{"values": [{"userEnteredValue": {"stringValue": column}} for column in columns]}],
+                "fields": "userEnteredValue",
+                "start": {"sheetId": worksheet.id, "rowIndex": 0, "columnIndex": start_idx},
+            }
+        }
+    ]
+    refresh_grid_properties(worksheet)
+    if (missing := start_idx + len(columns) - worksheet.col_count) > 0:
+        requests.insert(0, {"appendDimension": {"sheetId": worksheet.id, "dimension": "COLUMNS", "length": missing}})
+    requests.extend(
+        {
+            "updateDimensionProperties": {
+                "range": {"sheetId": worksheet.id, "dimension": "COLUMNS", "startIndex": idx, "endIndex": idx + 1},
+                "properties": {"hiddenByUser": True},
+                "fields": "hiddenByUser",
+            }
+        }
+        for idx, column in enumerate(columns, start=start_idx)
+        if column in hidden
+    )
+    worksheet.spreadsheet.batch_update({"requests": requests})
+    if missing > 0:
+        worksheet._properties["gridProperties"]["columnCount"] += missing  # pylint: disable=W0212
+
+    header.extend(columns)
+    return list(range(start_idx + 1, start_idx + len(columns) + 1))
+
+
+def split_requests(requests: list[dict[str, Any]], max_payload_size: int = 1_000_000) -> list[list[dict[str, Any]]]:
+    """Splits `batchUpdate` requests into payloads that stay within the request size limit.
+
+    Args:
+        requests (list[dict[str, Any]]): The requests to split.
+        max_payload_size (int): The maximum size of a single payload in bytes. Defaults to 1 MB,
+            which keeps well below the recommended 2 MB limit of the Sheets API.
+
+    """
+    payloads: list[list[dict[str, Any]]] = []
+    payload: list[dict[str, Any]] = []
+    payload_size = 0
+
+    for request in requests:
+        request_size = len(json.dumps(request, separators=(",", ":")))
+        if payload and payload_size + request_size > max_payload_size:
+            payloads.append(payload)
+            payload = []
+            payload_size = 0
+        payload.append(request)
+        payload_size += request_size
+
+    if payload:
+        payloads.append(payload)
+    return payloads
+
+
+def batch_update(  # pylint: disable=R0913,R0917
+    spreadsheet: gspread.Spreadsheet,
+    requests: list[dict[str, Any]],
+    max_payload_size: int = 1_000_000,
+    max_workers: int = 4,
+    start: int = 0,
+    on_payload: Callable[[int], None] | None = None,
+) -> None:
+    """Sends `batchUpdate` requests to the spreadsheet in size-limited payloads with bounded concurrency.
+
+    Args:
+        spreadsheet (gspread.Spreadsheet): The spreadsheet to update.
+        requests (list[dict[str, Any]]): The requests to send.
+        max_payload_size (int): The maximum size of a single payload in bytes. Defaults to 1 MB.
+        max_workers (int): The maximum number of payloads sent at the same time. Defaults to 4.
+        start (int): The number of leading payloads to skip, e.g. ones sent by an interrupted run. Defaults to 0.
+        on_payload (Callable[[int], None] | None): Called with the number of payloads sent so far, counting
+            only payloads whose predecessors were sent as well. Defaults to None.
+
+    """
+    payloads = split_requests(requests, max_payload_size)[start:]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consuming the results re-raises the first error from any of the payloads.
+        for sent, _ in enumerate(
+            executor.map(lambda payload: spreadsheet.batch_update({"requests": payload}), payloads), start=start + 1
+        ):
+            if on_payload:
+                on_payload(sent)
+
+
+def refresh_grid_properties(worksheet: gspread.Worksheet) -> None:
+    """Updates the number of rows and columns of the worksheet handle from the server.
+
+    Worksheet handles are built from metadata cached for a short time, so rows or columns added since then
+    by earlier runs or by users would be missing from `row_count` and `col_count`. Only this handle is updated,
+    so it mustn't be shared with other runs.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to refresh.
+
+    """
+    metadata = worksheet.spreadsheet.fetch_sheet_metadata({"fields": "sheets.properties"})
+    for sheet in metadata["sheets"]:
+        if sheet["properties"]["sheetId"] == worksheet.id:
+            worksheet._properties.update(sheet["properties"])  # pylint: disable=W0212
+
+
+def iter_column_windows(
+    worksheet: gspread.Worksheet, column_idx: int, window_size: int = 5000, start_row: int = 2, max_workers: int = 1
+) -> Iterator[tuple[int, list[str]]]:
+    """Reads a worksheet column in windows of rows, one request per window.
+
+    Trailing empty cells of a window are omitted by the API, so a window may contain fewer values
+    than `window_size`. Windows without any values are skipped. Rows are read up to `row_count` of the
+    worksheet, so a handle built from cached metadata should be refreshed first, see `refresh_grid_properties`.
+
+    With more than one worker, the next `max_workers` windows are read concurrently while the current one
+    is processed, so the latency of the requests overlaps. Windows are still yielded in order.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to read from.
+        column_idx (int): The 1-based index of the column to read.
+        window_size (int): The number of rows read at once. Defaults to 5000.
+        start_row (int): The 1-based index of the first row to read. Defaults to 2, skipping the header.
+        max_workers (int): The number of windows read at the same time. Defaults to 1.
+
+    Yields:
+        tuple[int, list[str]]: The index of the first row of the window and the values of the window.
+
+    """
+    window_starts = iter(range(start_row, worksheet.row_count + 1, window_size))
+    if max_workers <= 1:
+        for window_start in window_starts:
+            if values := _read_column_window(worksheet, column_idx, window_start, window_size):
+                yield window_start, values
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        reads = deque(
+            (window_start, executor.submit(_read_column_window, worksheet, column_idx, window_start, window_size))
+            for window_start in itertools.islice(window_starts, max_workers)
+        )
+        while reads:
+            window_start, read = reads.popleft()
+            values = read.result()
+            for next_start in itertools.islice(window_starts, 1):
+                reads.append(
+                    (next_start, executor.submit(_read_column_window, worksheet, column_idx, next_start, window_size))
+                )
+            if values:
+                yield window_start, values
+    finally:
+        # Reads that haven't started yet are dropped if the windows aren't consumed to the end.
+        executor.shutdown(cancel_futures=True)
+
+
+def _read_column_window(
+    worksheet: gspread.Worksheet, column_idx: int, window_start: int, window_size: int
+) -> list[str]:
+    """Returns the values of a window of rows of a worksheet column, without trailing empty cells."""
+    window_end = min(window_start + window_size - 1, worksheet.row_count)
+    start = gspread.utils.rowcol_to_a1(window_start, column_idx)
+    end = gspread.utils.rowcol_to_a1(window_end, column_idx)
+    values = worksheet.get_values(f"{start}:{end}", major_dimension=gspread.utils.Dimension.cols)
+    return values[0] if values else []
+
+
+class ColumnWriter:  # pylint: disable=R0902
+    """Buffers values for worksheet columns and writes them with batched range updates.
+
+    Buffered values are grouped into contiguous A1 ranges and sent in one `values.batchUpdate` request
+    when the buffer reaches `chunk_size` values or `flush_interval` seconds have passed since the last flush.
+    Pending values are flushed when the writer is used as a context manager and the block exits without errors.
+
+    In background mode requests are sent from separate threads, so new values can be produced while
+    the previous chunks are being written. At most `max_pending` requests are in flight at a time, and
+    `on_flush` is called in the order of the requests once they have completed.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to write to.
+        column_idx (int): The 1-based index of the column written to by default.
+        chunk_size (int): The number of buffered values that triggers a flush. Defaults to 1000.
+        flush_interval (float): The number of seconds after which buffered values are flushed. Defaults to 30.
+        background (bool): Whether to send requests from a background thread. Defaults to False.
+        on_flush (Callable[[int], None] | None): Called with the last written row after each successful request,
+            e.g. to checkpoint the progress. Defaults to None.
+        max_pending (int): The number of requests in flight at the same time in background mode. Defaults to 1.
+        value_input_option (gspread.utils.ValueInputOption): How the API interprets the values. Defaults to
+            `user_entered`, which parses numbers, dates and formulas like typed ones. Use `raw` for values that
+            have to be stored as text exactly, like hashes or copied cells.
 
     """
-    all_columns = worksheet.row_values(1)
-    column_indexes = [all_columns.index(column) + 1 for column in columns]
 
-    data = {}
-    for col_name, col_index in zip(columns, column_indexes):
-        data[col_name] = worksheet.col_values(col_index)[1:]
+    def __init__(  # pylint: disable=R0913,R0917
+        self,
+        worksheet: gspread.Worksheet,
+        column_idx: int,
+        chunk_size: int = 1000,
+        flush_interval: float = 30.0,
+        background: bool = False,
+        on_flush: Callable[[int], None] | None = None,
+        max_pending: int = 1,
+        value_input_option: gspread.utils.ValueInputOption = gspread.utils.ValueInputOption.user_entered,
+    ) -> None:
+        self.worksheet = worksheet
+        self.column_idx = column_idx
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._buffer: dict[tuple[int, int], Any] = {}
+        self._last_flush = time.monotonic()
+        self.max_pending = max_pending
+        self.value_input_option = value_input_option
+        self._executor = ThreadPoolExecutor(max_workers=max_pending) if background else None
+        self._pending: deque[tuple[Future, int]] = deque()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+                while self._pending:
+                    self._wait_pending()
+        finally:
+            if self._executor:
+                self._executor.shutdown()
+
+    def write(self, row: int, value: Any, column_idx: int | None = None) -> None:
+        """Adds a value to the buffer and flushes the buffer if needed.
+
+        Args:
+            row (int): The 1-based index of the row to write to.
+            value (Any): The value to write.
+            column_idx (int | None): The 1-based index of the column to write to. Defaults to `column_idx`
+                of the writer.
+
+        """
+        self._buffer[column_idx or self.column_idx, row] = value
+        if len(self._buffer) >= self.chunk_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered values to the worksheet in a single request."""
+        if self._buffer:
+            ranges = self._get_ranges()
+            last_row = max(row for _, row in self._buffer)
+            self._buffer.clear()
+            if self._executor:
+                # Waiting for the oldest requests keeps memory bounded and re-raises their errors.
+                while len(self._pending) >= self.max_pending or (self._pending and self._pending[0][0].done()):
+                    self._wait_pending()
+                self._pending.append((self._executor.submit(self._send, ranges), last_row))
+            else:
+                self._send(ranges)
+                self._written(last_row)
+        self._last_flush = time.monotonic()
+
+    def _send(self, ranges: list[dict[str, Any]]) -> None:
+        self.worksheet.batch_update(ranges, value_input_option=self.value_input_option)
+
+    def _written(self, last_row: int) -> None:
+        if self.on_flush:
+            self.on_flush(last_row)
+
+    def _wait_pending(self) -> None:
+        """Waits for the oldest request in flight, so rows are reported as written in order."""
+        pending, last_row = self._pending.popleft()
+        pending.result()
+        self._written(last_row)
+
+    def _get_ranges(self) -> list[dict[str, Any]]:
+        """Returns buffered values grouped into contiguous A1 ranges."""
+        cells = sorted(self._buffer)
+        ranges = []
+        start_idx = 0
+
+        for idx in range(1, len(cells) + 1):
+            if idx == len(cells) or cells[idx] != (cells[idx - 1][0], cells[idx - 1][1] + 1):
+                values = [[self._buffer[cell]] for cell in cells[start_idx:idx]]
+                ranges.append(self._make_range(cells[start_idx], cells[idx - 1], values))
+                start_idx = idx
+
+        return ranges
 
-    return pd.DataFrame(data)
+    def _make_range(self, start: tuple[int, int], end: tuple[int, int], values: list[list[Any]]) -> dict[str, Any]:
+        """Returns the update of a range of one column, given the column and row of its first and last cell."""
+        start_a1 = gspread.utils.rowcol_to_a1(start[1], start[0])
+        end_a1 = gspread.utils.rowcol_to_a1(end[1], end[0])
+        return {"range": f"{start_a1}:{end_a1}", "values": values}
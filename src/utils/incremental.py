@@ -0,0 +1,53 @@
+import hashlib
+from typing import Any, Callable, Iterable
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+# Hex digits of a row hash. Short hashes keep the state columns small, collisions of 64-bit hashes are negligible.
+HASH_LENGTH = 16
+
+
+def hash_value(value: Any, salt: str = "") -> str:
+    """Returns a short, stable hash of a cell value, used to find rows that changed since the last run.
+
+    Args:
+        value (Any): The value to hash.
+        salt (str): Settings that affect the result of processing the value, e.g. the detector name.
+            Changing them changes all hashes. Defaults to an empty string.
+
+    """
+    return hashlib.blake2b(f"{salt}\0{value}".encode(), digest_size=HASH_LENGTH // 2).hexdigest()
+
+
+def hash_values(
+    values: pd.Series, salt: str = "", transform: Callable[[Any], Any] | None = None
+) -> npt.NDArray[np.object_]:
+    """Returns the hash of each value of a column, hashing every distinct value only once.
+
+    Categorical columns are hashed per category, so no other copy of the values is created.
+
+    Args:
+        values (pd.Series): The values to hash.
+        salt (str): Settings that affect the result of processing the values. Defaults to an empty string.
+        transform (Callable[[Any], Any] | None): Applied to each distinct value before hashing,
+            e.g. to normalize texts. Defaults to None.
+
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    hashes = [hash_value(transform(value) if transform else value, salt) for value in uniques]
+    return np.array(hashes, dtype=object)[codes]
+
+
+def get_changed_rows(hashes: Iterable[str], stored_hashes: pd.Series) -> npt.NDArray[np.bool_]:
+    """Returns a mask of the rows whose hash differs from the hash stored by the last run.
+
+    Args:
+        hashes (Iterable[str]): The hashes of the current values, one per data row.
+        stored_hashes (pd.Series): The stored hashes. Missing and extra rows are ignored.
+
+    """
+    current = np.array(list(hashes), dtype=object)
+    stored = stored_hashes.reindex(range(len(current)), fill_value="").to_numpy(dtype=object)
+    return current != stored
@@ -0,0 +1,276 @@
+import contextvars
+import functools
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Literal, TypedDict
+
+from .metrics import StageMetrics, log_event
+
+JobState = Literal["queued", "running", "completed", "failed", "cancelled"]
+
+
+class JobCancelledError(Exception):
+    """Raised inside a job when the user cancelled it."""
+
+
+class JobProgress(TypedDict):
+    """A dictionary with the progress of the current stage of a job.
+
+    Attributes:
+        label (str): The label of the progress.
+        processed (int): The number of processed items.
+        total (int): The total number of items.
+        details (str): Additional details, e.g. about throttling.
+
+    """
+
+    label: str
+    processed: int
+    total: int
+    details: str
+
+
+class Job:  # pylint: disable=R0902
+    """A pipeline of stages that runs in the background, independently of the session that submitted it.
+
+    The state of the job is updated by the worker thread and read by the pages polling it.
+    Cancellation is cooperative: the job stops at its next progress update or stage boundary.
+    Finished jobs are kept for polling, so they drop the function with the data of the stages, and keep
+    only the message and the type of an error, not the exception with its traceback.
+
+    Args:
+        user_key (str): The key identifying the user who submitted the job.
+        name (str): The name of the tool that runs the job.
+        stages (list[str]): The names of the stages of the job.
+        func (Callable[[Job], None]): The function that runs the stages and reports progress to the job.
+        key (str | None): Identifies what the job works on, e.g. a worksheet. Defaults to None.
+
+    """
+
+    def __init__(  # pylint: disable=R0913,R0917
+        self, user_key: str, name: str, stages: list[str], func: Callable[["Job"], None], key: str | None = None
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.user_key = user_key
+        self.name = name
+        self.key = key
+        self.stages = stages
+        self.func: Callable[["Job"], None] | None = func
+        self.state: JobState = "queued"
+        self.stage = 0
+        self.progress: JobProgress | None = None
+        self.error: str | None = None
+        self.error_type: str | None = None
+        self.metrics: list[StageMetrics] = []
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self._cancelled = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not."""
+        return self.state in ("completed", "failed", "cancelled")
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the user asked the job to stop."""
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Asks the job to stop. Queued jobs are cancelled before they start."""
+        self._cancelled.set()
+
+    def check_cancelled(self) -> None:
+        """Raises `JobCancelledError` if the job was cancelled."""
+        if self._cancelled.is_set():
+            raise JobCancelledError(f"Job {self.id} was cancelled.")
+
+    def set_stage(self, stage: int) -> None:
+        """Moves the job to the given stage and clears the progress of the previous one.
+
+        Args:
+            stage (int): The index of the stage in `stages`.
+
+        """
+        self.check_cancelled()
+        self.stage = stage
+        self.progress = None
+
+    def set_progress(self, label: str, processed: int, total: int, details: str = "") -> None:
+        """Updates the progress of the current stage.
+
+        Args:
+            label (str): The label of the progress.
+            processed (int): The number of processed items.
+            total (int): The total number of items.
+            details (str): Additional details, e.g. about throttling. Defaults to an empty string.
+
+        """
+        self.check_cancelled()
+        self.progress = {"label": label, "processed": processed, "total": total, "details": details}
+
+
+_current_job: contextvars.ContextVar[Job | None] = contextvars.ContextVar("current_job", default=None)
+
+
+def get_current_job() -> Job | None:
+    """Returns the job running in the current thread, or None outside of background jobs."""
+    return _current_job.get()
+
+
+class JobRunner:  # pylint: disable=R0902
+    """Process-wide executor of background jobs with per-user limits and fair scheduling.
+
+    Jobs run on a fixed number of worker threads. Each user can run at most `max_jobs_per_user` jobs at once,
+    further jobs wait in the queue. When a worker is free, it takes the oldest job of the user who started
+    a job least recently, so a user with many or long jobs doesn't starve the others.
+
+    Args:
+        workers (int): The number of jobs running at the same time. Defaults to 4.
+        max_jobs_per_user (int): The number of jobs of one user running at the same time. Defaults to 1.
+        retention (float): The number of seconds finished jobs are kept for polling. Defaults to 1 hour.
+
+    """
+
+    def __init__(self, workers: int = 4, max_jobs_per_user: int = 1, retention: float = 3600) -> None:
+        self.workers = workers
+        self.max_jobs_per_user = max_jobs_per_user
+        self.retention = retention
+        self._jobs: dict[str, Job] = {}
+        self._running: dict[str, int] = {}
+        self._last_started: dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+
+    def submit(  # pylint: disable=R0913,R0917
+        self, user_key: str, name: str, stages: list[str], func: Callable[[Job], None], key: str | None = None
+    ) -> Job:
+        """Queues a job and returns it.
+
+        Args:
+            user_key (str): The key identifying the user who submits the job.
+            name (str): The name of the tool that runs the job.
+            stages (list[str]): The names of the stages of the job.
+            func (Callable[[Job], None]): The function that runs the stages and reports progress to the job.
+            key (str | None): Identifies what the job works on, e.g. a worksheet. Defaults to None.
+
+        """
+        job = Job(user_key, name, stages, func, key)
+        with self._condition:
+            self._prune()
+            self._jobs[job.id] = job
+            # Workers are started lazily, so importing the module doesn't start any threads.
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._condition.notify()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Returns the job with the given ID, or None if it doesn't exist or has expired.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        """
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def find(self, user_key: str, name: str, key: str | None = None) -> Job | None:
+        """Returns the latest job of the user for the given tool, or None if there is none.
+
+        Args:
+            user_key (str): The key identifying the user.
+            name (str): The name of the tool.
+            key (str | None): Only finds jobs working on this key. Defaults to None, which finds jobs with any key.
+
+        """
+        with self._condition:
+            jobs = [
+                job
+                for job in self._jobs.values()
+                if job.user_key == user_key and job.name == name and (key is None or job.key == key)
+            ]
+        return max(jobs, key=lambda job: job.created_at, default=None)
+
+    def _work(self) -> None:
+        """Runs queued jobs one after another."""
+        while True:
+            with self._condition:
+                while (job := self._next_job()) is None:
+                    self._condition.wait()
+                job.state = "running"
+                self._running[job.user_key] = self._running.get(job.user_key, 0) + 1
+                self._last_started[job.user_key] = time.monotonic()
+
+            try:
+                contextvars.copy_context().run(self._run, job)
+            finally:
+                with self._condition:
+                    self._running[job.user_key] -= 1
+                    if not self._running[job.user_key]:
+                        del self._running[job.user_key]
+                    job.finished_at = time.time()
+                    self._condition.notify_all()
+
+    @staticmethod
+    def _run(job: Job) -> None:
+        """Runs the job in the current context and records how it ended."""
+        _current_job.set(job)
+        try:
+            job.check_cancelled()
+            if job.func:
+                job.func(job)
+        except JobCancelledError:
+            job.state = "cancelled"
+        except Exception as error:  # pylint: disable=W0718
+            # The error is shown by the page polling the job, as there is no page to raise it in.
+            job.error = str(error)
+            job.error_type = type(error).__name__
+            job.state = "failed"
+            log_event("job_failed", job=job.name, job_id=job.id, traceback="".join(traceback.format_exception(error)))
+        else:
+            job.state = "completed"
+        finally:
+            job.func = None
+
+    def _next_job(self) -> Job | None:
+        """Returns the next job to run, chosen fairly between users who are below their limit."""
+        candidates: dict[str, Job] = {}
+        for job in sorted(self._jobs.values(), key=lambda job: job.created_at):
+            if job.state == "queued" and job.cancelled:
+                job.state = "cancelled"
+                job.func = None
+                job.finished_at = time.time()
+            elif job.state == "queued" and job.user_key not in candidates:
+                if self._running.get(job.user_key, 0) < self.max_jobs_per_user:
+                    candidates[job.user_key] = job
+        if not candidates:
+            return None
+        user_key = min(candidates, key=lambda key: self._last_started.get(key, 0.0))
+        return candidates[user_key]
+
+    def _prune(self) -> None:
+        """Forgets finished jobs older than the retention period."""
+        expired_at = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and job.finished_at < expired_at:
+                del self._jobs[job_id]
+        users = {job.user_key for job in self._jobs.values()}
+        for user_key in self._last_started.keys() - users:
+            del self._last_started[user_key]
+
+
+@functools.cache
+def get_job_runner(workers: int = 4, max_jobs_per_user: int = 1) -> JobRunner:
+    """Returns the process-wide job runner with the given limits, creating it on first use.
+
+    Args:
+        workers (int): The number of jobs running at the same time. Defaults to 4.
+        max_jobs_per_user (int): The number of jobs of one user running at the same time. Defaults to 1.
+
+    """
+    return JobRunner(workers, max_jobs_per_user)
@@ -0,0 +1,187 @@
+import contextlib
+import functools
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import langcodes
+
+from . import sqlite
+from .detectors import UNKNOWN_LANGUAGE, get_detector
+
+CACHE_PATH = Path.home() / ".cache" / "seo-automation" / "language_detection.sqlite3"
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Starting worker processes costs more than detecting a few hundred texts in the current process.
+MIN_PARALLEL_TEXTS = 500
+# Results kept in memory to deduplicate texts within a run. Older ones are still found in the persistent cache.
+MAX_MEMORY_TEXTS = 100_000
+
+
+class LanguageCache:
+    """Persistent cache of detected language codes keyed by detector and normalized text.
+
+    The cache is stored in a SQLite database, so it is shared between runs and sessions.
+    When it grows beyond `max_entries`, the least recently used entries are evicted.
+
+    Args:
+        path (Path): The path to the SQLite database file. Defaults to `CACHE_PATH`.
+        max_entries (int): The maximum number of cached texts. Defaults to 500 000.
+
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_entries: int = 500_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite.connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS detections "
+                "(detector TEXT, text TEXT, code TEXT NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (detector, text))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS detections_used_at ON detections (used_at)")
+
+    def get_many(self, detector: str, texts: list[str]) -> dict[str, str]:
+        """Returns cached language codes for the given texts and marks them as recently used.
+
+        Args:
+            detector (str): The name of the detector that produced the codes.
+            texts (list[str]): The normalized texts to look up.
+
+        """
+        codes: dict[str, str] = {}
+        with sqlite.connect(self.path) as connection:
+            # SQLite limits the number of query parameters, so texts are looked up in batches.
+            for batch in itertools.batched(texts, 500):
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT text, code FROM detections WHERE detector = ? AND text IN ({placeholders})",
+                    (detector, *batch),
+                )
+                codes.update(rows.fetchall())
+            connection.executemany(
+                "UPDATE detections SET used_at = ? WHERE detector = ? AND text = ?",
+                ((time.time(), detector, text) for text in codes),
+            )
+        return codes
+
+    def set_many(self, detector: str, codes: dict[str, str]) -> None:
+        """Stores language codes for the given texts and evicts old entries if the cache is full.
+
+        Args:
+            detector (str): The name of the detector that produced the codes.
+            codes (dict[str, str]): The normalized texts and their language codes.
+
+        """
+        with sqlite.connect(self.path) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO detections (detector, text, code, used_at) VALUES (?, ?, ?, ?)",
+                ((detector, text, code, time.time()) for text, code in codes.items()),
+            )
+            connection.execute(
+                "DELETE FROM detections WHERE rowid IN "
+                "(SELECT rowid FROM detections ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+def normalize_text(text: str) -> str:
+    """Returns the text in the form used for language detection and as the cache key.
+
+    Args:
+        text (str): The text to normalize.
+
+    """
+    return " ".join(text.split())
+
+
+@functools.cache
+def get_language_name(lang_code: str) -> str:
+    """Returns the display name of the language in the format `language_name (language_code)`.
+
+    Texts whose language couldn't be detected are named `Unknown`.
+
+    Args:
+        lang_code (str): The language code returned by the detector.
+
+    """
+    if lang_code == UNKNOWN_LANGUAGE:
+        return "Unknown"
+    return f"{langcodes.Language.get(lang_code).language_name()} ({lang_code})"
+
+
+def detect_languages(
+    texts: Iterable[str],
+    detector: str = "langdetect",
+    cache: LanguageCache | None = None,
+    chunk_size: int = 1000,
+    workers: int = 1,
+) -> Iterator[str]:
+    """Detects the language of each text, reusing results for duplicate and previously seen texts.
+
+    Texts are processed in chunks, so results are yielded incrementally and in the original order.
+    With more than one worker, texts missing from the cache are detected in a process pool. The pool
+    is started only once a chunk has at least `MIN_PARALLEL_TEXTS` texts to detect.
+
+    Args:
+        texts (Iterable[str]): The texts to detect the language of.
+        detector (str): The name of the detector in `utils.detectors.DETECTORS`. Defaults to `langdetect`.
+        cache (LanguageCache | None): The persistent cache to use. Defaults to a cache at `CACHE_PATH`.
+        chunk_size (int): The number of texts looked up in the cache at once. Defaults to 1000.
+        workers (int): The number of worker processes used for detection. Defaults to 1.
+
+    Yields:
+        str: The detected language in the format `language_name (language_code)`.
+
+    """
+    cache = cache or LanguageCache()
+    codes: dict[str, str] = {}
+
+    with contextlib.ExitStack() as stack:
+        executor: Executor | None = None
+
+        for chunk in itertools.batched(texts, chunk_size):
+            if len(codes) > MAX_MEMORY_TEXTS:
+                codes.clear()
+            normalized = [normalize_text(text) for text in chunk]
+            missing = list(dict.fromkeys(text for text in normalized if text not in codes))
+            codes.update(cache.get_many(detector, missing))
+            missing = [text for text in missing if text not in codes]
+
+            if executor is None and workers > 1 and len(missing) >= MIN_PARALLEL_TEXTS:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(
+                        max_workers=workers,
+                        # Forking the multi-threaded Streamlit server is unsafe, so workers are spawned.
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=get_detector,
+                        initargs=(detector,),
+                    )
+                )
+
+            if executor and missing:
+                # Each worker gets one shard, so the detector is called with batches as large as possible.
+                shards = itertools.batched(missing, max(1, -(-len(missing) // workers)))
+                detected_codes: Iterable[str] = itertools.chain.from_iterable(
+                    executor.map(_detect_codes, itertools.repeat(detector), shards)
+                )
+            else:
+                detected_codes = _detect_codes(detector, missing)
+
+            detected = dict(zip(missing, detected_codes))
+            if detected:
+                cache.set_many(detector, detected)
+                codes.update(detected)
+
+            for text in normalized:
+                yield get_language_name(codes[text])
+
+
+def _detect_codes(detector: str, texts: Sequence[str]) -> list[str]:
+    """Returns the language codes of the normalized texts using the shared detector of the process."""
+    if not texts:
+        return []
+    return get_detector(detector).detect_many(list(texts))[0]
@@ -0,0 +1,36 @@
+import importlib
+import sys
+from typing import Any, Callable, Collection, Mapping
+
+
+def lazy_exports(
+    package: str, submodules: Mapping[str, Collection[str]]
+) -> tuple[Callable[[str], Any], Callable[[], list[str]]]:
+    """Returns the module `__getattr__` and `__dir__` functions of a package that imports its submodules on first use.
+
+    Accessing an exported name imports the submodule defining it and stores the name in the package,
+    so later accesses are plain attribute lookups.
+
+    Args:
+        package (str): The name of the package.
+        submodules (Mapping[str, Collection[str]]): The names exported by each submodule of the package.
+
+    Returns:
+        tuple[Callable[[str], Any], Callable[[], list[str]]]: The `__getattr__` and `__dir__` functions.
+
+    """
+    exports = {name: submodule for submodule, names in submodules.items() for name in names}
+
+    def getattr_(name: str) -> Any:
+        if name in submodules:
+            return importlib.import_module(f".{name}", package)
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(f".{exports[name]}", package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def dir_() -> list[str]:
+        return sorted({*vars(sys.modules[package]), *exports})
+
+    return getattr_, dir_
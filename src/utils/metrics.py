@@ -0,0 +1,259 @@
+import contextlib
+import cProfile
+import importlib
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable, Iterator, Literal, TypedDict
+
+from requests import PreparedRequest, Response, Session
+
+ProfilerName = Literal["cprofile", "pyinstrument"]
+PROFILERS: tuple[ProfilerName, ...] = ("cprofile", "pyinstrument")
+# Lines of the cProfile statistics kept in the metrics.
+PROFILE_LINES = 25
+# Python allows only one active profiler per process, so concurrent stages aren't profiled.
+_profiler_lock = threading.Lock()
+# The interval in seconds the resident memory is sampled at during a stage.
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+if not logger.handlers:
+    # Metrics are emitted as one JSON object per line, so they can be scraped from the logs of the app.
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class TrafficStats(TypedDict):
+    """A dictionary with counters of the HTTP requests sent by a session.
+
+    Attributes:
+        api_calls (int): The number of requests sent, including retries.
+        bytes_sent (int): The size of the request bodies in bytes.
+        bytes_received (int): The size of the response bodies in bytes.
+
+    """
+
+    api_calls: int
+    bytes_sent: int
+    bytes_received: int
+
+
+class StageMetrics(TypedDict):
+    """A dictionary with the resources used by a stage.
+
+    Attributes:
+        stage (str): The name of the stage.
+        status (str): `ok` if the stage completed, otherwise `error`.
+        wall_seconds (float): The duration of the stage.
+        peak_memory_mb (float | None): The peak resident memory of the process during the stage, if known.
+        api_calls (int | None): The number of Sheets API requests sent during the stage, if known.
+        bytes_sent (int | None): The size of the request bodies sent during the stage, if known.
+        bytes_received (int | None): The size of the response bodies received during the stage, if known.
+        profile (str | None): The profile of the stage, if profiling was enabled.
+
+    """
+
+    stage: str
+    status: str
+    wall_seconds: float
+    peak_memory_mb: float | None
+    api_calls: int | None
+    bytes_sent: int | None
+    bytes_received: int | None
+    profile: str | None
+
+
+def track_traffic(session: Session) -> TrafficStats:
+    """Counts the requests sent by the session and the bytes they transfer, using a response hook.
+
+    Args:
+        session (Session): The session to track.
+
+    Returns:
+        TrafficStats: The counters, updated in place by every response of the session.
+
+    """
+    stats: TrafficStats = {"api_calls": 0, "bytes_sent": 0, "bytes_received": 0}
+    lock = threading.Lock()
+
+    def count(response: Response, *args: Any, **kwargs: Any) -> None:  # pylint: disable=W0613
+        request: PreparedRequest = response.request
+        with lock:
+            stats["api_calls"] += 1
+            stats["bytes_sent"] += len(request.body or b"")
+            stats["bytes_received"] += len(response.content)
+
+    session.hooks["response"].append(count)
+    return stats
+
+
+@contextlib.contextmanager
+def measure_stage(
+    name: str,
+    traffic: Callable[[], TrafficStats | None],
+    profiler: ProfilerName | None = None,
+    on_complete: Callable[[StageMetrics], None] | None = None,
+) -> Iterator[StageMetrics]:
+    """Measures the duration, memory and Sheets API traffic of a stage.
+
+    The traffic is the difference of the counters before and after the stage. Counters are shared by all
+    requests of a user, so concurrent jobs of the same user are attributed to each other's stages. The memory
+    is the resident memory of the process sampled every `MEMORY_SAMPLE_INTERVAL` seconds during the stage, so
+    it includes the memory of concurrent stages, and spikes shorter than the interval can be missed.
+
+    Args:
+        name (str): The name of the stage.
+        traffic (Callable[[], TrafficStats | None]): Returns the traffic counters, if they are available.
+        profiler (ProfilerName | None): The profiler to run during the stage. Defaults to None.
+        on_complete (Callable[[StageMetrics], None] | None): Called with the metrics when the stage ends,
+            also when it fails. Defaults to None.
+
+    Yields:
+        StageMetrics: The metrics of the stage, filled in when the stage ends.
+
+    """
+    metrics: StageMetrics = {
+        "stage": name,
+        "status": "error",
+        "wall_seconds": 0.0,
+        "peak_memory_mb": None,
+        "api_calls": None,
+        "bytes_sent": None,
+        "bytes_received": None,
+        "profile": None,
+    }
+    traffic_before = stats.copy() if (stats := traffic()) else None
+    started_at = time.perf_counter()
+
+    try:
+        with _sample_memory(metrics), _profile(profiler, metrics):
+            yield metrics
+        metrics["status"] = "ok"
+    finally:
+        metrics["wall_seconds"] = round(time.perf_counter() - started_at, 3)
+        if traffic_before is not None and (stats := traffic()):
+            metrics["api_calls"] = stats["api_calls"] - traffic_before["api_calls"]
+            metrics["bytes_sent"] = stats["bytes_sent"] - traffic_before["bytes_sent"]
+            metrics["bytes_received"] = stats["bytes_received"] - traffic_before["bytes_received"]
+        if on_complete:
+            on_complete(metrics)
+
+
+def log_metrics(metrics: StageMetrics, **fields: Any) -> None:
+    """Emits the metrics of a stage as a JSON log line.
+
+    Args:
+        metrics (StageMetrics): The metrics of the stage.
+        **fields (Any): Additional fields, e.g. the name of the tool and the ID of the job.
+
+    """
+    log_event("stage_metrics", **fields, **metrics)
+
+
+def log_event(event: str, **fields: Any) -> None:
+    """Emits an event as a JSON log line, in the same stream as the metrics of the stages.
+
+    Args:
+        event (str): The name of the event.
+        **fields (Any): The fields of the event.
+
+    """
+    logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+def format_metrics(metrics: StageMetrics) -> str:
+    """Returns a short summary of the metrics, e.g. `1.2 s · 310 MB peak · 4 API calls · 2.1 MB transferred`.
+
+    Args:
+        metrics (StageMetrics): The metrics of the stage.
+
+    """
+    parts = [f"{metrics["wall_seconds"]:.1f} s"]
+    if metrics["peak_memory_mb"] is not None:
+        parts.append(f"{metrics["peak_memory_mb"]:,.0f} MB peak")
+    if metrics["api_calls"] is not None:
+        transferred = ((metrics["bytes_sent"] or 0) + (metrics["bytes_received"] or 0)) / 1_000_000
+        parts.append(f"{metrics["api_calls"]} API calls · {transferred:,.1f} MB transferred")
+    return " · ".join(parts)
+
+
+@contextlib.contextmanager
+def _profile(profiler: ProfilerName | None, metrics: StageMetrics) -> Iterator[None]:
+    """Runs the profiler around the block and saves its report to the metrics."""
+    if profiler and not _profiler_lock.acquire(blocking=False):  # pylint: disable=R1732
+        metrics["profile"] = "Not profiled, because another stage was being profiled at the same time."
+        yield
+    elif profiler:
+        try:
+            with _run_profiler(profiler, metrics):
+                yield
+        finally:
+            _profiler_lock.release()
+    else:
+        yield
+
+
+@contextlib.contextmanager
+def _run_profiler(profiler: ProfilerName, metrics: StageMetrics) -> Iterator[None]:
+    """Runs the given profiler around the block and saves its report to the metrics."""
+    if profiler == "pyinstrument":
+        # pyinstrument is an optional dependency, so it's imported only when it's used.
+        instrument = importlib.import_module("pyinstrument").Profiler()
+        instrument.start()
+        try:
+            yield
+        finally:
+            instrument.stop()
+            metrics["profile"] = instrument.output_text()
+    elif profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            output = io.StringIO()
+            pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            metrics["profile"] = output.getvalue()
+
+
+@contextlib.contextmanager
+def _sample_memory(metrics: StageMetrics) -> Iterator[None]:
+    """Samples the resident memory in a thread during the block and saves its peak to the metrics."""
+    if (memory := _get_memory_mb()) is None:
+        yield
+        return
+    peak = memory
+    stopped = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not stopped.wait(MEMORY_SAMPLE_INTERVAL):
+            peak = max(peak, _get_memory_mb() or 0.0)
+
+    sampler = threading.Thread(target=sample, name="memory-sampler", daemon=True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        sampler.join()
+        metrics["peak_memory_mb"] = round(max(peak, _get_memory_mb() or 0.0), 1)
+
+
+def _get_memory_mb() -> float | None:
+    """Returns the current resident memory of the process in megabytes, or None on platforms without `/proc`."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
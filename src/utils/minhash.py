@@ -0,0 +1,199 @@
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from .clustering import FEATURE_BITS, Analyzer, extract_features
+
+# The number of hash functions of a signature. More functions estimate similarities more precisely.
+NUM_PERMUTATIONS = 128
+# The minimum probability that signatures at the similarity threshold share a bucket.
+MIN_RECALL = 0.9
+# The maximum number of signature pairs compared at once, which bounds the memory of the verification.
+MAX_PAIRS = 100_000
+# The signature value of texts without features.
+_EMPTY = np.iinfo(np.uint32).max
+# Multiplier of the hashing of the signature values of a band into a bucket.
+_BUCKET_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def minhash_signatures(
+    texts: Sequence[str],
+    analyzer: Analyzer = "char_wb",
+    num_permutations: int = NUM_PERMUTATIONS,
+    seed: int = 0,
+    chunk_size: int = 2_000,
+) -> npt.NDArray[np.uint32]:
+    """Returns the MinHash signatures of the sets of features of the texts.
+
+    Every hash function is a multiply-shift hash of the feature with random parameters, and the signature
+    value is its minimum over the features of the text. The share of equal values of two signatures estimates
+    the Jaccard similarity of the sets of features. All hash functions are computed at once for a chunk of texts.
+    Texts without features have signatures of `_EMPTY` values.
+
+    Args:
+        texts (Sequence[str]): The texts.
+        analyzer (Analyzer): The features of the texts, see `utils.clustering.extract_features`. Defaults to
+            `char_wb`, which matches plurals, reordered words and texts that differ only in punctuation.
+        num_permutations (int): The number of hash functions. Defaults to `NUM_PERMUTATIONS`.
+        seed (int): The seed of the hash functions. Defaults to 0.
+        chunk_size (int): The number of texts hashed at once. Defaults to 2000.
+
+    """
+    rng = np.random.default_rng(seed)
+    # Odd multipliers make the multiply-shift hashes universal.
+    multipliers = rng.integers(1 << 62, size=num_permutations, dtype=np.uint64) << np.uint64(1) | np.uint64(1)
+    offsets = rng.integers(1 << 62, size=num_permutations, dtype=np.uint64)
+
+    signatures = np.full((len(texts), num_permutations), _EMPTY, dtype=np.uint32)
+    for start in range(0, len(texts), chunk_size):
+        rows, features = extract_features(pd.Series(texts[slice(start, start + chunk_size)], dtype=object), analyzer)
+        # Signatures are computed from sets, so repeated features of a text count once.
+        keys = np.unique(rows << FEATURE_BITS | features)
+        if keys.size:
+            text_rows, text_starts = np.unique(keys >> FEATURE_BITS, return_index=True)
+            signatures[text_rows + start] = np.minimum.reduceat(
+                _hash_features(keys & ((1 << FEATURE_BITS) - 1), multipliers, offsets), text_starts, axis=0
+            )
+    return signatures
+
+
+def _hash_features(
+    features: npt.NDArray[np.int64], multipliers: npt.NDArray[np.uint64], offsets: npt.NDArray[np.uint64]
+) -> npt.NDArray[np.uint32]:
+    """Returns the values of all hash functions for every feature, one row per feature.
+
+    Args:
+        features (npt.NDArray[np.int64]): The hashed features.
+        multipliers (npt.NDArray[np.uint64]): The odd multipliers of the hash functions.
+        offsets (npt.NDArray[np.uint64]): The offsets of the hash functions.
+
+    """
+    # Texts share most of their features, so every distinct feature is hashed once.
+    values, inverse = np.unique(features, return_inverse=True)
+    hashes = np.multiply(values.astype(np.uint64)[:, np.newaxis], multipliers)
+    hashes += offsets
+    hashes >>= np.uint64(32)
+    return hashes.astype(np.uint32)[inverse]
+
+
+def get_lsh_bands(num_permutations: int, threshold: float) -> tuple[int, int]:
+    """Returns the number of bands and of rows per band that find similar signatures with the fewest candidates.
+
+    Two signatures with Jaccard similarity `s` share a bucket in at least one of `b` bands of `r` rows with
+    probability `1 - (1 - s**r)**b`. Longer bands make fewer dissimilar signatures share a bucket, so the longest
+    bands are chosen with which signatures at the threshold share a bucket with a probability of at least
+    `MIN_RECALL`. Candidates are verified afterwards, so missed pairs matter more than extra candidates.
+
+    Args:
+        num_permutations (int): The number of values of a signature.
+        threshold (float): The Jaccard similarity above which signatures should share a bucket.
+
+    """
+    for rows in range(num_permutations, 1, -1):
+        bands = num_permutations // rows
+        if 1 - (1 - threshold**rows) ** bands >= MIN_RECALL:
+            return bands, rows
+    return num_permutations, 1
+
+
+def find_near_duplicates(signatures: npt.NDArray[np.uint32], threshold: float = 0.8) -> npt.NDArray[np.int64]:
+    """Groups the texts whose estimated Jaccard similarity is at least the threshold.
+
+    Signatures are split into bands, and the signatures with equal values in a band share a bucket. Every
+    signature is compared with the first signature of each of its buckets, and similar ones are linked into
+    groups, so the work grows with the number of texts rather than with the number of pairs of texts.
+    As with any LSH, a few similar pairs may be missed, see `get_lsh_bands`, and groups may chain texts that
+    are linked through other similar texts.
+
+    Args:
+        signatures (npt.NDArray[np.uint32]): The MinHash signatures, one row per text.
+        threshold (float): The minimum estimated Jaccard similarity of linked texts. Defaults to 0.8.
+
+    Returns:
+        npt.NDArray[np.int64]: The group of every text, which is the index of the first text of the group.
+            Texts without features, and texts without near duplicates, are groups of their own.
+
+    """
+    bands, rows_per_band = get_lsh_bands(signatures.shape[1], threshold)
+    non_empty = np.flatnonzero(signatures[:, 0] != _EMPTY)
+    pairs = [
+        _get_bucket_pairs(signatures[non_empty, slice(band * rows_per_band, (band + 1) * rows_per_band)], non_empty)
+        for band in range(bands)
+    ]
+    candidates = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+    first, second = candidates >> 32, candidates & ((1 << 32) - 1)
+    similar = estimate_similarity(signatures, first, second) >= threshold
+    return connected_components(len(signatures), first[similar], second[similar])
+
+
+def _get_bucket_pairs(band: npt.NDArray[np.uint32], texts: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Returns the pairs of the first text of every bucket of the band with each other text of the bucket.
+
+    Args:
+        band (npt.NDArray[np.uint32]): The signature values of the band, one row per text.
+        texts (npt.NDArray[np.int64]): The sorted indices of the texts.
+
+    Returns:
+        npt.NDArray[np.int64]: The pairs, with the first text in the upper and the other text in the lower 32 bits.
+
+    """
+    buckets = np.zeros(len(band), dtype=np.uint64)
+    for column in band.T.astype(np.uint64):
+        buckets = (buckets ^ column) * _BUCKET_MULTIPLIER
+    # Stable sorting makes the first signature of every bucket the one of the first text.
+    order = np.argsort(buckets, kind="stable")
+    starts = np.flatnonzero(np.diff(buckets[order], prepend=~buckets[order][:1]))
+    firsts = np.repeat(order[starts], np.diff(np.append(starts, len(order))))
+    linked = firsts != order
+    return np.unique(texts[firsts[linked]] << 32 | texts[order[linked]])
+
+
+def estimate_similarity(
+    signatures: npt.NDArray[np.uint32], first: npt.NDArray[np.int64], second: npt.NDArray[np.int64]
+) -> npt.NDArray[np.float64]:
+    """Returns the estimated Jaccard similarity of every pair of texts, the share of equal signature values.
+
+    Args:
+        signatures (npt.NDArray[np.uint32]): The MinHash signatures, one row per text.
+        first (npt.NDArray[np.int64]): The first texts of the pairs.
+        second (npt.NDArray[np.int64]): The second texts of the pairs.
+
+    """
+    similarity = np.empty(len(first), dtype=np.float64)
+    for start in range(0, len(first), MAX_PAIRS):
+        pairs = slice(start, start + MAX_PAIRS)
+        similarity[pairs] = np.mean(signatures[first[pairs]] == signatures[second[pairs]], axis=1)
+    return similarity
+
+
+def connected_components(
+    size: int, first: npt.NDArray[np.int64], second: npt.NDArray[np.int64]
+) -> npt.NDArray[np.int64]:
+    """Returns the component of every node of a graph, which is the lowest node of the component.
+
+    Components are merged with vectorized hooking of component labels and pointer jumping,
+    so large numbers of edges don't need a Python loop.
+
+    Args:
+        size (int): The number of nodes.
+        first (npt.NDArray[np.int64]): The first nodes of the edges.
+        second (npt.NDArray[np.int64]): The second nodes of the edges.
+
+    """
+    labels: npt.NDArray[np.int64] = np.arange(size, dtype=np.int64)
+    while True:
+        first_labels, second_labels = labels[first], labels[second]
+        differ = first_labels != second_labels
+        if not differ.any():
+            return labels
+        first, second = first[differ], second[differ]
+        # The higher label is hooked to the lower one, so no cycles can form.
+        np.minimum.at(
+            labels,
+            np.maximum(first_labels[differ], second_labels[differ]),
+            np.minimum(first_labels[differ], second_labels[differ]),
+        )
+        while not np.array_equal(jumped := labels[labels], labels):
+            labels = jumped
@@ -0,0 +1,80 @@
+import time
+
+
+class ProgressMeter:
+    """Coalesces progress updates and estimates the throughput and the remaining time.
+
+    An update is due when `min_interval` seconds passed or the progress grew by `min_step` of the total
+    since the last published update, and always when the last item is processed. The throughput is an
+    exponential moving average of the rate between published updates, so it follows slowdowns like
+    throttling without jumping on every item.
+
+    Args:
+        total (int): The total number of items.
+        min_interval (float): The minimum number of seconds between updates. Defaults to 0.25.
+        min_step (float): The fraction of the total that triggers an update earlier. Defaults to 0.01.
+        smoothing (float): The weight of the latest rate in the moving average. Defaults to 0.3.
+
+    """
+
+    def __init__(self, total: int, min_interval: float = 0.25, min_step: float = 0.01, smoothing: float = 0.3) -> None:
+        self.total = total
+        self.min_interval = min_interval
+        self.min_step = max(1, round(total * min_step))
+        self.smoothing = smoothing
+        self.processed = 0
+        self.rate: float | None = None
+        # The number of processed items and the time of the last published update.
+        self._last_update = (0, time.monotonic())
+
+    def update(self, processed: int) -> bool:
+        """Records the number of processed items and returns whether the progress should be published.
+
+        Args:
+            processed (int): The number of processed items so far.
+
+        """
+        self.processed = processed
+        now = time.monotonic()
+        elapsed = now - self._last_update[1]
+        step = processed - self._last_update[0]
+        if processed < self.total and elapsed < self.min_interval and step < self.min_step:
+            return False
+
+        if elapsed > 0 and step > 0:
+            rate = step / elapsed
+            self.rate = rate if self.rate is None else self.smoothing * rate + (1 - self.smoothing) * self.rate
+        self._last_update = (processed, now)
+        return True
+
+    @property
+    def eta(self) -> float | None:
+        """The estimated number of seconds until all items are processed, or None if the rate is unknown."""
+        if not self.rate:
+            return None
+        return max(0, self.total - self.processed) / self.rate
+
+    def describe(self) -> str:
+        """Returns the throughput and remaining time to append to a progress label, e.g. ` · 40 rows/s · ETA 10s`."""
+        text = ""
+        if self.rate is not None:
+            text += f" · {self.rate:,.0f} rows/s"
+        if self.eta is not None and self.processed < self.total:
+            text += f" · ETA {format_duration(self.eta)}"
+        return text
+
+
+def format_duration(seconds: float) -> str:
+    """Returns a short human-readable duration, e.g. `1h 05m`, `3m 20s` or `45s`.
+
+    Args:
+        seconds (float): The duration in seconds.
+
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
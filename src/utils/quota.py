@@ -0,0 +1,407 @@
+import contextlib
+import hashlib
+import random
+import re
+import threading
+import time
+from http import HTTPStatus
+from typing import Any, Literal, Mapping, MutableMapping, TypedDict, cast
+
+import gspread
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient, ParamsType
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from .metrics import TrafficStats, track_traffic
+
+RequestKind = Literal["read", "write"]
+
+# The number of connections to the API kept open by a client, shared by the threads sending its requests.
+MAX_CONNECTIONS = 32
+# Requests of `spreadsheets.batchUpdate` that have the same effect when they are applied twice.
+IDEMPOTENT_UPDATES = frozenset(
+    {"repeatCell", "updateCells", "updateBorders", "updateDimensionProperties", "updateSheetProperties"}
+)
+# Endpoints of POST requests that have the same effect when they are sent twice.
+_IDEMPOTENT_POSTS = ("values:batchUpdate", "values:batchClear", ":clear", ":batchGet", ":batchGetByDataFilter")
+# Matches the spreadsheet ID of Sheets API and Drive API endpoints.
+_SPREADSHEET_ID = re.compile(r"/(?:spreadsheets|files)/([^/:?]+)")
+
+
+class QuotaConfig(TypedDict):
+    """A dictionary with Sheets API quotas and retry settings.
+
+    Attributes:
+        user_reads_per_minute (float): Read requests allowed per minute for one user.
+        user_writes_per_minute (float): Write requests allowed per minute for one user.
+        project_reads_per_minute (float): Read requests allowed per minute for the whole app.
+        project_writes_per_minute (float): Write requests allowed per minute for the whole app.
+        max_retries (int): How many times a rate-limited or failed request is retried.
+        max_backoff (float): The maximum number of seconds to wait before a retry.
+        max_requests_per_spreadsheet (int): How many requests of one user are sent to the same spreadsheet
+            at the same time.
+
+    """
+
+    user_reads_per_minute: float
+    user_writes_per_minute: float
+    project_reads_per_minute: float
+    project_writes_per_minute: float
+    max_retries: int
+    max_backoff: float
+    max_requests_per_spreadsheet: int
+
+
+# Default quotas of the Sheets API: https://developers.google.com/workspace/sheets/api/limits
+DEFAULT_QUOTA: QuotaConfig = {
+    "user_reads_per_minute": 60,
+    "user_writes_per_minute": 60,
+    "project_reads_per_minute": 300,
+    "project_writes_per_minute": 300,
+    "max_retries": 6,
+    "max_backoff": 64,
+    "max_requests_per_spreadsheet": 4,
+}
+
+
+class SchedulerStats(TypedDict):
+    """A dictionary with counters of the requests sent through a scheduler.
+
+    Attributes:
+        reads (int): The number of read requests sent.
+        writes (int): The number of write requests sent.
+        retries (int): The number of retried requests.
+        coalesced_writes (int): The number of writes merged into other write requests.
+        throttled_seconds (float): The total time requests spent waiting for quota.
+        waiting (int): The number of requests waiting for quota right now.
+
+    """
+
+    reads: int
+    writes: int
+    retries: int
+    coalesced_writes: int
+    throttled_seconds: float
+    waiting: int
+
+
+class TokenBucket:  # pylint: disable=R0903
+    """Thread-safe token bucket that spreads requests evenly over time.
+
+    Each request reserves a token. When the bucket is empty, the request waits until
+    its token is refilled, so requests are served in the order they arrive.
+
+    Args:
+        rate_per_minute (float): The number of tokens refilled per minute.
+        capacity (float | None): The maximum number of tokens. Defaults to `rate_per_minute`.
+
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserves a token and returns the number of seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class SheetsScheduler:
+    """Rate limiting state shared by all Sheets API clients of one user.
+
+    Every request takes a token from the user bucket and from the project bucket of its kind,
+    so both the per-user and the per-project quotas are respected. Requests to the same spreadsheet
+    are limited to `max_requests_per_spreadsheet` at a time, so concurrent reads and writes of one job
+    don't run into the server-side limits of a single spreadsheet.
+
+    Args:
+        quota (QuotaConfig): The quotas and retry settings.
+
+    """
+
+    def __init__(self, quota: QuotaConfig) -> None:
+        self.quota = quota
+        self.stats: SchedulerStats = {
+            "reads": 0,
+            "writes": 0,
+            "retries": 0,
+            "coalesced_writes": 0,
+            "throttled_seconds": 0.0,
+            "waiting": 0,
+        }
+        self._buckets = {
+            "read": [TokenBucket(quota["user_reads_per_minute"]), _get_project_bucket(quota, "read")],
+            "write": [TokenBucket(quota["user_writes_per_minute"]), _get_project_bucket(quota, "write")],
+        }
+        self._spreadsheet_limits: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, spreadsheet_id: str | None) -> contextlib.AbstractContextManager[Any]:
+        """Returns a context manager that waits until a request to the spreadsheet can be sent.
+
+        Args:
+            spreadsheet_id (str | None): The ID of the spreadsheet, or None for requests without one.
+
+        """
+        if spreadsheet_id is None:
+            return contextlib.nullcontext()
+        with self._lock:
+            if spreadsheet_id not in self._spreadsheet_limits:
+                self._spreadsheet_limits[spreadsheet_id] = threading.BoundedSemaphore(
+                    self.quota["max_requests_per_spreadsheet"]
+                )
+            return self._spreadsheet_limits[spreadsheet_id]
+
+    def acquire(self, kind: RequestKind) -> None:
+        """Waits until a request of the given kind fits into the quotas.
+
+        Args:
+            kind (RequestKind): Whether the request reads or writes data.
+
+        """
+        wait = max(bucket.reserve() for bucket in self._buckets[kind])
+        with self._lock:
+            self.stats["reads" if kind == "read" else "writes"] += 1
+            self.stats["throttled_seconds"] += wait
+            self.stats["waiting"] += 1
+        try:
+            time.sleep(wait)
+        finally:
+            with self._lock:
+                self.stats["waiting"] -= 1
+
+    def backoff(self, attempt: int) -> None:
+        """Waits before retrying a failed request, using exponential backoff with full jitter.
+
+        Args:
+            attempt (int): The number of the retry, starting from 0.
+
+        """
+        with self._lock:
+            self.stats["retries"] += 1
+        time.sleep(random.uniform(0, min(self.quota["max_backoff"], 2**attempt)))
+
+
+class _PendingWrite:  # pylint: disable=R0903
+    """Values written by requests that are merged into a single `values:batchUpdate` request."""
+
+    def __init__(self, body: Mapping[str, Any]) -> None:
+        self.body = dict(body, data=list(body["data"]))
+        self.done = threading.Event()
+        self.response: Response | None = None
+        self.error: Exception | None = None
+
+
+class ScheduledHTTPClient(HTTPClient):
+    """HTTP client for gspread that sends requests through a `SheetsScheduler`.
+
+    Requests wait for the read or write quota, and rate-limited requests (429 and Drive usage limit errors)
+    are retried with exponential backoff and jitter. Requests that failed with a timeout or a server error
+    (408 and 5xx) may have been applied, so they are retried only if sending them twice is safe, e.g. reads,
+    value updates and formatting, but not appended columns or added rules. Value updates that are
+    queued for the same spreadsheet while waiting for the write quota are coalesced into one request.
+    The client is safe to share between threads, and keeps up to `MAX_CONNECTIONS` connections open
+    for requests sent in parallel. The requests and bytes sent by the session are counted in `traffic`.
+
+    Args:
+        auth (Any): The credentials used to authenticate requests.
+        session (Any): An optional session used instead of a new authorized session.
+        scheduler (SheetsScheduler | None): The scheduler to use. Defaults to a new one with `DEFAULT_QUOTA`.
+
+    """
+
+    def __init__(self, auth: Any, session: Any = None, scheduler: SheetsScheduler | None = None) -> None:
+        super().__init__(auth, session)
+        self.scheduler = scheduler or SheetsScheduler(DEFAULT_QUOTA)
+        # The default pool of 10 connections would drop connections of parallel requests after each response.
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=MAX_CONNECTIONS))
+        self.traffic = track_traffic(self.session)
+        self._pending_writes: dict[tuple[str, Any], _PendingWrite] = {}
+        self._pending_lock = threading.Lock()
+
+    def request(  # pylint: disable=R0913,R0917
+        self,
+        method: str,
+        endpoint: str,
+        params: ParamsType | None = None,
+        data: bytes | None = None,
+        json: Mapping[str, Any] | None = None,
+        files: Any = None,
+        headers: MutableMapping[str, str] | None = None,
+    ) -> Response:
+        if endpoint.endswith("values:batchUpdate") and json and not json.get("includeValuesInResponse"):
+            return self._coalesce_write(endpoint, json)
+
+        kind: RequestKind = "read" if method.lower() == "get" or endpoint.endswith(":batchGet") else "write"
+        return self._send(
+            kind,
+            method,
+            endpoint,
+            idempotent=_is_idempotent(method, endpoint, json),
+            params=params,
+            data=data,
+            json=json,
+            files=files,
+            headers=headers,
+        )
+
+    def _send(  # pylint: disable=R0913
+        self,
+        kind: RequestKind,
+        method: str,
+        endpoint: str,
+        *,
+        idempotent: bool,
+        acquired: bool = False,
+        **kwargs: Any,
+    ) -> Response:
+        """Sends the request within the quota, retrying it on rate limits, and on server errors if idempotent."""
+        attempt = 0
+        match = _SPREADSHEET_ID.search(endpoint)
+        while True:
+            if not acquired:
+                self.scheduler.acquire(kind)
+            acquired = False
+            try:
+                with self.scheduler.limit(match.group(1) if match else None):
+                    return super().request(method, endpoint, **kwargs)
+            except APIError as error:
+                if attempt >= self.scheduler.quota["max_retries"] or not _is_retryable(error, idempotent):
+                    raise
+            self.scheduler.backoff(attempt)
+            attempt += 1
+
+    def _coalesce_write(self, endpoint: str, body: Mapping[str, Any]) -> Response:
+        """Sends a value update, merging it with other updates queued for the same spreadsheet."""
+        key = (endpoint, body.get("valueInputOption"))
+        with self._pending_lock:
+            pending = self._pending_writes.get(key)
+            is_leader = pending is None
+            if pending is None:
+                pending = self._pending_writes[key] = _PendingWrite(body)
+            else:
+                pending.body["data"].extend(body["data"])
+                self.scheduler.stats["coalesced_writes"] += 1
+
+        if not is_leader:
+            pending.done.wait()
+            if pending.error:
+                raise pending.error
+            return cast(Response, pending.response)
+
+        try:
+            self.scheduler.acquire("write")
+            # Updates queued while waiting for the quota are sent together with this one.
+            self._close_pending_write(key, pending)
+            pending.response = self._send("write", "post", endpoint, json=pending.body, idempotent=True, acquired=True)
+            return pending.response
+        except Exception as error:
+            pending.error = error
+            raise
+        finally:
+            self._close_pending_write(key, pending)
+            pending.done.set()
+
+    def _close_pending_write(self, key: tuple[str, Any], pending: _PendingWrite) -> None:
+        """Stops merging new updates into the pending write, so they start a new one."""
+        with self._pending_lock:
+            if self._pending_writes.get(key) is pending:
+                del self._pending_writes[key]
+
+
+_project_buckets: dict[tuple[RequestKind, float], TokenBucket] = {}
+_schedulers: dict[str, SheetsScheduler] = {}
+# Reentrant, as a new scheduler takes the project buckets while the registry of schedulers is locked.
+_registry_lock = threading.RLock()
+MAX_SCHEDULERS = 1024
+
+
+def _get_project_bucket(quota: QuotaConfig, kind: RequestKind) -> TokenBucket:
+    """Returns the process-wide bucket of the project quota, shared by the schedulers of all users."""
+    rate = quota["project_reads_per_minute"] if kind == "read" else quota["project_writes_per_minute"]
+    with _registry_lock:
+        if (kind, rate) not in _project_buckets:
+            _project_buckets[kind, rate] = TokenBucket(rate)
+        return _project_buckets[kind, rate]
+
+
+def get_scheduler(user_key: str, quota: QuotaConfig | None = None) -> SheetsScheduler:
+    """Returns the process-wide scheduler of a user, creating it if needed.
+
+    Args:
+        user_key (str): A secret value identifying the user, e.g. the refresh token. Only its hash is stored.
+        quota (QuotaConfig | None): The quotas used for a new scheduler. Defaults to `DEFAULT_QUOTA`.
+
+    """
+    key = hashlib.sha256(user_key.encode()).hexdigest()
+    with _registry_lock:
+        scheduler = _schedulers.pop(key, None)
+        if scheduler is None:
+            if len(_schedulers) >= MAX_SCHEDULERS:
+                # The least recently used scheduler is always the first one, as used ones are re-inserted.
+                del _schedulers[next(iter(_schedulers))]
+            scheduler = SheetsScheduler(quota or DEFAULT_QUOTA)
+        _schedulers[key] = scheduler
+        return scheduler
+
+
+def get_scheduler_stats(worksheet: gspread.Worksheet) -> SchedulerStats | None:
+    """Returns the request counters of the worksheet's scheduler, or None if it isn't scheduled.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet whose client to inspect.
+
+    """
+    if isinstance(worksheet.client, ScheduledHTTPClient):
+        return worksheet.client.scheduler.stats
+    return None
+
+
+def get_traffic_stats(worksheet: gspread.Worksheet) -> TrafficStats | None:
+    """Returns the HTTP traffic counters of the worksheet's client, or None if it isn't scheduled.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet whose client to inspect.
+
+    """
+    if isinstance(worksheet.client, ScheduledHTTPClient):
+        return worksheet.client.traffic
+    return None
+
+
+def _is_retryable(error: APIError, idempotent: bool) -> bool:
+    """Returns whether the request was rejected by rate limits, or may be sent again after a temporary error.
+
+    Args:
+        error (APIError): The error of the request.
+        idempotent (bool): Whether sending the request twice has the same effect as sending it once.
+
+    """
+    if error.code == HTTPStatus.TOO_MANY_REQUESTS:
+        return True
+    # The Drive API reports exceeded usage limits with 403 errors.
+    reasons = {item.get("domain") for item in error.error.get("errors", [])}
+    if error.code == HTTPStatus.FORBIDDEN and "usageLimits" in reasons:
+        return True
+    # Timed out and failed requests may have been applied, so only idempotent ones are sent again.
+    return idempotent and (error.code == HTTPStatus.REQUEST_TIMEOUT or error.code >= 500)
+
+
+def _is_idempotent(method: str, endpoint: str, body: Mapping[str, Any] | None) -> bool:
+    """Returns whether sending the request twice has the same effect as sending it once."""
+    if method.lower() in ("get", "put"):
+        return True
+    if endpoint.endswith(_IDEMPOTENT_POSTS):
+        return True
+    if endpoint.endswith(":batchUpdate") and body:
+        return all(name in IDEMPOTENT_UPDATES for request in body.get("requests", []) for name in request)
+    return False
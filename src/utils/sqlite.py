@@ -0,0 +1,20 @@
+import contextlib
+import sqlite3
+from pathlib import Path
+from typing import Iterator
+
+
+@contextlib.contextmanager
+def connect(path: Path) -> Iterator[sqlite3.Connection]:
+    """Opens a connection to a SQLite database that commits on success and is always closed afterwards.
+
+    Args:
+        path (Path): The path to the database file.
+
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
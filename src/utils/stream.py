@@ -0,0 +1,90 @@
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Sequence, cast
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+
+def prefetch[T](iterator: Iterator[T], size: int = 2) -> Iterator[T]:
+    """Runs the iterator in a background thread and yields its items.
+
+    At most `size` items are produced ahead of the consumer, so memory stays bounded while
+    the next items (e.g. network reads) are fetched during the processing of the current one.
+    Errors raised by the iterator are re-raised in the consumer.
+
+    Args:
+        iterator (Iterator[T]): The iterator to run in the background.
+        size (int): The maximum number of items produced ahead. Defaults to 2.
+
+    """
+    items: queue.Queue[tuple[bool, T | BaseException | None]] = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def put(item: tuple[bool, T | BaseException | None]) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterator:
+                if not put((False, item)):
+                    return
+            put((True, None))
+        except Exception as error:  # pylint: disable=W0718
+            put((True, error))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            finished, item = items.get()
+            if finished:
+                if isinstance(item, BaseException):
+                    raise item
+                return
+            yield cast(T, item)
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def factorize_chunks(
+    chunks: Iterable[Sequence[str]], key: Callable[[str], str] | None = None
+) -> tuple[npt.NDArray[np.int32], list[str], list[str]]:
+    """Encodes the values of the chunks as integer codes of their distinct keys.
+
+    Only the distinct keys and a code per value are kept in memory, so long columns with many repeated
+    values can be encoded without loading them at once.
+
+    Args:
+        chunks (Iterable[Sequence[str]]): The values, in chunks.
+        key (Callable[[str], str] | None): Returns the key of a value, e.g. its normalized form.
+            Defaults to None, which uses the values as keys.
+
+    Returns:
+        tuple[npt.NDArray[np.int32], list[str], list[str]]: The code of every value, the distinct keys
+            in the order of their first occurrence, and the first value of every key.
+
+    """
+    codes: list[npt.NDArray[np.int32]] = []
+    keys: dict[str, int] = {}
+    first_values: list[str] = []
+    for chunk in chunks:
+        values = pd.Series(chunk, dtype=object)
+        chunk_codes, uniques = pd.factorize(values.map(key) if key else values)
+        # Codes of new keys are assigned in the order of `uniques`, which is the order of their first occurrence.
+        chunk_keys = np.fromiter(
+            (keys.setdefault(unique, len(keys)) for unique in uniques), dtype=np.int32, count=len(uniques)
+        )
+        _, first_positions = np.unique(chunk_codes, return_index=True)
+        new_keys = chunk_keys >= len(first_values)
+        first_values.extend(values.iloc[first_positions[new_keys]].tolist())
+        codes.append(chunk_keys[chunk_codes])
+    return (np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)), list(keys), first_values
@@ -0,0 +1,25 @@
+import unittest
+
+import pandas as pd
+
+from pages import gsheet_find_duplicates
+
+
+class FindDuplicateGroupsTest(unittest.TestCase):
+    """Tests of the grouping of near-duplicate keywords at the default threshold."""
+
+    def test_groups_plurals(self) -> None:
+        """Plurals of short keywords are grouped with their singulars despite few common 3-grams."""
+        keywords = pd.Series(["cheap flights", "buy shoe", "Cheap flight", "buy shoes", "red boxes", "red box"])
+        groups = gsheet_find_duplicates.find_duplicate_groups(keywords)
+        self.assertEqual(groups.tolist(), [0, 1, 0, 1, 4, 4])
+
+    def test_keeps_different_keywords_apart(self) -> None:
+        """Words that only end like plurals aren't grouped, and empty keywords have no group."""
+        keywords = pd.Series(["glass", "gas", "ga", "yes", "ye", "tennis", "tennis shoes", ""])
+        groups = gsheet_find_duplicates.find_duplicate_groups(keywords)
+        self.assertEqual(groups.tolist(), [0, 1, 2, 3, 4, 5, 6, -1])
+
+
+if __name__ == "__main__":
+    unittest.main()
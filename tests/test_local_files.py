@@ -0,0 +1,43 @@
+import unittest
+
+from streamlit.testing.v1 import AppTest
+
+
+def run_page() -> None:
+    """Runs the page with an uploaded CSV file, as app tests can't upload files.
+
+    The function is run as the script of the app test, so it imports everything it uses.
+    """
+    # pylint: disable=C0415
+    from unittest import mock
+
+    import streamlit as st
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+    from pages import local_files
+
+    record = UploadedFileRec("file", "keywords.csv", "text/csv", b"Keyword\ncheap flights\ncheap flight\n")
+    with mock.patch.object(st, "file_uploader", return_value=UploadedFile(record, None)):  # type: ignore[arg-type]
+        local_files.main()
+
+
+class LocalFilesTest(unittest.TestCase):
+    """Tests of the page running the tools on uploaded files."""
+
+    def test_download_results(self) -> None:
+        """The results of a run are offered as a download of the same format."""
+        app = AppTest.from_function(run_page)
+        app.secrets["language_detection_workers"] = 1
+        app.run()
+        # pylint: disable=E1101
+        app.radio[0].set_value("find_duplicates").run()
+        app.text_input[0].input("Keyword")
+        app.button[0].click().run()
+
+        self.assertFalse(app.exception)
+        (download_button,) = app.get("download_button")
+        self.assertTrue(download_button.proto.url.endswith(".csv"))
+
+
+if __name__ == "__main__":
+    unittest.main()